@@ -5,6 +5,7 @@ from flask_cors import CORS
 from flask_mail import Mail
 from flask_migrate import Migrate
 from celery import Celery
+from celery.schedules import crontab
 import os
 import logging
 
@@ -15,10 +16,89 @@ mail = Mail()
 migrate = Migrate()
 celery = Celery()
 
+def init_celery(app):
+    """Configure Celery from the Flask app and run every task inside its app context"""
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        result_backend=app.config['CELERY_RESULT_BACKEND'],
+        task_serializer='json',
+        accept_content=['json'],
+        task_ignore_result=True,
+        task_acks_late=True,
+        worker_prefetch_multiplier=1,
+        # Verification codes get their own workers so imports and digests never delay them
+        task_routes={
+            'auth.deliver_code': {'queue': os.environ.get('CODE_DELIVERY_QUEUE', 'auth_codes')},
+            'auth.fail_undelivered_codes': {'queue': os.environ.get('CODE_DELIVERY_QUEUE', 'auth_codes')},
+            # CPU-bound image work runs on its own prefork workers
+            'media.generate_variants': {'queue': os.environ.get('MEDIA_TASK_QUEUE', 'media')},
+            'media.evict_resize_cache': {'queue': os.environ.get('MEDIA_TASK_QUEUE', 'media')}
+        },
+        beat_schedule={
+            'reconcile-unread-counters': {
+                'task': 'notifications.reconcile_unread_counters',
+                'schedule': float(os.environ.get('NOTIFICATION_COUNTER_RECONCILE_SECONDS', 300))
+            },
+            # Safety net for events whose after-commit trigger was lost
+            'drain-outbox': {
+                'task': 'outbox.drain',
+                'schedule': float(os.environ.get('OUTBOX_DRAIN_SECONDS', 10))
+            },
+            'purge-outbox': {
+                'task': 'outbox.purge',
+                'schedule': 3600.0
+            },
+            'fail-undelivered-codes': {
+                'task': 'auth.fail_undelivered_codes',
+                'schedule': float(os.environ.get('CODE_DELIVERY_SWEEP_SECONDS', 60))
+            },
+            'collect-media-blobs': {
+                'task': 'media.collect_blobs',
+                'schedule': float(os.environ.get('MEDIA_BLOB_COLLECT_SECONDS', 3600))
+            },
+            'evict-resize-cache': {
+                'task': 'media.evict_resize_cache',
+                'schedule': float(os.environ.get('MEDIA_RESIZE_EVICT_SECONDS', 300))
+            },
+            'collect-upload-sessions': {
+                'task': 'media.collect_upload_sessions',
+                'schedule': float(os.environ.get('UPLOAD_SESSION_COLLECT_SECONDS', 3600))
+            },
+            'archive-expired-notifications': {
+                'task': 'notifications.archive_expired',
+                'schedule': float(os.environ.get('NOTIFICATION_RETENTION_INTERVAL_SECONDS', 3600))
+            },
+            'email-digest-hourly': {
+                'task': 'notifications.send_email_digests',
+                'schedule': crontab(minute=0),
+                'args': ('hourly',)
+            },
+            'email-digest-daily': {
+                'task': 'notifications.send_email_digests',
+                'schedule': crontab(minute=0, hour=int(os.environ.get('EMAIL_DIGEST_DAILY_HOUR', 8))),
+                'args': ('daily',)
+            }
+        }
+    )
+    
+    class ContextTask(celery.Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+    
+    celery.Task = ContextTask
+    
+    # Register task modules
+    from app import tasks  # noqa: F401
+
 def create_app():
     """Application factory pattern"""
     app = Flask(__name__)
     
+    # Uploaded files are streamed to disk while they are parsed
+    from app.services.media_storage import MediaUploadRequest
+    app.request_class = MediaUploadRequest
+    
     # Configure logging
     logging.basicConfig(level=logging.INFO)
     app.logger.setLevel(logging.INFO)
@@ -40,12 +120,13 @@ def create_app():
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER')
     
-    # Disable mail connection check on startup
-    app.config['MAIL_SUPPRESS_SEND'] = True
+    # Mail is suppressed unless explicitly enabled (e.g. against scripts/smtp_sink.py)
+    app.config['MAIL_SUPPRESS_SEND'] = os.environ.get('MAIL_SUPPRESS_SEND', 'true').lower() == 'true'
     
     # Celery configuration
-    app.config['CELERY_BROKER_URL'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
-    app.config['CELERY_RESULT_BACKEND'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CELERY_BROKER_URL'] = os.environ.get('CELERY_BROKER_URL', redis_url)
+    app.config['CELERY_RESULT_BACKEND'] = os.environ.get('CELERY_RESULT_BACKEND', redis_url)
     
     # Initialize extensions
     db.init_app(app)
@@ -55,7 +136,7 @@ def create_app():
     migrate.init_app(app, db)
     
     # Initialize Celery
-    celery.conf.update(app.config)
+    init_celery(app)
     
     # Import and register blueprints
     from app.api.auth import auth_bp
@@ -75,6 +156,7 @@ def create_app():
     from app.api.search import search_bp
     from app.api.feed import feed_bp
     from app.api.ai import ai_bp
+    from app.api.genealogy import genealogy_bp
     
     app.register_blueprint(unified_auth_bp, url_prefix='/api/unified-auth')
     app.register_blueprint(google_auth_bp, url_prefix='/api/auth/google')
@@ -93,6 +175,7 @@ def create_app():
     app.register_blueprint(search_bp, url_prefix='/api/search')
     app.register_blueprint(feed_bp, url_prefix='/api/feed')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    app.register_blueprint(genealogy_bp, url_prefix='/api/genealogy')
     
     # Create database tables
     with app.app_context():
@@ -102,12 +185,16 @@ def create_app():
         from app.models.like import Like
         from app.models.comment import Comment
         from app.models.media import Media
+        from app.models.media_blob import MediaBlob
+        from app.models.upload_session import UploadSession
         from app.models.verification import PhoneVerification
         from app.models.code import Code
         from app.models.email_verification import EmailVerification
         from app.models.follow import Follow
         from app.models.friend import Friend
         from app.models.notification import Notification
+        from app.models.outbox import OutboxEvent
+        from app.models.genealogy import GenealogyPerson, GenealogyRelation, GenealogyAncestry, GenealogyImport, GenealogyTreeMember
         try:
             db.create_all()
         except Exception as e:
@@ -116,15 +203,14 @@ def create_app():
             pass
         
         # Create uploads directory if it doesn't exist
-        uploads_dir = os.path.join(os.getcwd(), 'uploads')
-        os.makedirs(uploads_dir, exist_ok=True)
+        from app.services.media_storage import media_storage
+        os.makedirs(media_storage.upload_dir, exist_ok=True)
     
     # Add route for serving uploaded files
-    @app.route('/uploads/<filename>')
+    @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        """Serve uploaded files"""
-        from flask import send_from_directory
-        uploads_dir = os.path.join(os.getcwd(), 'uploads')
-        return send_from_directory(uploads_dir, filename)
+        """Serve uploaded files (sharded keys and old flat names alike)"""
+        from app.services.media_storage import media_storage
+        return media_storage.send(filename)
     
     return app
@@ -7,6 +7,8 @@ from app.models.comment import Comment
 from app.models.notification import Notification
 from app.models.audit_log import AuditLog
 from app.models.report import Report, ReportStatus
+from app.services.http_client import http_client
+from app.services.circuit_breaker import breaker_states
 from datetime import datetime, timedelta
 from sqlalchemy import or_, func
 import uuid
@@ -388,6 +390,20 @@ def get_admin_stats():
     
     return jsonify({'stats': stats}), 200
 
+@admin_bp.route('/http-client-stats', methods=['GET'])
+@jwt_required()
+@require_admin()
+def get_http_client_stats():
+    """Outbound HTTP pool metrics of the process that serves this request"""
+    return jsonify({'http_client': http_client.metrics()}), 200
+
+@admin_bp.route('/circuit-breakers', methods=['GET'])
+@jwt_required()
+@require_admin()
+def get_circuit_breakers():
+    """State of the external dependency circuit breakers in this process"""
+    return jsonify({'circuit_breakers': breaker_states()}), 200
+
 @admin_bp.route('/recent-activity', methods=['GET'])
 @jwt_required()
 @require_admin()
@@ -6,20 +6,26 @@ from app.models.post import Post, PostPrivacy
 from app.models.follow import Follow
 from app.models.friend import Friend
 from app.models.like import Like
+from app.services.feed_ranking import family_feed_ranker
 from sqlalchemy import or_, and_, func, desc
 from datetime import datetime, timedelta
 import uuid
 
 feed_bp = Blueprint('feed', __name__)
 
+MAX_FEED_PAGE = 100
+
 @feed_bp.route('/home', methods=['GET'])
 @jwt_required()
 def get_home_feed():
     """Get home feed for current user (posts from followed users)"""
     current_user_id = get_jwt_identity()
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    sort_by = request.args.get('sort_by', 'recent')  # recent, popular, friends
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_FEED_PAGE)
+    sort_by = request.args.get('sort_by', 'recent')  # recent, popular, friends, family
+    
+    if sort_by == 'family':
+        return get_family_feed(current_user_id, page, per_page)
     
     # Get users that current user is following
     following_ids = db.session.query(Follow.followed_id).filter_by(follower_id=current_user_id).subquery()
@@ -81,11 +87,42 @@ def get_home_feed():
         'current_page': page
     }), 200
 
+def get_family_feed(current_user_id, page, per_page):
+    """Home feed ranked by kinship distance, past interactions and recency"""
+    current_user = User.query.get(uuid.UUID(current_user_id))
+    if not current_user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    ranked, total = family_feed_ranker.rank(current_user, page=page, per_page=per_page)
+    
+    # One query for the like status of the whole page
+    page_post_ids = [post.id for post, _ in ranked]
+    liked_ids = {
+        post_id for (post_id,) in db.session.query(Like.post_id).filter(
+            Like.user_id == current_user.id,
+            Like.post_id.in_(page_post_ids)
+        )
+    } if page_post_ids else set()
+    
+    posts_data = []
+    for post, kinship_distance in ranked:
+        post_dict = post.to_dict()
+        post_dict['user_liked'] = post.id in liked_ids
+        post_dict['kinship_distance'] = kinship_distance
+        posts_data.append(post_dict)
+    
+    return jsonify({
+        'posts': posts_data,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page if per_page > 0 else 0,
+        'current_page': page
+    }), 200
+
 @feed_bp.route('/popular', methods=['GET'])
 def get_popular_feed():
     """Get popular posts (public endpoint)"""
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_FEED_PAGE)
     window_days = request.args.get('window_days', type=int)  # Optional time window
     
     # Get popular posts using the model method
@@ -112,7 +149,7 @@ def get_explore_feed():
     except:
         current_user_id = None
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_FEED_PAGE)
     category = request.args.get('category', 'all')  # all, trending, recent
     
     # Base query for public posts
@@ -160,7 +197,7 @@ def get_friends_feed():
     """Get feed with posts from friends only"""
     current_user_id = get_jwt_identity()
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_FEED_PAGE)
     
     # Get friends
     friends_query = db.session.query(Friend.user2_id).filter(
@@ -207,7 +244,7 @@ def get_hashtag_feed(hashtag):
     """Get feed for a specific hashtag"""
     current_user_id = get_jwt_identity()
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_FEED_PAGE)
     sort_by = request.args.get('sort_by', 'recent')  # recent, popular
     
     # Get posts with the hashtag
@@ -252,7 +289,7 @@ def get_user_feed(user_id):
     """Get feed for a specific user"""
     current_user_id = get_jwt_identity()
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_FEED_PAGE)
     
     # Convert string UUID to UUID object
     try:
@@ -3,7 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
 from app.models.follow import Follow, FollowStatus
-from app.models.notification import Notification
+from app.models.outbox import OutboxEvent
 from datetime import datetime
 import uuid
 
@@ -33,13 +33,7 @@ def follow_user(user_id):
     
     if is_following:
         # Create notification
-        Notification.create_notification(
-            user_id=user_to_follow.id,
-            notification_type='follow',
-            actor_id=current_user_id,
-            target_id=user_to_follow.id,
-            payload={'action': action}
-        )
+        OutboxEvent.emit('user.followed', followed_id=user_to_follow.id, follower_id=current_user_id, action=action)
     
     db.session.commit()
     
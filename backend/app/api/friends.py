@@ -3,7 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
 from app.models.friend import Friend, FriendStatus
-from app.models.notification import Notification
+from app.models.outbox import OutboxEvent
 from datetime import datetime
 import uuid
 
@@ -33,13 +33,7 @@ def send_friend_request(user_id):
     
     if success:
         # Create notification
-        Notification.create_notification(
-            user_id=user_to_friend.id,
-            notification_type='friend_request',
-            actor_id=current_user_id,
-            target_id=user_to_friend.id,
-            payload={'action': 'friend_request_sent'}
-        )
+        OutboxEvent.emit('friend.requested', requestee_id=user_to_friend.id, requester_id=current_user_id)
         
         db.session.commit()
         return jsonify({'message': message}), 201
@@ -68,13 +62,7 @@ def accept_friend_request(request_id):
     # Accept the request
     if Friend.accept_friend_request(request_uuid):
         # Create notification for the requester
-        Notification.create_notification(
-            user_id=friend_request.requester_id,
-            notification_type='friend_accepted',
-            actor_id=current_user_id,
-            target_id=friend_request.requester_id,
-            payload={'action': 'friend_request_accepted'}
-        )
+        OutboxEvent.emit('friend.accepted', requester_id=friend_request.requester_id, requestee_id=current_user_id)
         
         db.session.commit()
         return jsonify({'message': 'Friend request accepted'}), 200
@@ -0,0 +1,360 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.models.user import User
+from app.models.genealogy import (
+    GenealogyPerson, GenealogyAncestry, GenealogyImport, GenealogyTreeMember, ImportStatus, RelationType
+)
+from app.services.kinship_service import kinship_service
+from app.services.genealogy_importer import detect_format
+from app.services.media_storage import media_storage
+from werkzeug.utils import secure_filename
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+genealogy_bp = Blueprint('genealogy', __name__)
+
+MAX_IMPORT_FILE_SIZE = int(os.environ.get('GENEALOGY_IMPORT_MAX_SIZE', 200 * 1024 * 1024))  # 200MB
+GENEALOGY_IMPORT_DIR = os.environ.get('GENEALOGY_IMPORT_DIR')
+
+def can_access_tree(user, tree_id):
+    """Only members of a tree (and admins) may read or modify it"""
+    if not user:
+        return False
+    return user.can_admin() or GenealogyTreeMember.get(tree_id, user.id) is not None
+
+def can_manage_tree(user, tree_id):
+    """Only the tree's owner (its importer) and admins may grant membership"""
+    if not user:
+        return False
+    return user.can_admin() or GenealogyTreeMember.is_owner(tree_id, user.id)
+
+def parse_relation_type(value):
+    try:
+        return RelationType(value)
+    except ValueError:
+        return None
+
+@genealogy_bp.route('/trees/<tree_id>/edges', methods=['POST'])
+@jwt_required()
+def ingest_tree_edges(tree_id):
+    """Ingest persons and parent/spouse edges of a family tree
+
+    Local stand-in for a Gramps export: {"persons": [{"gramps_id", "given_name",
+    "surname", "gender", ...}], "relations": [{"source", "target", "type"}]}
+    where type is "parent" (source is parent of target) or "spouse".
+    """
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not can_access_tree(current_user, tree_id):
+        return jsonify({'error': 'Access to this tree is denied'}), 403
+
+    data = request.get_json() or {}
+    persons = data.get('persons', [])
+    raw_relations = data.get('relations', [])
+
+    if not isinstance(persons, list) or not isinstance(raw_relations, list):
+        return jsonify({'error': 'persons and relations must be lists'}), 400
+
+    for person in persons:
+        if not isinstance(person, dict) or not person.get('gramps_id'):
+            return jsonify({'error': 'Every person needs a gramps_id'}), 400
+
+    relations = []
+    for relation in raw_relations:
+        relation_type = parse_relation_type(relation.get('type')) if isinstance(relation, dict) else None
+        if not relation_type or not relation.get('source') or not relation.get('target'):
+            return jsonify({'error': 'Every relation needs source, target and type (parent or spouse)'}), 400
+        relations.append((relation['source'], relation['target'], relation_type))
+
+    try:
+        stats = kinship_service.ingest(tree_id, persons, relations)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error ingesting tree {tree_id}: {str(e)}")
+        db.session.rollback()
+        kinship_service.invalidate(tree_id)
+        return jsonify({'error': 'Failed to ingest tree'}), 500
+
+    return jsonify({'tree_id': tree_id, **stats}), 200
+
+@genealogy_bp.route('/trees/<tree_id>/relationship', methods=['GET'])
+@jwt_required()
+def get_tree_relationship(tree_id):
+    """Describe how person `to` is related to person `from` (Gramps ids)"""
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not can_access_tree(current_user, tree_id):
+        return jsonify({'error': 'Access to this tree is denied'}), 403
+
+    source_id = request.args.get('from', '').strip()
+    target_id = request.args.get('to', '').strip()
+    if not source_id or not target_id:
+        return jsonify({'error': 'from and to are required'}), 400
+
+    result = kinship_service.relationship(tree_id, source_id, target_id)
+
+    return jsonify({
+        'tree_id': tree_id,
+        'from': source_id,
+        'to': target_id,
+        'related': result is not None,
+        'relationship': result
+    }), 200
+
+@genealogy_bp.route('/relationship/<user_id>', methods=['GET'])
+@jwt_required()
+def get_user_relationship(user_id):
+    """Describe how another user is related to the current user"""
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid user ID format'}), 400
+
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    other_user = User.query.get(user_uuid)
+    if not current_user or not other_user:
+        return jsonify({'error': 'User not found'}), 404
+
+    current_link = GenealogyTreeMember.linked_person(current_user)
+    if not current_link:
+        return jsonify({'error': 'Your profile is not linked to a family tree'}), 400
+
+    other_link = GenealogyTreeMember.linked_person(other_user)
+    if not other_link or other_link[0] != current_link[0]:
+        return jsonify({'related': False, 'relationship': None}), 200
+
+    result = kinship_service.relationship(current_link[0], current_link[1], other_link[1])
+
+    return jsonify({'related': result is not None, 'relationship': result}), 200
+
+@genealogy_bp.route('/trees/<tree_id>/persons/<gramps_id>/ancestors', methods=['GET'])
+@jwt_required()
+def get_person_ancestors(tree_id, gramps_id):
+    """Get all ancestors of a person from the closure table"""
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not can_access_tree(current_user, tree_id):
+        return jsonify({'error': 'Access to this tree is denied'}), 403
+
+    max_depth = request.args.get('max_depth', type=int)
+    rows = GenealogyAncestry.get_ancestors(tree_id, gramps_id, max_depth=max_depth)
+
+    return jsonify({
+        'gramps_id': gramps_id,
+        'ancestors': [{'gramps_id': row.ancestor_id, 'depth': row.depth} for row in rows],
+        'count': len(rows)
+    }), 200
+
+@genealogy_bp.route('/trees/<tree_id>/persons/<gramps_id>/descendants', methods=['GET'])
+@jwt_required()
+def get_person_descendants(tree_id, gramps_id):
+    """Get all descendants of a person from the closure table"""
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not can_access_tree(current_user, tree_id):
+        return jsonify({'error': 'Access to this tree is denied'}), 403
+
+    max_depth = request.args.get('max_depth', type=int)
+    rows = GenealogyAncestry.get_descendants(tree_id, gramps_id, max_depth=max_depth)
+
+    return jsonify({
+        'gramps_id': gramps_id,
+        'descendants': [{'gramps_id': row.descendant_id, 'depth': row.depth} for row in rows],
+        'count': len(rows)
+    }), 200
+
+@genealogy_bp.route('/imports', methods=['POST'])
+@jwt_required()
+def import_new_tree():
+    """Upload a GEDCOM or Gramps XML file as a new tree; the server picks its id"""
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not current_user:
+        return jsonify({'error': 'User not found'}), 404
+
+    return start_import(current_user, uuid.uuid4().hex, new_tree=True)
+
+@genealogy_bp.route('/trees/<tree_id>/import', methods=['POST'])
+@jwt_required()
+def import_tree(tree_id):
+    """Upload a GEDCOM or Gramps XML file into an existing tree"""
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not current_user:
+        return jsonify({'error': 'User not found'}), 404
+    if not can_access_tree(current_user, tree_id):
+        return jsonify({'error': 'Access to this tree is denied'}), 403
+
+    return start_import(current_user, tree_id, new_tree=False)
+
+def start_import(current_user, tree_id, new_tree):
+    """Store the uploaded file and queue its import; a new tree is owned by the importer"""
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file provided'}), 400
+
+    # Shared by the web and worker containers through MEDIA_UPLOAD_DIR (or GENEALOGY_IMPORT_DIR)
+    imports_dir = GENEALOGY_IMPORT_DIR or os.path.join(media_storage.upload_dir, '.imports')
+    os.makedirs(imports_dir, exist_ok=True)
+    import_id = uuid.uuid4()
+    file_path = os.path.join(imports_dir, f"{import_id.hex}_{secure_filename(file.filename)}")
+
+    # FileStorage.save copies in chunks, the file is never fully held in memory
+    file.save(file_path)
+
+    if os.path.getsize(file_path) > MAX_IMPORT_FILE_SIZE:
+        os.remove(file_path)
+        return jsonify({'error': f'File is too large (max {MAX_IMPORT_FILE_SIZE // (1024*1024)}MB)'}), 400
+
+    source_format = detect_format(file_path, file.filename)
+    if not source_format:
+        os.remove(file_path)
+        return jsonify({'error': 'Unsupported file format, expected GEDCOM or Gramps XML'}), 400
+
+    job = GenealogyImport(
+        id=import_id,
+        tree_id=tree_id,
+        owner_id=current_user.id,
+        source_format=source_format,
+        original_filename=file.filename,
+        file_path=file_path,
+        total_bytes=os.path.getsize(file_path)
+    )
+    db.session.add(job)
+    if new_tree:
+        db.session.add(GenealogyTreeMember(
+            tree_id=tree_id, user_id=current_user.id, role='owner', added_by_id=current_user.id
+        ))
+        if not current_user.gramps_tree_id:
+            current_user.gramps_tree_id = tree_id
+    db.session.commit()
+
+    from app.tasks.genealogy import import_genealogy_file
+    try:
+        import_genealogy_file.delay(str(job.id))
+    except Exception as e:
+        logger.error(f"Failed to enqueue genealogy import {job.id}: {str(e)}")
+        job.status = ImportStatus.FAILED
+        job.error = 'Background worker is unavailable'
+        db.session.commit()
+        os.remove(file_path)
+        return jsonify({'error': 'Import could not be started', 'import': job.to_dict()}), 503
+
+    return jsonify({'import': job.to_dict()}), 202
+
+@genealogy_bp.route('/imports/<import_id>', methods=['GET'])
+@jwt_required()
+def get_import_status(import_id):
+    """Get progress of a genealogy import job"""
+    try:
+        import_uuid = uuid.UUID(import_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid import ID format'}), 400
+
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    job = GenealogyImport.query.get(import_uuid)
+    if not job or not current_user:
+        return jsonify({'error': 'Import not found'}), 404
+
+    if job.owner_id != current_user.id and not current_user.can_admin():
+        return jsonify({'error': 'Import not found'}), 404
+
+    return jsonify({'import': job.to_dict()}), 200
+
+@genealogy_bp.route('/trees/<tree_id>/members', methods=['GET'])
+@jwt_required()
+def get_tree_members(tree_id):
+    """List the members of a tree"""
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not can_access_tree(current_user, tree_id):
+        return jsonify({'error': 'Access to this tree is denied'}), 403
+
+    members = GenealogyTreeMember.query.filter_by(tree_id=tree_id).order_by(GenealogyTreeMember.created_at).all()
+    return jsonify({'members': [member.to_dict() for member in members], 'count': len(members)}), 200
+
+@genealogy_bp.route('/trees/<tree_id>/members/<user_id>', methods=['PUT'])
+@jwt_required()
+def set_tree_member(tree_id, user_id):
+    """Grant a user access to a tree and link them to their person in it
+
+    Only the tree's owner and admins may do this; {"gramps_person_id": "I0001",
+    "role": "member"}. Only admins can make other owners.
+    """
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid user ID format'}), 400
+
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not can_manage_tree(current_user, tree_id):
+        return jsonify({'error': 'Only the tree owner can manage its members'}), 403
+
+    user = User.query.get(user_uuid)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    data = request.get_json() or {}
+    role = data.get('role', 'member')
+    if role not in ('owner', 'member'):
+        return jsonify({'error': 'role must be owner or member'}), 400
+    if role == 'owner' and not current_user.can_admin():
+        return jsonify({'error': 'Only admins can add tree owners'}), 403
+
+    gramps_person_id = data.get('gramps_person_id') or None
+    if gramps_person_id:
+        taken = GenealogyTreeMember.query.filter(
+            GenealogyTreeMember.tree_id == tree_id,
+            GenealogyTreeMember.gramps_person_id == gramps_person_id,
+            GenealogyTreeMember.user_id != user.id
+        ).first()
+        if taken:
+            return jsonify({'error': 'This person is already linked to another user'}), 409
+
+    member = GenealogyTreeMember.get(tree_id, user.id)
+    if not member:
+        member = GenealogyTreeMember(tree_id=tree_id, user_id=user.id, added_by_id=current_user.id)
+        db.session.add(member)
+    member.gramps_person_id = gramps_person_id
+    # Owners keep their role unless an admin changes it
+    if role == 'owner' or member.role != 'owner' or current_user.can_admin():
+        member.role = role
+
+    # Unlink the person the member was linked to before, so only one person resolves to the user
+    previous_persons = GenealogyPerson.query.filter_by(tree_id=tree_id, user_id=user.id)
+    if gramps_person_id:
+        previous_persons = previous_persons.filter(GenealogyPerson.gramps_id != gramps_person_id)
+    previous_persons.update({'user_id': None}, synchronize_session=False)
+
+    if gramps_person_id:
+        user.gramps_tree_id = tree_id
+        user.gramps_person_id = gramps_person_id
+        GenealogyPerson.query.filter_by(tree_id=tree_id, gramps_id=gramps_person_id).update({'user_id': user.id})
+    elif user.gramps_tree_id == tree_id:
+        user.gramps_person_id = None
+
+    db.session.commit()
+    return jsonify({'member': member.to_dict()}), 200
+
+@genealogy_bp.route('/trees/<tree_id>/members/<user_id>', methods=['DELETE'])
+@jwt_required()
+def remove_tree_member(tree_id, user_id):
+    """Revoke a user's access to a tree (members may also leave on their own)"""
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid user ID format'}), 400
+
+    current_user = User.query.get(uuid.UUID(get_jwt_identity()))
+    if not current_user or (current_user.id != user_uuid and not can_manage_tree(current_user, tree_id)):
+        return jsonify({'error': 'Only the tree owner can manage its members'}), 403
+
+    member = GenealogyTreeMember.get(tree_id, user_uuid)
+    if not member:
+        return jsonify({'error': 'Member not found'}), 404
+
+    user = User.query.get(user_uuid)
+    if user and user.gramps_tree_id == tree_id:
+        user.gramps_tree_id = None
+        user.gramps_person_id = None
+    GenealogyPerson.query.filter_by(tree_id=tree_id, user_id=user_uuid).update({'user_id': None})
+    db.session.delete(member)
+    db.session.commit()
+    return jsonify({'message': 'Member removed'}), 200
@@ -1,10 +1,17 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from PIL import Image, UnidentifiedImageError
 from werkzeug.utils import secure_filename
-from app.models import User, Post, Media
+from app.models import User, Post, Media, UploadSession
 from app.services import GrampsMediaService
+from app.services.media_storage import HashingUploadFile, UploadRejected, media_storage
+from app.services.image_variants import image_variants
+from app.services.image_resizer import ResizeRejected, image_resizer
+from app.tasks.media import queue_variant_generation
 from app import db
+from datetime import datetime, timedelta, timezone
 import logging
+import os
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -15,6 +22,12 @@ media_bp = Blueprint('media', __name__)
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Resumable uploads: size clients are told to send, largest chunk accepted
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get('UPLOAD_MAX_CHUNK_SIZE', 4 * 1024 * 1024))
+# Idle time after which an unfinished session is collected
+UPLOAD_SESSION_TTL_SECONDS = int(os.environ.get('UPLOAD_SESSION_TTL_SECONDS', 24 * 3600))
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -41,6 +54,9 @@ def upload_media():
         else:
             return jsonify({'error': 'No users available for demo'}), 400
     
+    # Files past the limit stop being stored while the request is parsed
+    request.max_file_size = MAX_FILE_SIZE
+    
     # Check if files were uploaded
     if 'files' not in request.files:
         return jsonify({'error': 'No files provided'}), 400
@@ -53,58 +69,67 @@ def upload_media():
     errors = []
     gramps_service = GrampsMediaService()
     
+    accepted = []
     for file in files:
         if file and file.filename:
             # Validate file
             if not allowed_file(file.filename):
                 errors.append(f'File {file.filename} has invalid extension')
                 continue
-            
-            # Check file size
-            file.seek(0, 2)  # Seek to end
-            file_size = file.tell()
-            file.seek(0)  # Reset to beginning
-            
-            if file_size > MAX_FILE_SIZE:
-                errors.append(f'File {file.filename} is too large (max 10MB)')
-                continue
-            
+            accepted.append(file)
+    
+    # Size, hash and type were computed while the files were streamed to disk;
+    # moving them into storage runs concurrently on the upload pool
+    results = gramps_service.upload_media_streams([(file.stream, file.filename) for file in accepted], MAX_FILE_SIZE)
+    
+    created = []
+    for file, (result, error) in zip(accepted, results):
+        if isinstance(error, UploadRejected):
+            errors.append(str(error))
+        elif error:
+            errors.append(f'Error uploading {file.filename}: {str(error)}')
+        elif not result:
+            errors.append(f'Failed to upload {file.filename}: Unknown error')
+        else:
+            # Create media record in database
+            media = Media(
+                id=uuid.uuid4(),
+                storage_key=result['filename'],
+                original_filename=result['original_filename'],
+                gramps_url=result['gramps_url'],
+                file_size=result['file_size'],
+                mime_type=result['mime_type'],
+                owner_id=uuid.UUID(str(current_user_id)),
+                gramps_media_id=result.get('gramps_media_id')
+            )
             try:
-                # Upload to Gramps
-                file_data = file.read()
-                file.seek(0)  # Reset file pointer
-                result = gramps_service.upload_media_file(file_data, file.filename, file.content_type)
-                
-                if result:
-                    # Create media record in database
-                    media = Media(
-                        id=str(uuid.uuid4()),
-                        storage_key=result['filename'],
-                        original_filename=result['original_filename'],
-                        gramps_url=result['gramps_url'],
-                        file_size=result['file_size'],
-                        mime_type=result['mime_type'],
-                        owner_id=current_user_id,
-                        gramps_media_id=result.get('gramps_media_id')
-                    )
-                    
-                    db.session.add(media)
-                    db.session.commit()
-                    
-                    uploaded_media.append({
-                        'id': media.id,
-                        'storage_key': media.storage_key,
-                        'original_filename': media.original_filename,
-                        'file_size': media.file_size,
-                        'mime_type': media.mime_type,
-                        'url': result['gramps_url']
-                    })
-                else:
-                    errors.append(f'Failed to upload {file.filename}: Unknown error')
-                    
-            except Exception as e:
-                logger.error(f"Error uploading file {file.filename}: {str(e)}")
-                errors.append(f'Error uploading {file.filename}: {str(e)}')
+                media.attach_blob(result['sha256'])
+            except UploadRejected as e:
+                errors.append(str(e))
+                continue
+            db.session.add(media)
+            created.append((media, result))
+    
+    # All rows in one transaction
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving uploaded media: {str(e)}")
+        errors.extend(f'Error uploading {result["original_filename"]}: {str(e)}' for _, result in created)
+        created = []
+    
+    for media, result in created:
+        if not media.variants:
+            queue_variant_generation(media)
+        uploaded_media.append({
+            'id': str(media.id),
+            'storage_key': media.storage_key,
+            'original_filename': media.original_filename,
+            'file_size': media.file_size,
+            'mime_type': media.mime_type,
+            'url': result['gramps_url']
+        })
     
     return jsonify({
         'success': len(uploaded_media) > 0,
@@ -118,13 +143,21 @@ def upload_media_to_post(post_id):
     """Upload media files to a post"""
     current_user_id = get_jwt_identity()
     
+    try:
+        post_uuid = uuid.UUID(post_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid post ID format'}), 400
+    
     # Verify post exists
-    post = Post.query.get_or_404(post_id)
+    post = Post.query.get_or_404(post_uuid)
     
     # Check if user can upload to this post (post author only)
     if str(post.author_id) != current_user_id:
         return jsonify({'error': 'Unauthorized - only post author can upload media'}), 403
     
+    # Files past the limit stop being stored while the request is parsed
+    request.max_file_size = MAX_FILE_SIZE
+    
     # Check if files were uploaded
     if 'files' not in request.files:
         return jsonify({'error': 'No files provided'}), 400
@@ -137,58 +170,64 @@ def upload_media_to_post(post_id):
     errors = []
     gramps_service = GrampsMediaService()
     
+    accepted = []
     for file in files:
         if file and file.filename:
             # Validate file
             if not allowed_file(file.filename):
                 errors.append(f"File '{file.filename}' has unsupported format")
                 continue
-            
-            # Check file size
-            file.seek(0, 2)  # Seek to end
-            file_size = file.tell()
-            file.seek(0)  # Reset to beginning
-            
-            if file_size > MAX_FILE_SIZE:
-                errors.append(f"File '{file.filename}' is too large (max {MAX_FILE_SIZE // (1024*1024)}MB)")
-                continue
-            
+            accepted.append(file)
+    
+    # Moved into storage from the temp files the request parser wrote, concurrently
+    results = gramps_service.upload_media_streams([(file.stream, file.filename) for file in accepted], MAX_FILE_SIZE)
+    
+    created = []
+    for file, (upload_result, error) in zip(accepted, results):
+        if isinstance(error, UploadRejected):
+            errors.append(str(error))
+        elif error:
+            errors.append(f"Error uploading '{file.filename}': {str(error)}")
+        elif not upload_result:
+            errors.append(f"Failed to upload '{file.filename}' to Gramps")
+        else:
+            # Save media info to database
+            media = Media(
+                storage_key=upload_result['filename'],
+                original_filename=upload_result['original_filename'],
+                mime_type=upload_result['mime_type'],
+                file_size=upload_result['file_size'],
+                gramps_media_id=upload_result['gramps_media_id'],
+                gramps_url=upload_result['gramps_url'],
+                post_id=post.id,
+                owner_id=uuid.UUID(current_user_id)
+            )
             try:
-                # Read file data
-                file_data = file.read()
-                file.seek(0)  # Reset for potential re-reading
-                
-                # Upload to Gramps
-                upload_result = gramps_service.upload_media_file(
-                    file_data=file_data,
-                    filename=file.filename,
-                    mime_type=file.content_type or 'application/octet-stream'
-                )
-                
-                if upload_result:
-                    # Save media info to database
-                    media = Media(
-                        storage_key=upload_result['filename'],
-                        original_filename=upload_result['original_filename'],
-                        mime_type=upload_result['mime_type'],
-                        file_size=upload_result['file_size'],
-                        gramps_media_id=upload_result['gramps_media_id'],
-                        gramps_url=upload_result['gramps_url'],
-                        post_id=post_id,
-                        owner_id=current_user_id
-                    )
-                    
-                    db.session.add(media)
-                    db.session.commit()
-                    
-                    uploaded_media.append(media.to_dict())
-                    logger.info(f"Successfully uploaded media for post {post_id}: {file.filename}")
-                else:
-                    errors.append(f"Failed to upload '{file.filename}' to Gramps")
-                    
-            except Exception as e:
-                logger.error(f"Error uploading file '{file.filename}': {str(e)}")
-                errors.append(f"Error uploading '{file.filename}': {str(e)}")
+                media.attach_blob(upload_result['sha256'])
+            except UploadRejected as e:
+                errors.append(str(e))
+                continue
+            db.session.add(media)
+            created.append(media)
+    
+    # All rows and the post's media snapshot in one transaction
+    try:
+        db.session.flush()
+        if created:
+            # Feeds render the post's media snapshot; variants refresh it later
+            post.media = (post.media or []) + [media.to_dict() for media in created]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving media for post {post_id}: {str(e)}")
+        errors.extend(f"Error uploading '{media.original_filename}': {str(e)}" for media in created)
+        created = []
+    
+    for media in created:
+        if not media.variants:
+            queue_variant_generation(media)
+        uploaded_media.append(media.to_dict())
+        logger.info(f"Successfully uploaded media for post {post_id}: {media.original_filename}")
     
     # Prepare response
     response_data = {
@@ -202,6 +241,206 @@ def upload_media_to_post(post_id):
     status_code = 201 if uploaded_media else 400
     return jsonify(response_data), status_code
 
+def _get_upload_session(session_id, current_user_id):
+    """Upload session of the current user, or an error response"""
+    try:
+        session_uuid = uuid.UUID(session_id)
+    except ValueError:
+        return None, (jsonify({'error': 'Invalid upload session ID format'}), 400)
+    
+    session = UploadSession.query.get(session_uuid)
+    if not session or str(session.owner_id) != current_user_id:
+        return None, (jsonify({'error': 'Upload session not found'}), 404)
+    expires_at = session.expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    if expires_at < datetime.now(timezone.utc):
+        return None, (jsonify({'error': 'Upload session expired'}), 410)
+    return session, None
+
+@media_bp.route('/upload-sessions', methods=['POST'])
+@jwt_required()
+def create_upload_session():
+    """
+    Start a resumable upload
+    
+    The client then PUTs the file in chunks to /upload-sessions/<id>, each
+    with an Upload-Offset and an X-Chunk-SHA256 header, and finalizes it.
+    After a dropped connection, GET /upload-sessions/<id> tells where to
+    resume.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    
+    filename = data.get('filename')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File has unsupported format'}), 400
+    
+    total_size = data.get('size')
+    if not isinstance(total_size, int) or total_size <= 0:
+        return jsonify({'error': 'File size is required'}), 400
+    if total_size > MAX_FILE_SIZE:
+        return jsonify({'error': f'File {filename} is too large (max {MAX_FILE_SIZE // (1024 * 1024)}MB)'}), 400
+    
+    post_id = None
+    if data.get('post_id'):
+        try:
+            post_id = uuid.UUID(data['post_id'])
+        except ValueError:
+            return jsonify({'error': 'Invalid post ID format'}), 400
+        post = Post.query.get_or_404(post_id)
+        if str(post.author_id) != current_user_id:
+            return jsonify({'error': 'Unauthorized - only post author can upload media'}), 403
+    
+    session = UploadSession(
+        owner_id=uuid.UUID(current_user_id),
+        post_id=post_id,
+        filename=secure_filename(filename) or 'upload',
+        total_size=total_size,
+        received_size=0,
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+    )
+    db.session.add(session)
+    db.session.commit()
+    media_storage.create_partial(session.id)
+    
+    return jsonify({**session.to_dict(), 'chunk_size': UPLOAD_CHUNK_SIZE}), 201
+
+@media_bp.route('/upload-sessions/<session_id>', methods=['GET'])
+@jwt_required()
+def get_upload_session(session_id):
+    """State of a resumable upload; offset is where the next chunk starts"""
+    session, error = _get_upload_session(session_id, get_jwt_identity())
+    if error:
+        return error
+    return jsonify({**session.to_dict(), 'chunk_size': UPLOAD_CHUNK_SIZE}), 200
+
+@media_bp.route('/upload-sessions/<session_id>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(session_id):
+    """Store the chunk in the request body at the Upload-Offset header"""
+    session, error = _get_upload_session(session_id, get_jwt_identity())
+    if error:
+        return error
+    if session.status != 'active':
+        return jsonify({'error': 'Upload session is already finalized'}), 409
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    checksum = request.headers.get('X-Chunk-SHA256', '')
+    if len(checksum) != 64:
+        return jsonify({'error': 'X-Chunk-SHA256 header is required'}), 400
+    if offset != session.received_size:
+        # A retried chunk that was stored already, or one sent out of order
+        return jsonify({'error': 'Offset does not match the upload', 'offset': session.received_size}), 409
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    
+    max_size = min(UPLOAD_MAX_CHUNK_SIZE, session.total_size - offset)
+    try:
+        written = media_storage.write_chunk(session.id, offset, request.stream, max_size, checksum)
+    except UploadRejected as e:
+        return jsonify({'error': str(e), 'offset': offset}), 400
+    except BlockingIOError:
+        return jsonify({'error': 'Another chunk of this upload is being stored', 'offset': offset}), 409
+    except FileNotFoundError:
+        return jsonify({'error': 'Upload session expired'}), 410
+    
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+    if not UploadSession.advance(session.id, offset, offset + written, expires_at):
+        db.session.rollback()
+        return jsonify({'error': 'Offset does not match the upload'}), 409
+    db.session.commit()
+    
+    return jsonify({'offset': offset + written, 'total_size': session.total_size}), 200
+
+@media_bp.route('/upload-sessions/<session_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_upload_session(session_id):
+    """Turn a fully received upload into a media file"""
+    current_user_id = get_jwt_identity()
+    session, error = _get_upload_session(session_id, current_user_id)
+    if error:
+        return error
+    
+    if session.status == 'completed':
+        # Finalize was retried after a lost response
+        media = Media.query.get(session.media_id) if session.media_id else None
+        if media:
+            return jsonify(media.to_dict()), 200
+    if session.received_size != session.total_size:
+        return jsonify({'error': 'Upload is incomplete', 'offset': session.received_size}), 409
+    if not UploadSession.claim_for_finalize(session.id):
+        db.session.rollback()
+        return jsonify({'error': 'Upload session is already being finalized'}), 409
+    db.session.commit()
+    
+    def discard(message, status_code):
+        db.session.rollback()
+        UploadSession.query.filter_by(id=session.id).delete()
+        db.session.commit()
+        media_storage.remove_partial(session.id)
+        return jsonify({'error': message}), status_code
+    
+    try:
+        # The chunks are already one file: it is hashed in place and renamed into storage
+        upload = HashingUploadFile.adopt(media_storage.partial_path(session.id), MAX_FILE_SIZE)
+    except FileNotFoundError:
+        return discard('Upload session expired', 410)
+    
+    try:
+        result = GrampsMediaService().upload_media_stream(upload, session.filename, MAX_FILE_SIZE)
+        if not result:
+            return discard(f"Failed to upload '{session.filename}'", 500)
+        
+        media = Media(
+            storage_key=result['filename'],
+            original_filename=result['original_filename'],
+            mime_type=result['mime_type'],
+            file_size=result['file_size'],
+            gramps_media_id=result['gramps_media_id'],
+            gramps_url=result['gramps_url'],
+            post_id=session.post_id,
+            owner_id=session.owner_id
+        )
+        media.attach_blob(result['sha256'])
+        db.session.add(media)
+        db.session.flush()
+        
+        if session.post_id:
+            post = Post.query.get(session.post_id)
+            if post:
+                post.media = (post.media or []) + [media.to_dict()]
+        session.status = 'completed'
+        session.media_id = media.id
+        db.session.commit()
+    except UploadRejected as e:
+        return discard(str(e), 400)
+    finally:
+        upload.close()
+    
+    if not media.variants:
+        queue_variant_generation(media)
+    logger.info(f"Finalized resumable upload {session.id}: {session.filename}")
+    return jsonify(media.to_dict()), 201
+
+@media_bp.route('/upload-sessions/<session_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload_session(session_id):
+    """Abandon a resumable upload"""
+    session, error = _get_upload_session(session_id, get_jwt_identity())
+    if error:
+        return error
+    if session.status != 'active':
+        return jsonify({'error': 'Upload session is already finalized'}), 409
+    
+    db.session.delete(session)
+    db.session.commit()
+    media_storage.remove_partial(session.id)
+    return jsonify({'message': 'Upload session cancelled'}), 200
+
 @media_bp.route('/posts/<post_id>/media', methods=['GET'])
 @jwt_required()
 def get_post_media(post_id):
@@ -241,6 +480,11 @@ def delete_media(media_id):
         logger.warning(f"Failed to delete media from local storage: {media.storage_key}")
         # Continue with database deletion anyway
     
+    if not media.blob_id:
+        # Variants of deduplicated media belong to the shared blob
+        image_variants.delete(media)
+        image_resizer.purge(media.storage_key)
+    
     # Delete from database
     db.session.delete(media)
     db.session.commit()
@@ -262,12 +506,59 @@ def get_media_url(media_id):
     else:
         return jsonify({'error': 'Media URL not available'}), 404
 
-@media_bp.route('/uploads/<filename>', methods=['GET'])
+@media_bp.route('/media/<media_id>/file', methods=['GET'])
+def get_media_file(media_id):
+    """
+    Serve the original file, a generated variant (?variant=) or a resized
+    copy (?w=&h=&fmt=, sizes rounded up to the allowed ones)
+    """
+    try:
+        media_uuid = uuid.UUID(media_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid media ID format'}), 400
+    
+    media = Media.query.get_or_404(media_uuid)
+    storage_key, mime_type = media.storage_key, media.mime_type
+    
+    variant_name = request.args.get('variant')
+    if variant_name:
+        variant = (media.variants or {}).get(variant_name)
+        if not variant:
+            return jsonify({'error': 'Variant not found'}), 404
+        files = variant['files']
+        # AVIF is smaller still, for browsers that say they accept it
+        image_format = 'avif' if 'avif' in files and request.accept_mimetypes['image/avif'] else 'webp'
+        storage_key, mime_type = files[image_format]['storage_key'], f'image/{image_format}'
+    elif request.args.get('w') or request.args.get('h'):
+        image_format = request.args.get('fmt')
+        if not image_format:
+            image_format = 'avif' if 'avif' in image_resizer.formats and request.accept_mimetypes['image/avif'] else 'webp'
+        try:
+            storage_key = image_resizer.get(
+                storage_key,
+                image_resizer.snap(request.args.get('w')),
+                image_resizer.snap(request.args.get('h')),
+                image_format
+            )
+        except ResizeRejected as e:
+            return jsonify({'error': str(e)}), 400
+        except FileNotFoundError:
+            return jsonify({'error': 'Media file not found'}), 404
+        except (UnidentifiedImageError, Image.DecompressionBombError):
+            return jsonify({'error': 'Media file cannot be resized'}), 400
+        mime_type = f'image/{image_format}'
+        # An explicit format pins the bytes of this URL for good
+        if request.args.get('fmt'):
+            return media_storage.send(storage_key, mimetype=mime_type, immutable=True)
+    
+    # The URL stays the same when variants are regenerated: revalidate by ETag
+    response = media_storage.send(storage_key, mimetype=mime_type, immutable=False)
+    response.vary.add('Accept')
+    return response
+
+@media_bp.route('/uploads/<path:filename>', methods=['GET'])
 def serve_uploaded_file(filename):
-    """Serve uploaded media files"""
-    from flask import send_from_directory
-    import os
-    uploads_dir = os.path.join(os.getcwd(), 'uploads')
-    return send_from_directory(uploads_dir, filename)
+    """Serve uploaded media files (sharded keys and old flat names alike)"""
+    return media_storage.send(filename)
 
 
@@ -1,87 +1,244 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.notification import Notification
 from app.models.user import User
-from datetime import datetime
+from app.models.follow import Follow
+from app.services.notification_counter import unread_counter
+from app.services.realtime import realtime_hub, stream_id_key
+from app.services.redis_client import get_redis
+from sqlalchemy import or_, and_
+from datetime import datetime, timezone
+import base64
+import json
+import logging
+import os
+import queue
+import secrets
+import time
+import uuid
+import redis
+
+logger = logging.getLogger(__name__)
 
 notifications_bp = Blueprint('notifications', __name__)
 
+MAX_NOTIFICATIONS_PAGE = 100
+
+SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+SSE_MAX_DURATION = int(os.environ.get('SSE_MAX_DURATION', 3600))  # Clients reconnect with Last-Event-ID
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+
+STREAM_TICKET_PREFIX = 'sse_ticket:'
+STREAM_TICKET_TTL = int(os.environ.get('SSE_TICKET_TTL', 60))
+
+def encode_cursor(notification):
+    """Opaque keyset cursor pointing after the given notification"""
+    raw = f"{notification.updated_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Return (updated_at, id) from a cursor, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        updated_at, notification_id = raw.split('|', 1)
+        return datetime.fromisoformat(updated_at), uuid.UUID(notification_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def format_sse(data, event=None, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    for line in (data or '').splitlines() or ['']:
+        lines.append(f'data: {line}')
+    return '\n'.join(lines) + '\n\n'
+
 @notifications_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_notifications():
-    """Get notifications for current user"""
-    current_user_id = get_jwt_identity()
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    """Get notifications for current user, newest activity first
+    
+    Keyset paginated: pass the returned next_cursor as ?cursor= for the next page.
+    """
+    current_user_id = uuid.UUID(get_jwt_identity())
+    limit = request.args.get('limit', request.args.get('per_page', 20, type=int), type=int)
+    limit = min(max(limit, 1), MAX_NOTIFICATIONS_PAGE)
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
+    cursor = request.args.get('cursor')
     
     query = Notification.query.filter_by(user_id=current_user_id)
     
     if unread_only:
-        query = query.filter_by(is_read=False)
+        query = query.filter_by(read=False)
+    
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        updated_at, notification_id = position
+        query = query.filter(or_(
+            Notification.updated_at < updated_at,
+            and_(Notification.updated_at == updated_at, Notification.id < notification_id)
+        ))
+    elif request.args.get('page', type=int, default=1) > 1:
+        # Legacy offset pagination
+        query = query.offset((request.args.get('page', type=int) - 1) * limit)
+    
+    notifications = query.order_by(
+        Notification.updated_at.desc(), Notification.id.desc()
+    ).limit(limit + 1).all()
     
-    notifications = query.order_by(Notification.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    has_more = len(notifications) > limit
+    notifications = notifications[:limit]
+    
+    # Hydrate every actor on the page with a single query
+    actor_ids = set()
+    for notification in notifications:
+        actor_ids.add(notification.actor_id)
+        actor_ids.update(uuid.UUID(actor_id) for actor_id in notification.actor_sample or [])
+    actors = User.get_summaries(actor_ids)
     
     notifications_data = []
-    for notification in notifications.items:
+    for notification in notifications:
         notification_dict = notification.to_dict()
-        
-        # Add additional user information if available
-        if notification.data and 'follower_id' in notification.data:
-            user = User.query.get(notification.data['follower_id'])
-            if user:
-                notification_dict['follower'] = user.to_dict()
-        
-        if notification.data and 'requester_id' in notification.data:
-            user = User.query.get(notification.data['requester_id'])
-            if user:
-                notification_dict['requester'] = user.to_dict()
-        
-        if notification.data and 'accepter_id' in notification.data:
-            user = User.query.get(notification.data['accepter_id'])
-            if user:
-                notification_dict['accepter'] = user.to_dict()
-        
+        notification_dict['actor'] = actors.get(notification.actor_id)
+        notification_dict['actors'] = [
+            actors[uuid.UUID(actor_id)] for actor_id in notification_dict['actor_sample']
+            if uuid.UUID(actor_id) in actors
+        ]
         notifications_data.append(notification_dict)
     
     return jsonify({
         'notifications': notifications_data,
-        'total': notifications.total,
-        'pages': notifications.pages,
-        'current_page': page
+        'has_more': has_more,
+        'next_cursor': encode_cursor(notifications[-1]) if has_more else None
     }), 200
 
 @notifications_bp.route('/unread-count', methods=['GET'])
 @jwt_required()
 def get_unread_count():
     """Get unread notifications count for current user"""
-    current_user_id = get_jwt_identity()
+    current_user_id = uuid.UUID(get_jwt_identity())
     
-    count = Notification.query.filter_by(
-        user_id=current_user_id,
-        is_read=False
-    ).count()
+    count = Notification.get_unread_count(current_user_id)
     
     return jsonify({'unread_count': count}), 200
 
-@notifications_bp.route('/mark-read/<int:notification_id>', methods=['POST'])
+@notifications_bp.route('/stream/ticket', methods=['POST'])
+@jwt_required()
+def create_stream_ticket():
+    """Issue a short-lived, single-use ticket for opening the notification stream
+    
+    EventSource cannot set headers; the ticket goes into the stream URL
+    instead of the access token, so tokens never end up in access logs.
+    """
+    ticket = secrets.token_urlsafe(32)
+    try:
+        get_redis().set(f'{STREAM_TICKET_PREFIX}{ticket}', get_jwt_identity(), ex=STREAM_TICKET_TTL)
+    except redis.RedisError:
+        return jsonify({'error': 'Real-time updates are unavailable'}), 503
+    
+    return jsonify({'ticket': ticket, 'expires_in': STREAM_TICKET_TTL}), 201
+
+def redeem_stream_ticket(ticket):
+    """User id a stream ticket was issued to, or None; a ticket works once"""
+    key = f'{STREAM_TICKET_PREFIX}{ticket}'
+    pipe = get_redis().pipeline()
+    pipe.get(key)
+    pipe.delete(key)
+    user_id, _ = pipe.execute()
+    return user_id
+
+@notifications_bp.route('/stream', methods=['GET'])
+@jwt_required(optional=True)
+def stream_notifications():
+    """Stream notifications, unread count changes and new post hints (SSE)
+    
+    EventSource cannot set headers, so browsers pass ?ticket= from
+    POST /stream/ticket. Missed notifications are replayed from the
+    Last-Event-ID header.
+    """
+    identity = get_jwt_identity()
+    if not identity and request.args.get('ticket'):
+        try:
+            identity = redeem_stream_ticket(request.args['ticket'])
+        except redis.RedisError:
+            return jsonify({'error': 'Real-time updates are unavailable'}), 503
+    if not identity:
+        return jsonify({'error': 'Authorization required'}), 401
+    current_user_id = uuid.UUID(identity)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    try:
+        get_redis().ping()
+    except redis.RedisError:
+        return jsonify({'error': 'Real-time updates are unavailable'}), 503
+    
+    following_ids = [
+        followed_id for (followed_id,) in
+        db.session.query(Follow.followed_id).filter_by(follower_id=current_user_id)
+    ]
+    unread_count = Notification.get_unread_count(current_user_id)
+    # Do not hold a database connection for the lifetime of the stream
+    db.session.remove()
+    
+    connection = realtime_hub.subscribe(current_user_id, following_ids)
+    
+    def generate():
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        
+        # Subscribed before replaying, so nothing falls in between
+        replayed_up_to = None
+        if last_event_id:
+            for event in realtime_hub.replay(current_user_id, last_event_id):
+                replayed_up_to = stream_id_key(event['id'])
+                yield format_sse(event['data'], event['event'], event['id'])
+        
+        yield format_sse(json.dumps({'unread_count': unread_count}), 'unread_count')
+        
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        while time.monotonic() < deadline and not connection.overflowed:
+            try:
+                message = connection.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            
+            event_id = message.get('id')
+            if event_id and replayed_up_to and stream_id_key(event_id) <= replayed_up_to:
+                continue
+            yield format_sse(message.get('data'), message.get('event'), event_id)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable nginx proxy buffering
+    response.call_on_close(lambda: realtime_hub.unsubscribe(current_user_id, connection))
+    return response
+
+@notifications_bp.route('/mark-read/<notification_id>', methods=['POST'])
 @jwt_required()
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
-    current_user_id = get_jwt_identity()
+    try:
+        notification_uuid = uuid.UUID(notification_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid notification ID format'}), 400
+    
+    current_user_id = uuid.UUID(get_jwt_identity())
     
     notification = Notification.query.filter_by(
-        id=notification_id,
+        id=notification_uuid,
         user_id=current_user_id
     ).first()
     
     if not notification:
         return jsonify({'error': 'Notification not found'}), 404
     
-    notification.is_read = True
+    notification.mark_as_read()
     db.session.commit()
     
     return jsonify({'message': 'Notification marked as read'}), 200
@@ -90,31 +247,34 @@ def mark_notification_read(notification_id):
 @jwt_required()
 def mark_all_notifications_read():
     """Mark all notifications as read for current user"""
-    current_user_id = get_jwt_identity()
-    
-    Notification.query.filter_by(
-        user_id=current_user_id,
-        is_read=False
-    ).update({'is_read': True})
+    current_user_id = uuid.UUID(get_jwt_identity())
     
+    Notification.mark_all_as_read(current_user_id)
     db.session.commit()
     
     return jsonify({'message': 'All notifications marked as read'}), 200
 
-@notifications_bp.route('/delete/<int:notification_id>', methods=['DELETE'])
+@notifications_bp.route('/delete/<notification_id>', methods=['DELETE'])
 @jwt_required()
 def delete_notification(notification_id):
     """Delete a notification"""
-    current_user_id = get_jwt_identity()
+    try:
+        notification_uuid = uuid.UUID(notification_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid notification ID format'}), 400
+    
+    current_user_id = uuid.UUID(get_jwt_identity())
     
     notification = Notification.query.filter_by(
-        id=notification_id,
+        id=notification_uuid,
         user_id=current_user_id
     ).first()
     
     if not notification:
         return jsonify({'error': 'Notification not found'}), 404
     
+    if not notification.read:
+        unread_counter.queue_delta(current_user_id, -1)
     db.session.delete(notification)
     db.session.commit()
     
@@ -123,13 +283,27 @@ def delete_notification(notification_id):
 @notifications_bp.route('/delete-all', methods=['DELETE'])
 @jwt_required()
 def delete_all_notifications():
-    """Delete all notifications for current user"""
-    current_user_id = get_jwt_identity()
+    """Delete all notifications for current user
     
-    Notification.query.filter_by(user_id=current_user_id).delete()
-    db.session.commit()
+    Heavy users can have many thousands of rows, so they are deleted by a
+    background job in small batches. Notifications that arrive (or are
+    updated with new actors) after the request are kept.
+    """
+    current_user_id = uuid.UUID(get_jwt_identity())
+    before = datetime.now(timezone.utc)
     
-    return jsonify({'message': 'All notifications deleted successfully'}), 200
+    from app.tasks.notifications import delete_user_notifications
+    try:
+        job = delete_user_notifications.delay(str(current_user_id), before.isoformat())
+    except Exception as e:
+        logger.error(f"Failed to enqueue notification deletion for {current_user_id}: {str(e)}")
+        return jsonify({'error': 'Notifications could not be deleted, please try again later'}), 503
+    
+    return jsonify({
+        'message': 'Notifications are being deleted',
+        'job_id': job.id,
+        'before': before.isoformat()
+    }), 202
 
 @notifications_bp.route('/types', methods=['GET'])
 def get_notification_types():
@@ -1,13 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import User, Post, Like, Comment, Media, PostPrivacy
-from app.models.notification import Notification
+from app.models.outbox import OutboxEvent
 from app.services import GrampsMediaService
 from app import db
 import uuid
 
 posts_bp = Blueprint('posts', __name__)
 
+def emit_mentions(post, user_ids):
+    """Notify newly mentioned users after commit; private posts notify nobody"""
+    if user_ids and post.privacy != PostPrivacy.PRIVATE:
+        OutboxEvent.emit('post.mentioned', author_id=post.author_id, post_id=post.id,
+                         user_ids=[str(user_id) for user_id in user_ids])
+
 @posts_bp.route('/', methods=['GET'])
 def get_posts():
     """Get all public posts (no auth required for demo)"""
@@ -97,11 +103,17 @@ def create_post():
         media=data.get('media', [])
     )
     
-    # Extract hashtags and mentions from caption
-    post.hashtags = post.extract_hashtags()
-    post.mentions = post.extract_mentions()
+    # Extract hashtags and mentions from caption, resolving mentioned usernames
+    mentioned_ids = post.update_hashtags_and_mentions()
     
     db.session.add(post)
+    db.session.flush()
+    
+    # Tell followers' open feeds that something new is available
+    if post.privacy == PostPrivacy.PUBLIC:
+        OutboxEvent.emit('post.created', author_id=post.author_id, post_id=post.id)
+    emit_mentions(post, mentioned_ids)
+    
     db.session.commit()
     
     # Get current user object for requesting_user
@@ -138,10 +150,11 @@ def update_post(post_id):
     current_user_id = get_jwt_identity()
     post = Post.query.get_or_404(post_uuid)
     
-    if post.author_id != current_user_id:
+    if post.author_id != uuid.UUID(current_user_id):
         return jsonify({'error': 'You can only edit your own posts'}), 403
     
     data = request.get_json()
+    mentioned_ids = []
     
     if 'caption' in data:
         if not data['caption'].strip():
@@ -151,7 +164,7 @@ def update_post(post_id):
         post.caption = data['caption'].strip()
         post.is_edited = True
         post.edit_count += 1
-        post.update_hashtags_and_mentions()
+        mentioned_ids = post.update_hashtags_and_mentions()
     
     if 'privacy' in data:
         try:
@@ -162,6 +175,7 @@ def update_post(post_id):
     if 'media' in data:
         post.media = data['media']
     
+    emit_mentions(post, mentioned_ids)
     db.session.commit()
     return jsonify(post.to_dict(requesting_user=current_user_id)), 200
 
@@ -219,18 +233,11 @@ def like_post(post_id):
     # Toggle like using the model method
     is_liked, action = Like.toggle_like(current_user_id, post_uuid)
     
-    db.session.commit()
+    # Notify the post author from the outbox, committed together with the like
+    if is_liked and str(post.author_id) != str(current_user_id):
+        OutboxEvent.emit('post.liked', author_id=post.author_id, actor_id=str(current_user_id), post_id=post_uuid)
     
-    # Create notification for the post author (if liked)
-    if is_liked and post.author_id != current_user_id:
-        Notification.create_notification(
-            user_id=post.author_id,
-            notification_type='like',
-            actor_id=current_user_id,
-            target_id=post_uuid,
-            payload={'post_id': str(post_uuid)}
-        )
-        db.session.commit()
+    db.session.commit()
     
     return jsonify({
         'message': f'Post {action} successfully',
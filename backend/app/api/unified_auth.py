@@ -4,11 +4,12 @@ from app import db
 from sqlalchemy.sql import func
 from app.models.user import User
 from app.models.code import Code
-from app.services.sms_service import sms_service
-from app.services.email_service import email_service
+from app.tasks.auth_codes import queue_code_delivery, undelivered_cutoff
 from app.services.rate_limiter import rate_limiter
+from app.services.phone_numbers import normalize_phone_number
 import logging
 import re
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -32,21 +33,7 @@ def detect_identifier_type(identifier: str) -> str:
 
 def format_phone_number(phone: str) -> str:
     """Format phone number to international format"""
-    # Remove all non-digit characters
-    digits = re.sub(r'\D', '', phone)
-    
-    # Handle different formats
-    if digits.startswith('8') and len(digits) == 11:
-        # Russian format: 8XXXXXXXXXX -> +7XXXXXXXXX
-        digits = '7' + digits[1:]
-    elif digits.startswith('7') and len(digits) == 11:
-        # Already in correct format
-        pass
-    elif len(digits) == 10:
-        # Add country code
-        digits = '7' + digits
-    
-    return '+' + digits
+    return normalize_phone_number(phone)
 
 @unified_auth_bp.route('/request-code', methods=['POST'])
 def request_code():
@@ -113,27 +100,13 @@ def request_code():
         db.session.add(verification_code)
         db.session.commit()
         
-        # Send code
-        if identifier_type == 'phone':
-            # SMS sending
-            # Always send through Mobizon API
-            logger.info(f"Attempting to send SMS to {formatted_identifier} with code {plain_code}")
-            success = sms_service.send_verification_code(formatted_identifier, plain_code)
-            logger.info(f"SMS sending result: {success}")
-            # Also log for test number
-            if formatted_identifier == '+77019990438':  # Test number
-                logger.info(f"TEST SMS CODE for {formatted_identifier}: {plain_code}")
-        else:
-            # Email sending
-            success = email_service.send_verification_code(formatted_identifier, plain_code)
-        
-        if not success:
-            # If sending failed, remove the code
-            db.session.delete(verification_code)
-            db.session.commit()
-            return jsonify({'error': f'Failed to send {identifier_type} verification code'}), 500
+        # Delivery runs on the code delivery queue; clients poll /code-status for the result
+        if not queue_code_delivery(verification_code, plain_code):
+            return jsonify({'error': f'Failed to send {identifier_type} verification code'}), 503
         
-        logger.info(f"Code sent successfully to {formatted_identifier}")
+        # Also log for test number
+        if formatted_identifier == '+77019990438':  # Test number
+            logger.info(f"TEST SMS CODE for {formatted_identifier}: {plain_code}")
         
         return jsonify({
             'success': True,
@@ -141,6 +114,8 @@ def request_code():
             'type': identifier_type,
             'is_new_user': is_new_user,
             'has_existing_code': False,
+            'code_id': str(verification_code.id),
+            'delivery_status': verification_code.delivery_status,
             'message': f'Verification code sent to {identifier_type}'
         }), 200
         
@@ -249,28 +224,18 @@ def resend_code():
         db.session.add(verification_code)
         db.session.commit()
         
-        # Send code
-        if identifier_type == 'phone':
-            # SMS sending
-            # Always send through Mobizon API
-            logger.info(f"Attempting to send SMS to {formatted_identifier} with code {plain_code}")
-            success = sms_service.send_verification_code(formatted_identifier, plain_code)
-            logger.info(f"SMS sending result: {success}")
-            # Also log for test number
-            if formatted_identifier == '+77019990438':  # Test number
-                logger.info(f"TEST SMS CODE for {formatted_identifier}: {plain_code}")
-        else:
-            # Email sending
-            success = email_service.send_verification_code(formatted_identifier, plain_code)
+        # Delivery runs on the code delivery queue; clients poll /code-status for the result
+        if not queue_code_delivery(verification_code, plain_code):
+            return jsonify({'error': f'Failed to send {identifier_type} verification code'}), 503
         
-        if not success:
-            # If sending failed, remove the code
-            db.session.delete(verification_code)
-            db.session.commit()
-            return jsonify({'error': f'Failed to send {identifier_type} verification code'}), 500
+        # Also log for test number
+        if formatted_identifier == '+77019990438':  # Test number
+            logger.info(f"TEST SMS CODE for {formatted_identifier}: {plain_code}")
         
         response_data = {
             'success': True,
+            'code_id': str(verification_code.id),
+            'delivery_status': verification_code.delivery_status,
             'message': f'New verification code sent to {identifier_type}'
         }
         
@@ -320,32 +285,21 @@ def force_send_code():
         db.session.add(verification_code)
         db.session.commit()
         
-        # Send code
-        if identifier_type == 'phone':
-            # SMS sending
-            logger.info(f"Force sending SMS to {formatted_identifier} with code {plain_code}")
-            success = sms_service.send_verification_code(formatted_identifier, plain_code)
-            logger.info(f"SMS sending result: {success}")
-            # Also log for test number
-            if formatted_identifier == '+77019990438':  # Test number
-                logger.info(f"TEST SMS CODE for {formatted_identifier}: {plain_code}")
-        else:
-            # Email sending
-            success = email_service.send_verification_code(formatted_identifier, plain_code)
+        # Delivery runs on the code delivery queue; clients poll /code-status for the result
+        if not queue_code_delivery(verification_code, plain_code):
+            return jsonify({'error': f'Failed to send {identifier_type} verification code'}), 503
         
-        if not success:
-            # If sending failed, remove the code
-            db.session.delete(verification_code)
-            db.session.commit()
-            return jsonify({
-                'error': f'Failed to send {identifier_type} verification code'
-            }), 500
+        # Also log for test number
+        if formatted_identifier == '+77019990438':  # Test number
+            logger.info(f"TEST SMS CODE for {formatted_identifier}: {plain_code}")
         
         return jsonify({
             'success': True,
             'identifier': formatted_identifier,
             'type': identifier_type,
             'is_new_user': is_new_user,
+            'code_id': str(verification_code.id),
+            'delivery_status': verification_code.delivery_status,
             'message': f'Verification code sent to {identifier_type}'
         }), 200
         
@@ -354,6 +308,35 @@ def force_send_code():
         db.session.rollback()
         return jsonify({'error': 'Internal server error'}), 500
 
+@unified_auth_bp.route('/code-status/<code_id>', methods=['GET'])
+def get_code_status(code_id):
+    """Delivery status of a requested verification code"""
+    try:
+        code_uuid = uuid.UUID(code_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid code ID format'}), 400
+    
+    code = Code.query.get(code_uuid)
+    if not code:
+        return jsonify({'error': 'Code not found'}), 404
+    
+    # The delivery task may have expired in the queue without ever running
+    if code.delivery_status == 'pending' and Code.fail_undelivered(undelivered_cutoff(), code_id=code.id):
+        db.session.commit()
+        db.session.refresh(code)
+    
+    response_data = {
+        'code_id': str(code.id),
+        'type': code.type,
+        'delivery_status': code.delivery_status,
+        'delivered_at': code.delivered_at.isoformat() if code.delivered_at else None
+    }
+    if code.delivery_status == 'failed':
+        service = 'SMS' if code.type == 'phone' else 'Email'
+        response_data['error'] = f'Сервис {service} временно недоступен, попробуйте позже'
+    
+    return jsonify(response_data), 200
+
 @unified_auth_bp.route('/login', methods=['POST'])
 def login():
     """Login with email/phone and password"""
@@ -1,12 +1,25 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import User, UserRole, AuditLog
+from app.services.phone_numbers import is_valid_phone_hash
+from app.services.rate_limiter import rate_limiter
+from app.services.email_digest import DIGEST_FREQUENCIES
 from app import db
 from datetime import datetime
+import json
+import os
 import uuid
 
 users_bp = Blueprint('users', __name__)
 
+# Upper bound on hashes accepted per contact-match request
+MAX_CONTACT_HASHES = 5000
+
+# Phone hashes are unsalted, so matching is throttled per user to keep the
+# number space from being enumerated: a short burst limit and a daily cap
+CONTACT_MATCH_PER_MINUTE = 3
+CONTACT_MATCH_PER_DAY = int(os.environ.get('CONTACT_MATCH_DAILY_LIMIT', '10'))
+
 @users_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
@@ -52,10 +65,12 @@ def update_profile():
             user.date_of_birth = datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date()
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-    if 'gramps_person_id' in data:
-        user.gramps_person_id = data['gramps_person_id']
-    if 'gramps_tree_id' in data:
-        user.gramps_tree_id = data['gramps_tree_id']
+    # gramps_tree_id/gramps_person_id follow tree membership, granted through
+    # /api/genealogy/trees/<tree_id>/members; they cannot be self-assigned
+    if 'email_digest' in data:
+        if data['email_digest'] not in DIGEST_FREQUENCIES:
+            return jsonify({'error': f"email_digest must be one of: {', '.join(DIGEST_FREQUENCIES)}"}), 400
+        user.email_digest = data['email_digest']
     
     # Log the profile update
     AuditLog.log_action(
@@ -232,13 +247,19 @@ def update_privacy():
     if 'private_account' in data:
         user.private_account = data['private_account']
     
+    if 'discoverable_by_phone' in data:
+        user.discoverable_by_phone = bool(data['discoverable_by_phone'])
+    
     # Log the privacy change
     AuditLog.log_action(
         actor_id=current_user_id,
         action="update_privacy",
         target_type="user",
         target_id=current_user_id,
-        action_metadata={"private_account": user.private_account}
+        action_metadata={
+            "private_account": user.private_account,
+            "discoverable_by_phone": user.discoverable_by_phone
+        }
     )
     
     db.session.commit()
@@ -246,3 +267,60 @@ def update_privacy():
         'user': user.to_dict(include_pii=True),
         'message': 'Privacy settings updated successfully'
     }), 200
+
+@users_bp.route('/contacts/match', methods=['POST'])
+@jwt_required()
+def match_contacts():
+    """Match hashed address-book phone numbers against registered users
+
+    Expects {"phone_hashes": [...]} where each entry is the hex SHA-256 of a
+    normalized phone number (see app.services.phone_numbers). Matches are
+    streamed back as newline-delimited JSON. Private accounts and users who
+    turned off discoverable_by_phone are not matched.
+    """
+    current_user_id = uuid.UUID(get_jwt_identity())
+    
+    limit_key = f"contacts_match:{current_user_id}"
+    exceeded = rate_limiter.check_limits(limit_key, ((CONTACT_MATCH_PER_MINUTE, 1), (CONTACT_MATCH_PER_DAY, 24 * 60)))
+    if exceeded:
+        max_requests, window_minutes = exceeded
+        remaining_time = rate_limiter.get_remaining_time(f"{limit_key}:{window_minutes}",
+                                                         window_minutes=window_minutes,
+                                                         max_requests=max_requests)
+        return jsonify({
+            'error': f'Too many contact match requests. Try again in {remaining_time} seconds.',
+            'retry_after': remaining_time
+        }), 429
+    
+    data = request.get_json() or {}
+    phone_hashes = data.get('phone_hashes')
+    
+    if not isinstance(phone_hashes, list) or not phone_hashes:
+        return jsonify({'error': 'phone_hashes must be a non-empty list'}), 400
+    
+    if len(phone_hashes) > MAX_CONTACT_HASHES:
+        return jsonify({'error': f'At most {MAX_CONTACT_HASHES} phone hashes per request'}), 400
+    
+    # Normalize and de-duplicate; silently drop anything that is not a digest
+    phone_hashes = {h.lower() for h in phone_hashes if isinstance(h, str)}
+    phone_hashes = [h for h in phone_hashes if is_valid_phone_hash(h)]
+    if not phone_hashes:
+        return jsonify({'error': 'No valid phone hashes provided'}), 400
+    
+    matches = User.find_by_phone_hashes(phone_hashes, exclude_user_id=current_user_id)
+    
+    def generate():
+        for row in matches:
+            yield json.dumps({
+                'phone_hash': row.phone_hash,
+                'user': {
+                    'id': str(row.id),
+                    'username': row.username,
+                    'display_name': row.display_name,
+                    'profile_slug': row.profile_slug,
+                    'avatar_media_id': str(row.avatar_media_id) if row.avatar_media_id else None,
+                    'verified': row.verified
+                }
+            }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
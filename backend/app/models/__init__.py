@@ -3,25 +3,31 @@ from .post import Post, PostPrivacy
 from .like import Like
 from .comment import Comment
 from .media import Media
+from .media_blob import MediaBlob
+from .upload_session import UploadSession
 from .follow import Follow, FollowStatus
 from .friend import Friend, FriendStatus
 from .notification import Notification
+from .outbox import OutboxEvent
 from .report import Report, ReportStatus, ReportReason, ReportTargetType
 from .audit_log import AuditLog
 from .verification import PhoneVerification
 from .email_verification import EmailVerification
+from .genealogy import GenealogyPerson, GenealogyRelation, GenealogyAncestry, GenealogyImport, GenealogyTreeMember, RelationType, ImportStatus
 
 __all__ = [
     'User', 'UserRole', 'UserStatus',
     'Post', 'PostPrivacy',
     'Like',
     'Comment',
-    'Media',
+    'Media', 'MediaBlob', 'UploadSession',
     'Follow', 'FollowStatus',
     'Friend', 'FriendStatus',
     'Notification',
+    'OutboxEvent',
     'Report', 'ReportStatus', 'ReportReason', 'ReportTargetType',
     'AuditLog',
     'PhoneVerification',
-    'EmailVerification'
+    'EmailVerification',
+    'GenealogyPerson', 'GenealogyRelation', 'GenealogyAncestry', 'GenealogyImport', 'GenealogyTreeMember', 'RelationType', 'ImportStatus'
 ]
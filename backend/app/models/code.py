@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, UUID
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, UUID, Integer, Text, Index, text
 from sqlalchemy.sql import func
 from app import db
 import hashlib
@@ -16,6 +16,19 @@ class Code(db.Model):
     expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     verified_at = Column(DateTime(timezone=True), nullable=True)
+    delivery_status = Column(String(20), default='pending', server_default='pending', nullable=False)  # pending, sent, failed
+    delivery_attempts = Column(Integer, default=0, server_default='0', nullable=False)
+    delivery_error = Column(Text, nullable=True)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        # The undelivered-code sweep only looks at pending codes
+        Index(
+            'ix_social_codes_pending_created_at', 'created_at',
+            postgresql_where=text("delivery_status = 'pending'"),
+            sqlite_where=text("delivery_status = 'pending'")
+        ),
+    )
     
     def is_expired(self):
         return False
@@ -63,6 +76,26 @@ class Code(db.Model):
         
         return None
     
+    @classmethod
+    def fail_undelivered(cls, created_before, code_id=None):
+        """
+        Mark codes still pending since before the given time as failed
+
+        Their delivery task expired in the queue (or was lost), so nothing
+        will ever send them.
+
+        Returns:
+            Number of codes marked failed
+        """
+        query = cls.query.filter(cls.delivery_status == 'pending', cls.created_at < created_before)
+        if code_id:
+            query = query.filter(cls.id == code_id)
+        return query.update({
+            'delivery_status': 'failed',
+            'delivery_error': 'Delivery expired before it was attempted',
+            'is_active': False
+        }, synchronize_session=False)
+    
     @classmethod
     def find_active_code_for_identifier(cls, identifier: str):
         return cls.query.filter_by(
@@ -78,7 +111,9 @@ class Code(db.Model):
             'is_active': self.is_active,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'verified_at': self.verified_at.isoformat() if self.verified_at else None
+            'verified_at': self.verified_at.isoformat() if self.verified_at else None,
+            'delivery_status': self.delivery_status,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None
         }
     
     def __repr__(self):
@@ -0,0 +1,214 @@
+from sqlalchemy import Column, String, Text, Integer, BigInteger, DateTime, ForeignKey, UniqueConstraint, Index, UUID, Enum
+from sqlalchemy.sql import func
+from app import db
+import uuid
+import enum
+
+class RelationType(enum.Enum):
+    PARENT = "parent"  # source is a parent of target
+    SPOUSE = "spouse"  # undirected, stored once per couple
+
+class ImportStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class GenealogyPerson(db.Model):
+    """Person from a family tree, keyed by its Gramps handle within the tree"""
+    __tablename__ = 'social_genealogy_persons'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tree_id = Column(String(100), nullable=False)
+    gramps_id = Column(String(100), nullable=False)  # Gramps handle or GEDCOM xref
+    given_name = Column(String(255), nullable=True)
+    surname = Column(String(255), nullable=True)
+    gender = Column(String(1), nullable=True)  # 'M', 'F' or 'U'
+    birth_date = Column(String(50), nullable=True)  # free-form genealogical date
+    death_date = Column(String(50), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('social_users.id'), nullable=True)
+    import_id = Column(UUID(as_uuid=True), nullable=True)  # import that inserted the row
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (UniqueConstraint('tree_id', 'gramps_id', name='unique_tree_person'),)
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'tree_id': self.tree_id,
+            'gramps_id': self.gramps_id,
+            'given_name': self.given_name,
+            'surname': self.surname,
+            'gender': self.gender,
+            'birth_date': self.birth_date,
+            'death_date': self.death_date,
+            'user_id': str(self.user_id) if self.user_id else None
+        }
+
+    def __repr__(self):
+        return f'<GenealogyPerson {self.tree_id}/{self.gramps_id}>'
+
+class GenealogyRelation(db.Model):
+    """Parent/child or spouse edge between two persons of the same tree"""
+    __tablename__ = 'social_genealogy_relations'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tree_id = Column(String(100), nullable=False, index=True)
+    source_id = Column(String(100), nullable=False)  # gramps_id
+    target_id = Column(String(100), nullable=False)  # gramps_id
+    relation_type = Column(Enum(RelationType), nullable=False)
+    import_id = Column(UUID(as_uuid=True), nullable=True)  # import that inserted the row
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('tree_id', 'source_id', 'target_id', 'relation_type', name='unique_tree_relation'),
+    )
+
+    def to_dict(self):
+        return {
+            'tree_id': self.tree_id,
+            'source_id': self.source_id,
+            'target_id': self.target_id,
+            'relation_type': self.relation_type.value if self.relation_type else None
+        }
+
+    def __repr__(self):
+        return f'<GenealogyRelation {self.source_id} -{self.relation_type.value}-> {self.target_id}>'
+
+class GenealogyAncestry(db.Model):
+    """Closure table: every (ancestor, descendant) pair of a tree with the shortest generation gap"""
+    __tablename__ = 'social_genealogy_ancestry'
+
+    tree_id = Column(String(100), primary_key=True)
+    ancestor_id = Column(String(100), primary_key=True)
+    descendant_id = Column(String(100), primary_key=True)
+    depth = Column(Integer, nullable=False)  # 1 = parent, 2 = grandparent, ...
+
+    __table_args__ = (
+        Index('ix_genealogy_ancestry_descendant', 'tree_id', 'descendant_id'),
+    )
+
+    @classmethod
+    def get_ancestors(cls, tree_id, gramps_id, max_depth=None):
+        query = cls.query.filter_by(tree_id=tree_id, descendant_id=gramps_id)
+        if max_depth:
+            query = query.filter(cls.depth <= max_depth)
+        return query.order_by(cls.depth.asc()).all()
+
+    @classmethod
+    def get_descendants(cls, tree_id, gramps_id, max_depth=None):
+        query = cls.query.filter_by(tree_id=tree_id, ancestor_id=gramps_id)
+        if max_depth:
+            query = query.filter(cls.depth <= max_depth)
+        return query.order_by(cls.depth.asc()).all()
+
+    def __repr__(self):
+        return f'<GenealogyAncestry {self.ancestor_id} -> {self.descendant_id} ({self.depth})>'
+
+
+class GenealogyImport(db.Model):
+    """Background import job of a GEDCOM or Gramps XML file into a tree"""
+    __tablename__ = 'social_genealogy_imports'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tree_id = Column(String(100), nullable=False)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey('social_users.id'), nullable=False)
+    source_format = Column(String(20), nullable=False)  # 'gedcom' or 'gramps_xml'
+    original_filename = Column(String(255), nullable=True)
+    file_path = Column(Text, nullable=False)
+    status = Column(Enum(ImportStatus), default=ImportStatus.PENDING, nullable=False)
+    total_bytes = Column(BigInteger, default=0)
+    bytes_processed = Column(BigInteger, default=0)
+    persons_count = Column(Integer, default=0)
+    relations_count = Column(Integer, default=0)
+    linked_users_count = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def get_progress(self):
+        """Import progress in percent, based on bytes parsed"""
+        if self.status == ImportStatus.COMPLETED:
+            return 100
+        if not self.total_bytes:
+            return 0
+        return min(99, int((self.bytes_processed or 0) * 100 / self.total_bytes))
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'tree_id': self.tree_id,
+            'owner_id': str(self.owner_id),
+            'source_format': self.source_format,
+            'original_filename': self.original_filename,
+            'status': self.status.value if self.status else 'pending',
+            'progress': self.get_progress(),
+            'persons_count': self.persons_count or 0,
+            'relations_count': self.relations_count or 0,
+            'linked_users_count': self.linked_users_count or 0,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<GenealogyImport {self.id} ({self.status.value})>'
+
+
+class GenealogyTreeMember(db.Model):
+    """Access to a family tree, granted by the tree's importer or an admin
+
+    Membership is the only source of tree access. The linked person of a
+    member is mirrored to User.gramps_tree_id/gramps_person_id, which users
+    cannot set themselves.
+    """
+    __tablename__ = 'social_genealogy_tree_members'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tree_id = Column(String(100), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('social_users.id', ondelete='CASCADE'), nullable=False, index=True)
+    gramps_person_id = Column(String(100), nullable=True)  # The member's own person in the tree
+    role = Column(String(20), default='member', server_default='member', nullable=False)  # owner, member
+    added_by_id = Column(UUID(as_uuid=True), ForeignKey('social_users.id', ondelete='SET NULL'), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('tree_id', 'user_id', name='uq_genealogy_tree_member'),
+    )
+
+    @classmethod
+    def get(cls, tree_id, user_id):
+        return cls.query.filter_by(tree_id=tree_id, user_id=user_id).first()
+
+    @classmethod
+    def is_owner(cls, tree_id, user_id):
+        return cls.query.filter_by(tree_id=tree_id, user_id=user_id, role='owner').first() is not None
+
+    @classmethod
+    def linked_person(cls, user):
+        """(tree_id, gramps_person_id) of the user's own person, backed by membership"""
+        if not user or not user.gramps_tree_id:
+            return None
+        member = cls.get(user.gramps_tree_id, user.id)
+        if not member or not member.gramps_person_id:
+            return None
+        return member.tree_id, member.gramps_person_id
+
+    @classmethod
+    def tree_exists(cls, tree_id):
+        return cls.query.filter_by(tree_id=tree_id).first() is not None
+
+    def to_dict(self):
+        return {
+            'tree_id': self.tree_id,
+            'user_id': str(self.user_id),
+            'gramps_person_id': self.gramps_person_id,
+            'role': self.role,
+            'added_by_id': str(self.added_by_id) if self.added_by_id else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<GenealogyTreeMember {self.user_id} in {self.tree_id} ({self.role})>'
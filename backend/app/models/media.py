@@ -1,6 +1,8 @@
 from sqlalchemy import Column, String, Text, DateTime, ForeignKey, UUID, JSON, Integer
 from sqlalchemy.sql import func
 from app import db
+from app.models.media_blob import MediaBlob
+from app.services.media_storage import UploadRejected, media_storage
 import uuid
 
 class Media(db.Model):
@@ -15,9 +17,12 @@ class Media(db.Model):
     width = Column(Integer, nullable=True)
     height = Column(Integer, nullable=True)
     variants = Column(JSON, nullable=True)
+    blurhash = Column(String(64), nullable=True)  # Placeholders painted until the image loads
+    lqip = Column(Text, nullable=True)  # data: URI of a tiny WebP
     gramps_media_id = Column(String(100), nullable=True)
     gramps_url = Column(Text, nullable=True)
     post_id = Column(UUID(as_uuid=True), ForeignKey('social_posts.id'), nullable=True)
+    blob_id = Column(UUID(as_uuid=True), ForeignKey('social_media_blobs.id'), nullable=True, index=True)  # Content, shared with duplicates
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     def to_dict(self):
@@ -30,25 +35,64 @@ class Media(db.Model):
             'width': self.width,
             'height': self.height,
             'variants': self.variants or {},
+            'blurhash': self.blurhash,
+            'lqip': self.lqip,
             'gramps_media_id': self.gramps_media_id,
             'gramps_url': self.gramps_url,
+            'url': self.get_url('medium'),
+            'thumbnail_url': self.get_thumbnail_url(),
+            'srcset': self.get_srcset(),
             'post_id': str(self.post_id) if self.post_id else None,
             'owner_id': str(self.owner_id),
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
-    def get_url(self, variant=None):
-        if self.gramps_url:
-            return self.gramps_url
+    def attach_blob(self, sha256):
+        """
+        Reference the deduplicated blob holding this media's content
         
+        If another upload of the same bytes already has variants (and
+        placeholders), they are reused instead of being generated again.
+        
+        Returns:
+            The MediaBlob
+            
+        Raises:
+            UploadRejected: The stored file was collected between the upload
+                and the acquire; the client uploads it again
+        """
+        blob = MediaBlob.acquire(sha256, self.storage_key, self.file_size, self.mime_type)
+        if not media_storage.exists(self.storage_key):
+            MediaBlob.release(blob.id)
+            raise UploadRejected('collected', f'File {self.original_filename} was not stored, please upload it again')
+        self.blob_id = blob.id
+        if blob.variants:
+            self.width, self.height, self.variants = blob.width, blob.height, blob.variants
+            self.blurhash, self.lqip = blob.blurhash, blob.lqip
+        return blob
+    
+    def get_url(self, variant=None):
+        """URL of a variant once it is generated, otherwise of the original"""
         base_url = f"/api/media/{self.id}/file"
         if variant and self.variants and variant in self.variants:
             return f"{base_url}?variant={variant}"
+        
+        if self.gramps_url:
+            return self.gramps_url
         return base_url
     
     def get_thumbnail_url(self):
         return self.get_url('thumbnail')
     
+    def get_srcset(self):
+        """srcset attribute value listing every generated variant by width"""
+        if not self.variants:
+            return None
+        widths = {}
+        for name, variant in self.variants.items():
+            widths.setdefault(variant['width'], name)
+        return ', '.join(f"{self.get_url(name)} {width}w" for width, name in sorted(widths.items()))
+    
     @classmethod
     def get_user_media(cls, owner_id, limit=20, offset=0):
         return cls.query.filter_by(owner_id=owner_id).order_by(
@@ -0,0 +1,128 @@
+from sqlalchemy import Column, String, Text, DateTime, UUID, JSON, Integer, BigInteger, Index, text
+from sqlalchemy.sql import func
+from app import db
+import uuid
+from datetime import datetime, timezone
+
+class MediaBlob(db.Model):
+    """Stored file content, shared by every Media row that uploaded the same bytes"""
+    __tablename__ = 'social_media_blobs'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    storage_key = Column(String(255), nullable=False, index=True)
+    mime_type = Column(String(100), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    variants = Column(JSON, nullable=True)  # Same layout as Media.variants
+    blurhash = Column(String(64), nullable=True)
+    lqip = Column(Text, nullable=True)  # data: URI of a tiny WebP
+    ref_count = Column(Integer, default=1, server_default='1', nullable=False)  # Media rows pointing here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Garbage collection scans unreferenced blobs only
+        Index(
+            'ix_social_media_blobs_unreferenced', 'updated_at',
+            postgresql_where=text('ref_count = 0'),
+            sqlite_where=text('ref_count = 0')
+        ),
+    )
+
+    @classmethod
+    def acquire(cls, sha256, storage_key, file_size, mime_type):
+        """
+        Add a reference to the blob with this content, creating it on first use
+
+        A single upsert, so concurrent uploads of the same file end up with
+        one row and the right count.
+
+        Returns:
+            The MediaBlob
+        """
+        table = cls.__table__
+        now = datetime.now(timezone.utc)
+        values = {
+            'id': uuid.uuid4(),
+            'sha256': sha256,
+            'storage_key': storage_key,
+            'mime_type': mime_type,
+            'file_size': file_size,
+            'ref_count': 1,
+            'updated_at': now
+        }
+
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(**values).on_conflict_do_update(
+                index_elements=['sha256'],
+                set_={'ref_count': table.c.ref_count + 1, 'updated_at': now}
+            ).returning(table.c.id)
+            blob_id = db.session.execute(stmt).scalar()
+            return db.session.get(cls, blob_id, populate_existing=True)
+
+        blob = cls.query.filter_by(sha256=sha256).with_for_update().first()
+        if blob:
+            blob.ref_count += 1
+            return blob
+        blob = cls(**values)
+        db.session.add(blob)
+        return blob
+
+    @classmethod
+    def release(cls, blob_id):
+        """
+        Drop a reference; the file stays until the media.collect_blobs task runs
+
+        Keeping unreferenced blobs for a grace period lets a re-upload of
+        the same file revive them, variants included. An upload that found
+        the file just before it was collected re-creates the row without a
+        file; Media.attach_blob detects that and rejects the upload.
+        """
+        table = cls.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == blob_id, table.c.ref_count > 0)
+            .values(ref_count=table.c.ref_count - 1, updated_at=datetime.now(timezone.utc))
+        )
+
+    @classmethod
+    def lock_unreferenced(cls, older_than, limit=500):
+        """
+        Lock blobs without references since before the given time
+
+        The rows stay locked until the caller commits, so an acquire of the
+        same content waits while the files are removed and the rows deleted.
+        Blobs revived or locked by a concurrent upload are skipped.
+
+        Returns:
+            The locked MediaBlob rows
+        """
+        return cls.query.filter(
+            cls.ref_count == 0, cls.updated_at < older_than
+        ).order_by(cls.updated_at).limit(limit).with_for_update(skip_locked=True).all()
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'sha256': self.sha256,
+            'storage_key': self.storage_key,
+            'mime_type': self.mime_type,
+            'file_size': self.file_size,
+            'width': self.width,
+            'height': self.height,
+            'variants': self.variants or {},
+            'blurhash': self.blurhash,
+            'lqip': self.lqip,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<MediaBlob {self.sha256[:12]} refs={self.ref_count}>'
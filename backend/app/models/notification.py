@@ -1,7 +1,54 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, UUID, Boolean, JSON
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, UUID, Boolean, JSON, Index, text
 from sqlalchemy.sql import func
 from app import db
+from app.services.notification_counter import unread_counter
+from app.services.realtime import realtime_hub
 import uuid
+from datetime import datetime, timezone
+
+# Number of most recent actors kept on an aggregated notification
+ACTOR_SAMPLE_SIZE = 3
+
+# New actor first, then the previous sample without it, capped at ACTOR_SAMPLE_SIZE
+_ACTOR_SAMPLE_SQL = {
+    'postgresql': (
+        "(SELECT COALESCE(json_agg(s.actor ORDER BY s.pos), '[]'::json) FROM ("
+        "SELECT u.actor, u.pos FROM ("
+        "SELECT CAST(:actor AS text) AS actor, CAST(0 AS bigint) AS pos "
+        "UNION ALL "
+        "SELECT e.value, e.pos FROM json_array_elements_text("
+        "COALESCE(social_notifications.actor_sample, '[]'::json)) WITH ORDINALITY AS e(value, pos) "
+        "WHERE e.value <> CAST(:actor AS text)"
+        ") u ORDER BY u.pos LIMIT :sample_size) s)"
+    ),
+    'sqlite': (
+        "(SELECT json_group_array(s.actor) FROM ("
+        "SELECT u.actor FROM ("
+        "SELECT :actor AS actor, -1 AS pos "
+        "UNION ALL "
+        "SELECT e.value, e.key FROM json_each(COALESCE(social_notifications.actor_sample, '[]')) AS e "
+        "WHERE e.value <> :actor"
+        ") u ORDER BY u.pos LIMIT :sample_size) s)"
+    )
+}
+
+# Repeated events from an actor already in the sample do not bump the counter
+_ACTOR_SEEN_SQL = {
+    'postgresql': (
+        "EXISTS (SELECT 1 FROM json_array_elements_text("
+        "COALESCE(social_notifications.actor_sample, '[]'::json)) AS e(value) "
+        "WHERE e.value = CAST(:actor AS text))"
+    ),
+    'sqlite': (
+        "EXISTS (SELECT 1 FROM json_each(COALESCE(social_notifications.actor_sample, '[]')) AS e "
+        "WHERE e.value = :actor)"
+    )
+}
+
+def _as_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
 
 class Notification(db.Model):
     __tablename__ = 'social_notifications'
@@ -13,7 +60,26 @@ class Notification(db.Model):
     type = Column(String(50), nullable=False)
     payload = Column(JSON, nullable=True)
     read = Column(Boolean, default=False)
+    actor_count = Column(Integer, default=1, server_default='1', nullable=False)  # Actors merged in; approximate, see create_notification
+    actor_sample = Column(JSON, nullable=True)  # Most recent actor ids, newest first
+    emailed_at = Column(DateTime(timezone=True), nullable=True)  # Last included in an email digest
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Last activity: set on insert and when an event is merged in, never by reads (keyset order and cursors)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # At most one unread notification per (user, type, target): new events merge into it
+    __table_args__ = (
+        Index(
+            'uq_social_notifications_unread_group', 'user_id', 'type', 'target_id',
+            unique=True,
+            postgresql_where=text('read = false'),
+            sqlite_where=text('read = 0')
+        ),
+        # Keyset pagination of a user's notifications
+        Index('ix_social_notifications_user_updated', 'user_id', 'updated_at', 'id'),
+        # Retention job: oldest read notifications first
+        Index('ix_social_notifications_read_created', 'read', 'created_at'),
+    )
     
     def to_dict(self):
         """Convert notification to dictionary"""
@@ -25,42 +91,171 @@ class Notification(db.Model):
             'type': self.type,
             'payload': self.payload or {},
             'read': self.read,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'actor_count': self.actor_count or 1,
+            'actor_sample': self.actor_sample or ([str(self.actor_id)] if self.actor_id else []),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
     @classmethod
     def create_notification(cls, user_id, notification_type, actor_id=None, target_id=None, payload=None):
-        """Create a new notification"""
-        notification = cls(
-            user_id=user_id,
-            type=notification_type,
-            actor_id=actor_id,
-            target_id=target_id,
-            payload=payload or {}
-        )
-        db.session.add(notification)
-        return notification
+        """
+        Create a notification or merge it into the unread one for the same target
+
+        Events with a target_id are coalesced at write time with a single upsert:
+        the unread (user, type, target) notification gets the new actor, payload
+        and timestamp, its actor counter is bumped and the actor sample updated.
+        
+        actor_count is approximate: repeat events are only recognised while
+        the actor is still among the ACTOR_SAMPLE_SIZE most recent ones, so
+        an actor who dropped out of the sample and acts again (e.g. unlikes
+        and likes) is counted again. It is an upper bound on the distinct
+        actors, good enough for "X and N others"; exact counting would need
+        every actor id of the group stored.
+
+        Returns:
+            Tuple of (notification id, created) where created is False if the
+            event was merged into an existing notification
+        """
+        user_id, actor_id, target_id = _as_uuid(user_id), _as_uuid(actor_id), _as_uuid(target_id)
+        notification_id = uuid.uuid4()
+        values = {
+            'id': notification_id,
+            'user_id': user_id,
+            'type': notification_type,
+            'actor_id': actor_id,
+            'target_id': target_id,
+            'payload': payload or {},
+            'read': False,
+            'actor_count': 1,
+            'actor_sample': [str(actor_id)] if actor_id else [],
+            # Set here rather than by the database so keyset cursors compare exactly
+            'updated_at': datetime.now(timezone.utc)
+        }
+        
+        dialect = db.engine.dialect.name
+        if target_id is None or dialect not in _ACTOR_SAMPLE_SQL:
+            db.session.execute(cls.__table__.insert().values(**values))
+            unread_counter.queue_delta(user_id, 1)
+            cls._queue_realtime_event(notification_id, True, values)
+            return notification_id, True
+        
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        table = cls.__table__
+        actor = str(actor_id) if actor_id else ''
+        seen = text(_ACTOR_SEEN_SQL[dialect]).bindparams(actor=actor)
+        sample = text(_ACTOR_SAMPLE_SQL[dialect]).bindparams(actor=actor, sample_size=ACTOR_SAMPLE_SIZE)
+        
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'type', 'target_id'],
+            index_where=table.c.read == False,
+            set_={
+                'actor_id': stmt.excluded.actor_id,
+                'payload': stmt.excluded.payload,
+                'actor_count': table.c.actor_count + db.case((seen, 0), else_=1),
+                'actor_sample': sample,
+                'updated_at': stmt.excluded.updated_at
+            }
+        ).returning(table.c.id)
+        
+        merged_id = db.session.execute(stmt).scalar()
+        created = merged_id == notification_id
+        if created:
+            # Merging into an unread group does not change the unread count
+            unread_counter.queue_delta(user_id, 1)
+        cls._queue_realtime_event(merged_id, created, values)
+        return merged_id, created
+    
+    @classmethod
+    def create_many(cls, user_ids, notification_type, actor_id=None, target_id=None, payload=None):
+        """
+        Create the same notification for many users with one multi-row insert
+
+        Users who already have an unread notification of this type for the
+        target are skipped instead of merged, which suits one-off events
+        such as mentions.
+
+        Returns:
+            List of ids of the notifications created
+        """
+        actor_id, target_id = _as_uuid(actor_id), _as_uuid(target_id)
+        now = datetime.now(timezone.utc)
+        rows = [{
+            'id': uuid.uuid4(),
+            'user_id': _as_uuid(user_id),
+            'type': notification_type,
+            'actor_id': actor_id,
+            'target_id': target_id,
+            'payload': payload or {},
+            'read': False,
+            'actor_count': 1,
+            'actor_sample': [str(actor_id)] if actor_id else [],
+            'updated_at': now
+        } for user_id in dict.fromkeys(user_ids)]
+        if not rows:
+            return []
+
+        table = cls.__table__
+        dialect = db.engine.dialect.name
+        if target_id is None or dialect not in _ACTOR_SAMPLE_SQL:
+            db.session.execute(table.insert(), rows)
+            created = rows
+        else:
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(rows).on_conflict_do_nothing(
+                index_elements=['user_id', 'type', 'target_id'],
+                index_where=table.c.read == False
+            ).returning(table.c.id)
+            inserted = {row_id for row_id, in db.session.execute(stmt)}
+            created = [values for values in rows if values['id'] in inserted]
+
+        for values in created:
+            unread_counter.queue_delta(values['user_id'], 1)
+            cls._queue_realtime_event(values['id'], True, values)
+        return [values['id'] for values in created]
+
+    @staticmethod
+    def _queue_realtime_event(notification_id, created, values):
+        realtime_hub.queue_event(values['user_id'], 'notification', {
+            'id': str(notification_id),
+            'type': values['type'],
+            'actor_id': str(values['actor_id']) if values['actor_id'] else None,
+            'target_id': str(values['target_id']) if values['target_id'] else None,
+            'payload': values['payload'],
+            'merged': not created
+        })
     
     @classmethod
     def get_user_notifications(cls, user_id, limit=20, offset=0):
         """Get notifications for a user"""
         return cls.query.filter_by(user_id=user_id).order_by(
-            cls.created_at.desc()
+            cls.updated_at.desc()
         ).offset(offset).limit(limit).all()
     
     @classmethod
     def get_unread_count(cls, user_id):
-        """Get unread notification count for user"""
-        return cls.query.filter_by(user_id=user_id, read=False).count()
+        """Get unread notification count for user (cached in Redis)"""
+        return unread_counter.get(user_id)
     
     def mark_as_read(self):
         """Mark notification as read"""
+        if not self.read:
+            unread_counter.queue_delta(self.user_id, -1)
         self.read = True
     
     @classmethod
     def mark_all_as_read(cls, user_id):
         """Mark all notifications as read for user"""
         cls.query.filter_by(user_id=user_id, read=False).update({'read': True})
+        unread_counter.queue_reset(user_id)
     
     def __repr__(self):
         return f'<Notification {self.type} for {self.user_id}>'
\ No newline at end of file
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, String, Integer, Text, DateTime, UUID, JSON, Index, text
+from sqlalchemy.sql import func
+from app import db
+import uuid
+
+class OutboxEvent(db.Model):
+    """Side effect recorded in the same transaction as the write that caused it"""
+    __tablename__ = 'social_outbox_events'
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_type = Column(String(50), nullable=False)  # e.g. 'post.liked', 'user.followed'
+    payload = Column(JSON, nullable=False, default=dict)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Retry backoff
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Only pending events are scanned by the drainer
+        Index(
+            'ix_social_outbox_events_pending', 'available_at',
+            postgresql_where=text('processed_at IS NULL'),
+            sqlite_where=text('processed_at IS NULL')
+        ),
+    )
+    
+    @classmethod
+    def emit(cls, event_type, **payload):
+        """Record an event in the current transaction; it is processed after commit"""
+        payload = {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in payload.items()}
+        event = cls(event_type=event_type, payload=payload)
+        db.session.add(event)
+        # Wake the drainer once this transaction commits
+        db.session.info['outbox_pending'] = True
+        return event
+    
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'event_type': self.event_type,
+            'payload': self.payload or {},
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<OutboxEvent {self.event_type} {self.id}>'
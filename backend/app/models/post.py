@@ -20,6 +20,7 @@ class Post(db.Model):
     media = Column(JSON, default=list)  # List of media_id + metadata
     hashtags = Column(JSON, nullable=True)  # Extracted hashtags
     mentions = Column(JSON, nullable=True)  # Extracted mentions
+    mentioned_users = Column(JSON, nullable=True)  # Resolved mentions: [{'id', 'username'}]
     privacy = Column(Enum(PostPrivacy), default=PostPrivacy.PUBLIC, nullable=False)
     likes_count = Column(Integer, default=0)  # Denormalized counter
     comments_count = Column(Integer, default=0)  # Denormalized counter
@@ -43,6 +44,7 @@ class Post(db.Model):
             'media': self.media or [],
             'hashtags': self.hashtags or [],
             'mentions': self.mentions or [],
+            'mentioned_users': self.mentioned_users or [],
             'privacy': self.privacy.value if self.privacy else 'public',
             'likes_count': self.likes_count,
             'comments_count': self.comments_count,
@@ -67,6 +69,44 @@ class Post(db.Model):
         mentions = re.findall(r'@(\w+)', self.caption)
         return list(set(mentions))  # Remove duplicates
 
+    def resolve_mentions(self):
+        """
+        Resolve extracted mentions to users with a single IN query
+
+        Unknown and inactive usernames are dropped. The result is stored on
+        the post so rendering never has to look mentioned users up again.
+
+        Returns:
+            List of ids of users mentioned now but not before
+        """
+        from app.models.user import User, UserStatus
+
+        previous = {entry['id'] for entry in (self.mentioned_users or [])}
+        names = self.mentions or []
+        rows = []
+        if names:
+            rows = db.session.query(User.id, User.username).filter(
+                User.username.in_(names),
+                User.status == UserStatus.ACTIVE
+            ).order_by(User.username).all()
+
+        self.mentioned_users = [{'id': str(user_id), 'username': username} for user_id, username in rows]
+        return [
+            user_id for user_id, _ in rows
+            if str(user_id) not in previous and str(user_id) != str(self.author_id)
+        ]
+
+    def update_hashtags_and_mentions(self):
+        """
+        Re-extract hashtags and mentions after the caption changed
+
+        Returns:
+            List of ids of newly mentioned users
+        """
+        self.hashtags = self.extract_hashtags()
+        self.mentions = self.extract_mentions()
+        return self.resolve_mentions()
+
     def increment_likes_count(self):
         """Atomically increment likes count"""
         self.likes_count = (self.likes_count or 0) + 1
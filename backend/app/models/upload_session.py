@@ -0,0 +1,72 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, UUID, BigInteger
+from sqlalchemy.sql import func
+from app import db
+import uuid
+
+class UploadSession(db.Model):
+    """Resumable upload of one file, sent in chunks and finalized into a Media row"""
+    __tablename__ = 'social_upload_sessions'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey('social_users.id'), nullable=False, index=True)
+    post_id = Column(UUID(as_uuid=True), ForeignKey('social_posts.id'), nullable=True)
+    filename = Column(String(255), nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received_size = Column(BigInteger, default=0, server_default='0', nullable=False)  # Bytes stored, contiguous from 0
+    status = Column(String(20), default='active', server_default='active', nullable=False)  # active, finalizing, completed
+    media_id = Column(UUID(as_uuid=True), ForeignKey('social_media.id', ondelete='SET NULL'), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    @classmethod
+    def advance(cls, session_id, offset, received_size, expires_at):
+        """
+        Record a stored chunk, unless another request moved the offset first
+
+        Returns:
+            True if the offset was still the expected one
+        """
+        table = cls.__table__
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == session_id, table.c.status == 'active', table.c.received_size == offset)
+            .values(received_size=received_size, expires_at=expires_at)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def claim_for_finalize(cls, session_id):
+        """
+        Move a fully received session to finalizing
+
+        Returns:
+            True for the one request that gets to finalize it
+        """
+        table = cls.__table__
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == session_id, table.c.status == 'active', table.c.received_size == table.c.total_size)
+            .values(status='finalizing')
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def get_expired(cls, now, limit=500):
+        return cls.query.filter(cls.expires_at < now).order_by(cls.expires_at).limit(limit).all()
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'offset': self.received_size,
+            'status': self.status,
+            'post_id': str(self.post_id) if self.post_id else None,
+            'media_id': str(self.media_id) if self.media_id else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<UploadSession {self.id}: {self.received_size}/{self.total_size}>'
@@ -1,7 +1,8 @@
 from sqlalchemy import Column, String, Text, Date, Boolean, DateTime, ForeignKey, UUID, Enum, JSON
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app import db
+from app.services.phone_numbers import hash_phone_number
 import uuid
 import enum
 import re
@@ -30,6 +31,7 @@ class User(db.Model):
     previous_slugs = Column(JSON, nullable=True)  # Store old slugs for redirects
     display_name = Column(String(100), nullable=True)
     phone_number = Column(String(20), nullable=True, unique=True)
+    phone_hash = Column(String(64), nullable=True, unique=True, index=True)  # SHA-256 of normalized phone, for contact matching
     date_of_birth = Column(Date, nullable=True)
     bio = Column(Text, nullable=True)
     avatar_media_id = Column(UUID(as_uuid=True), nullable=True)
@@ -37,6 +39,7 @@ class User(db.Model):
     location = Column(String(255), nullable=True)
     pronouns = Column(String(50), nullable=True)
     private_account = Column(Boolean, default=False)
+    discoverable_by_phone = Column(Boolean, default=True, server_default='true', nullable=False)  # Opt-out of contact matching
     verified = Column(Boolean, default=False)
     auth_method = Column(String(20), nullable=True)  # 'password', 'google', 'phone'
     google_id = Column(String(100), nullable=True, unique=True)
@@ -47,8 +50,9 @@ class User(db.Model):
     ban_reason = Column(Text, nullable=True)
     banned_until = Column(DateTime(timezone=True), nullable=True)
     gramps_person_id = Column(String(100), nullable=True)
-    gramps_tree_id = Column(String(100), nullable=True)
+    gramps_tree_id = Column(String(100), nullable=True, index=True)
     password_hash = Column(String(255), nullable=True)
+    email_digest = Column(String(10), default='off', server_default='off', nullable=False)  # 'off', 'hourly' or 'daily'
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -82,11 +86,19 @@ class User(db.Model):
                 'phone_number': self.phone_number,
                 'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
                 'gramps_person_id': self.gramps_person_id,
-                'gramps_tree_id': self.gramps_tree_id
+                'gramps_tree_id': self.gramps_tree_id,
+                'email_digest': self.email_digest or 'off',
+                'discoverable_by_phone': self.discoverable_by_phone
             })
         
         return data
 
+    @validates('phone_number')
+    def _update_phone_hash(self, key, phone_number):
+        """Keep the contact-matching hash in sync with the phone number"""
+        self.phone_hash = hash_phone_number(phone_number) if phone_number else None
+        return phone_number
+
     def set_password(self, password):
         """Set password hash"""
         from werkzeug.security import generate_password_hash
@@ -207,6 +219,48 @@ class User(db.Model):
         """Find user by Google ID"""
         return cls.query.filter_by(google_id=google_id).first()
 
+    @classmethod
+    def find_by_phone_hashes(cls, phone_hashes, exclude_user_id=None):
+        """
+        Match contact phone hashes against active users in a single indexed query
+
+        Private accounts and users who opted out of contact matching are never returned.
+        """
+        query = db.session.query(
+            cls.id, cls.username, cls.display_name, cls.profile_slug,
+            cls.avatar_media_id, cls.verified, cls.phone_hash
+        ).filter(
+            cls.phone_hash.in_(phone_hashes),
+            cls.status == UserStatus.ACTIVE,
+            cls.private_account.isnot(True),
+            cls.discoverable_by_phone.is_(True)
+        )
+        if exclude_user_id:
+            query = query.filter(cls.id != exclude_user_id)
+        return query.execution_options(yield_per=500)
+
+    @classmethod
+    def get_summaries(cls, user_ids):
+        """Compact public summaries of many users, loaded with one query"""
+        user_ids = [user_id for user_id in set(user_ids) if user_id]
+        if not user_ids:
+            return {}
+        rows = db.session.query(
+            cls.id, cls.username, cls.display_name, cls.profile_slug,
+            cls.avatar_media_id, cls.verified
+        ).filter(cls.id.in_(user_ids))
+        return {
+            row.id: {
+                'id': str(row.id),
+                'username': row.username,
+                'display_name': row.display_name,
+                'profile_slug': row.profile_slug,
+                'avatar_media_id': str(row.avatar_media_id) if row.avatar_media_id else None,
+                'verified': row.verified
+            }
+            for row in rows
+        }
+
     @classmethod
     def find_by_identifier(cls, identifier):
         """Find user by identifier (email or phone)"""
@@ -0,0 +1,237 @@
+"""
+Circuit breakers and deadline-bounded retries for external dependencies
+
+Each dependency (Mobizon, SMTP, Google OAuth) has a breaker that tracks
+the failure rate of recent calls. Once it crosses the threshold the breaker
+opens and calls fail immediately instead of tying up a worker; after a cool
+down a limited number of probe calls decide whether it closes again.
+
+resilient_call retries transient failures with full-jitter backoff, but
+never beyond the caller's deadline, so a request that must answer within a
+few seconds does.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """The dependency's breaker is open; the call was not attempted"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+
+class DeadlineExceeded(Exception):
+    """The time budget of the operation ran out"""
+
+class PermanentError(Exception):
+    """
+    Failure caused by the request itself (e.g. a rejected phone number)
+
+    It is neither retried nor counted against the dependency's health.
+    """
+
+class Deadline:
+    """Time budget of one operation, shared by all its attempts"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, connect: float, read: float) -> Tuple[float, float]:
+        """HTTP (connect, read) timeouts clipped to the remaining budget"""
+        remaining = max(self.remaining(), 0.001)
+        return min(connect, remaining), min(read, remaining)
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a sliding time window"""
+
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5,
+                 window_seconds: float = 60.0, open_seconds: float = 30.0, half_open_calls: int = 1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (timestamp, succeeded)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def allow(self):
+        """
+        Reserve a call
+
+        Raises:
+            CircuitOpenError: The breaker is open, or all half-open probes are taken
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN:
+                retry_after = self._opened_at + self.open_seconds - now
+                if retry_after > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, retry_after)
+                self._state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"Circuit {self.name} half-open, probing")
+
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probes += 1
+
+    def record_success(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                logger.info(f"Circuit {self.name} closed")
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def release(self):
+        """Give back a reservation whose call ended without a verdict on the dependency"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        logger.warning(f"Circuit {self.name} opened for {self.open_seconds:.0f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            return {
+                'state': self._state,
+                'calls_in_window': len(self._outcomes),
+                'failures_in_window': failures,
+                'failure_rate': round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+                'rejected': self._rejected,
+                'retry_after': round(max(self._opened_at + self.open_seconds - now, 0.0), 1) if self._state == OPEN else None
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the process-wide breaker of a dependency
+
+    Settings come from CIRCUIT_<NAME>_* variables, falling back to CIRCUIT_*.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                def setting(key, default):
+                    return os.environ.get(f'CIRCUIT_{name.upper()}_{key}', os.environ.get(f'CIRCUIT_{key}', default))
+
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_rate=float(setting('FAILURE_RATE', '0.5')),
+                    min_calls=int(setting('MIN_CALLS', '5')),
+                    window_seconds=float(setting('WINDOW_SECONDS', '60')),
+                    open_seconds=float(setting('OPEN_SECONDS', '30')),
+                    half_open_calls=int(setting('HALF_OPEN_CALLS', '1'))
+                )
+    return breaker
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker in this process"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+def resilient_call(name: str, func: Callable[[Deadline], Any], deadline: Optional[Deadline] = None,
+                   max_attempts: int = 3, base_delay: float = 0.2) -> Any:
+    """
+    Call a dependency through its breaker, retrying transient failures
+
+    Args:
+        name: Dependency name (one breaker per name)
+        func: Callable taking the Deadline, so it can bound its own timeouts
+        deadline: Time budget for all attempts and waits; defaults to 5 seconds
+        max_attempts: Upper bound on attempts within the deadline
+        base_delay: Backoff base; attempt n waits uniform(0, base_delay * 2**n)
+
+    Returns:
+        Whatever func returns
+
+    Raises:
+        CircuitOpenError: The breaker rejected the call
+        DeadlineExceeded: No time left for another attempt
+        PermanentError: Raised by func, passed through without retrying
+        Exception: The last transient failure when attempts ran out
+    """
+    breaker = get_breaker(name)
+    deadline = deadline or Deadline(5.0)
+
+    for attempt in range(max_attempts):
+        if deadline.expired:
+            raise DeadlineExceeded(f"{name}: deadline exceeded after {attempt} attempts")
+
+        breaker.allow()
+        try:
+            result = func(deadline)
+        except PermanentError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            if attempt + 1 >= max_attempts:
+                raise
+
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+            if delay >= deadline.remaining():
+                logger.warning(f"{name} failed ({str(e)}), no time left to retry")
+                raise
+            logger.warning(f"{name} failed on attempt {attempt + 1} ({str(e)}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,258 @@
+"""
+Notification email digests
+
+Users who opted into an hourly or daily digest get one email summarising
+their unread notifications that were not emailed yet (or changed since).
+Recipients are processed in batches; every batch is sent over one
+persistent SMTP connection, which is recycled after a fixed number of
+messages. Sending is paced and backs off when the server answers with a
+temporary (4xx) error, leaving the remaining digests for the next run.
+"""
+import html
+import logging
+import os
+import smtplib
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import and_, exists, func, or_, select
+
+from app import db, mail
+from app.models.notification import Notification
+from app.models.user import User, UserStatus
+
+logger = logging.getLogger(__name__)
+
+DIGEST_FREQUENCIES = ('off', 'hourly', 'daily')
+
+# Russian wording of each notification type in the digest
+_TYPE_LABELS = {
+    'like': 'оценил(а) вашу публикацию',
+    'comment': 'прокомментировал(а) вашу публикацию',
+    'mention': 'упомянул(а) вас в публикации',
+    'follow': 'подписался(ась) на вас',
+    'friend_request': 'отправил(а) вам запрос в друзья',
+    'friend_accepted': 'принял(а) ваш запрос в друзья'
+}
+
+class EmailDigestSender:
+    """Builds and sends notification digests in batches"""
+
+    def __init__(self):
+        self.debug_mode = os.environ.get('EMAIL_DEBUG_MODE', 'false').lower() == 'true'
+        self.batch_size = int(os.environ.get('EMAIL_DIGEST_BATCH_SIZE', '100'))
+        self.max_items = int(os.environ.get('EMAIL_DIGEST_MAX_ITEMS', '10'))
+        self.max_per_connection = int(os.environ.get('EMAIL_DIGEST_MAX_PER_CONNECTION', '100'))
+        self.rate_per_second = float(os.environ.get('EMAIL_DIGEST_RATE_PER_SECOND', '20'))
+        self.max_retries = int(os.environ.get('EMAIL_DIGEST_MAX_RETRIES', '3'))
+        self.retry_delay = float(os.environ.get('EMAIL_DIGEST_RETRY_DELAY', '2.0'))
+
+    @staticmethod
+    def _pending_filter():
+        """Unread notifications not emailed yet, or updated after they were"""
+        return and_(
+            Notification.read == False,
+            or_(Notification.emailed_at.is_(None), Notification.updated_at > Notification.emailed_at)
+        )
+
+    def _next_recipients(self, frequency: str, after_id) -> List[User]:
+        pending = exists().where(Notification.user_id == User.id, self._pending_filter())
+        query = User.query.filter(
+            User.email_digest == frequency,
+            User.email.isnot(None),
+            User.status == UserStatus.ACTIVE,
+            pending
+        )
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        return query.order_by(User.id).limit(self.batch_size).all()
+
+    def _load_digests(self, users: List[User], snapshot: datetime) -> Dict:
+        """Per user: counts by type and the most recent notifications"""
+        user_ids = [user.id for user in users]
+        scope = and_(
+            Notification.user_id.in_(user_ids),
+            self._pending_filter(),
+            Notification.updated_at <= snapshot
+        )
+
+        digests = {user_id: {'counts': {}, 'items': []} for user_id in user_ids}
+        counts = db.session.execute(
+            select(Notification.user_id, Notification.type, func.count(Notification.id))
+            .where(scope).group_by(Notification.user_id, Notification.type)
+        )
+        for user_id, notification_type, count in counts:
+            digests[user_id]['counts'][notification_type] = count
+
+        ranked = select(
+            Notification.user_id, Notification.type, Notification.actor_id,
+            Notification.actor_count, Notification.updated_at,
+            func.row_number().over(
+                partition_by=Notification.user_id,
+                order_by=(Notification.updated_at.desc(), Notification.id.desc())
+            ).label('position')
+        ).where(scope).subquery()
+        recent = db.session.execute(
+            select(ranked).where(ranked.c.position <= self.max_items).order_by(ranked.c.user_id, ranked.c.position)
+        ).all()
+
+        actors = User.get_summaries(row.actor_id for row in recent)
+        for row in recent:
+            digests[row.user_id]['items'].append((row, actors.get(row.actor_id)))
+        return digests
+
+    def build_message(self, user: User, digest: Dict) -> Optional[Message]:
+        """Render one user's digest, or None if there is nothing to send"""
+        total = sum(digest['counts'].values())
+        if not total:
+            return None
+
+        lines = []
+        for row, actor in digest['items']:
+            name = (actor or {}).get('display_name') or (actor or {}).get('username') or 'Кто-то'
+            # actor_count may overcount repeat actors (see Notification.create_notification)
+            others = (row.actor_count or 1) - 1
+            if others > 0:
+                name = f"{name} и ещё {others}"
+            lines.append(f"{name} {_TYPE_LABELS.get(row.type, row.type)}")
+
+        remaining = total - len(lines)
+        text_body = '\n'.join(f"- {line}" for line in lines)
+        # Names are user-controlled, never trust them as markup
+        html_items = ''.join(f"<li>{html.escape(line)}</li>" for line in lines)
+        if remaining > 0:
+            text_body += f"\n...и ещё {remaining}"
+            html_items += f"<li>...и ещё {remaining}</li>"
+
+        msg = Message(
+            subject=f'Новые уведомления ({total}) - OZIMIZ',
+            sender=current_app.config['MAIL_DEFAULT_SENDER'],
+            recipients=[user.email]
+        )
+        msg.body = f"Здравствуйте!\n\nУ вас {total} новых уведомлений:\n{text_body}\n\nКоманда OZIMIZ"
+        msg.html = f"""
+            <html>
+            <body>
+                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+                    <h2 style="color: #2563eb;">У вас {total} новых уведомлений</h2>
+                    <ul>{html_items}</ul>
+                    <hr style="margin: 30px 0; border: none; border-top: 1px solid #e5e7eb;">
+                    <p style="color: #6b7280; font-size: 12px;">
+                        Настроить рассылку можно в профиле.<br>
+                        Команда OZIMIZ
+                    </p>
+                </div>
+            </body>
+            </html>
+            """
+        return msg
+
+    def _deliver(self, messages: List) -> Tuple[List, bool]:
+        """
+        Send messages over as few SMTP connections as possible
+
+        Args:
+            messages: List of (user id, Message)
+
+        Returns:
+            Tuple of (ids of users whose digest was sent or permanently
+            rejected, whether every message was handled)
+        """
+        done = []
+        interval = 1.0 / self.rate_per_second if self.rate_per_second > 0 else 0.0
+        position = 0
+        attempt = 0
+
+        while position < len(messages):
+            chunk = messages[position:position + self.max_per_connection]
+            try:
+                with mail.connect() as connection:
+                    for user_id, msg in chunk:
+                        started = time.monotonic()
+                        try:
+                            connection.send(msg)
+                        except smtplib.SMTPRecipientsRefused as e:
+                            # Permanent for this recipient: do not retry it on every run
+                            logger.warning(f"Digest for user {user_id} was rejected: {str(e)}")
+                        done.append(user_id)
+                        position += 1
+                        attempt = 0
+                        # Pace the stream so the relay is not flooded
+                        elapsed = time.monotonic() - started
+                        if interval > elapsed:
+                            time.sleep(interval - elapsed)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, OSError) as e:
+                if position >= len(messages):
+                    # Only closing the connection failed
+                    break
+                code = getattr(e, 'smtp_code', None)
+                if code is not None and code >= 500:
+                    logger.error(f"Digest for user {messages[position][0]} failed permanently: {str(e)}")
+                    done.append(messages[position][0])
+                    position += 1
+                    continue
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error(f"SMTP server is still refusing digests: {str(e)}")
+                    return done, False
+                delay = self.retry_delay * (2 ** (attempt - 1))
+                logger.warning(f"SMTP server is pushing back ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        return done, True
+
+    def send_digests(self, frequency: str) -> Dict[str, int]:
+        """
+        Send the digests of every user subscribed with the given frequency
+
+        Args:
+            frequency: 'hourly' or 'daily'
+
+        Returns:
+            Dictionary with numbers of sent and deferred digests
+        """
+        snapshot = datetime.now(timezone.utc)
+        stats = {'sent': 0, 'deferred': 0}
+        after_id = None
+
+        while True:
+            users = self._next_recipients(frequency, after_id)
+            if not users:
+                break
+            after_id = users[-1].id
+
+            digests = self._load_digests(users, snapshot)
+            messages = []
+            for user in users:
+                msg = self.build_message(user, digests[user.id])
+                if msg is not None:
+                    messages.append((user.id, msg))
+
+            if self.debug_mode:
+                for user_id, msg in messages:
+                    logger.info(f"DEBUG MODE: digest for {msg.recipients[0]}: {msg.subject}")
+                sent, completed = [user_id for user_id, _ in messages], True
+            else:
+                sent, completed = self._deliver(messages)
+
+            if sent:
+                Notification.query.filter(
+                    Notification.user_id.in_(sent),
+                    self._pending_filter(),
+                    Notification.updated_at <= snapshot
+                ).update({'emailed_at': snapshot}, synchronize_session=False)
+            db.session.commit()
+            stats['sent'] += len(sent)
+
+            if not completed:
+                # Back off until the next run instead of hammering the server
+                stats['deferred'] += len(messages) - len(sent)
+                break
+
+        return stats
+
+# Global instance
+email_digest_sender = EmailDigestSender()
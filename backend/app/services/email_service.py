@@ -4,15 +4,18 @@ from app import mail
 import logging
 import os
 import random
+import smtplib
 import string
 from typing import Dict, Any
-from .error_handler import auth_error_handler, retry_on_failure
+from .error_handler import auth_error_handler
+from .circuit_breaker import Deadline, PermanentError, resilient_call
 
 logger = logging.getLogger(__name__)
 
 class EmailService:
     def __init__(self):
         self.debug_mode = os.environ.get('EMAIL_DEBUG_MODE', 'false').lower() == 'true'
+        self.deadline_seconds = float(os.environ.get('EMAIL_DEADLINE_SECONDS', '10'))  # Budget for all attempts of one email
     
     def generate_verification_code(self, length: int = 6) -> str:
         """Generate a random verification code"""
@@ -28,17 +31,11 @@ class EmailService:
             
         Returns:
             Dictionary with send result
+            
+        Raises:
+            PermanentError: The server refused the recipient
         """
         try:
-            # Log SMTP configuration for debugging
-            logger.info(f"📧 Email Config: SMTP Configuration:")
-            logger.info(f"📧 Email Config:   Server: {current_app.config.get('MAIL_SERVER', 'Not set')}")
-            logger.info(f"📧 Email Config:   Port: {current_app.config.get('MAIL_PORT', 'Not set')}")
-            logger.info(f"📧 Email Config:   Use TLS: {current_app.config.get('MAIL_USE_TLS', 'Not set')}")
-            logger.info(f"📧 Email Config:   Use SSL: {current_app.config.get('MAIL_USE_SSL', 'Not set')}")
-            logger.info(f"📧 Email Config:   Username: {current_app.config.get('MAIL_USERNAME', 'Not set')}")
-            logger.info(f"📧 Email Config:   Default Sender: {current_app.config.get('MAIL_DEFAULT_SENDER', 'Not set')}")
-            
             msg = Message(
                 subject='Код подтверждения - OZIMIZ',
                 sender=current_app.config['MAIL_DEFAULT_SENDER'],
@@ -78,14 +75,26 @@ class EmailService:
                 'code': code
             }
             
+        except smtplib.SMTPRecipientsRefused as e:
+            logger.error(f"❌ Email Error: Recipient {email} refused: {str(e)}")
+            raise PermanentError(f"Recipient refused: {str(e)}") from e
         except Exception as e:
             logger.error(f"❌ Email Error: Failed to send email to {email}: {str(e)}")
             raise e
 
-    @retry_on_failure(max_retries=2, delay=2.0, backoff=2.0)
+    def _send_through_breaker(self, email: str, code: str, max_attempts: int) -> Dict[str, Any]:
+        """Send through the smtp circuit breaker within EMAIL_DEADLINE_SECONDS"""
+        return resilient_call(
+            'smtp',
+            lambda deadline: self._send_email_request(email, code),
+            deadline=Deadline(self.deadline_seconds),
+            max_attempts=max_attempts,
+            base_delay=0.5
+        )
+
     def send_verification_email(self, email: str, code: str) -> Dict[str, Any]:
         """
-        Send verification code via email with retry logic and comprehensive logging
+        Send verification code via email, retrying transient failures within the deadline
         
         Args:
             email: Email address to send to
@@ -104,14 +113,34 @@ class EmailService:
                     'code': code
                 }
             
-            # Send email with retry logic
-            result = self._send_email_request(email, code)
+            result = self._send_through_breaker(email, code, max_attempts=3)
             return result
             
         except Exception as e:
             logger.error(f"Error sending email to {email}: {str(e)}")
             return auth_error_handler.handle_email_error(e, email, "Email send error")
 
+    def deliver_verification_code(self, email: str, code: str) -> Dict[str, Any]:
+        """
+        Send a verification email once, for the background delivery task
+        
+        Args:
+            email: Email address to send to
+            code: Verification code
+            
+        Returns:
+            Dictionary with send result
+            
+        Raises:
+            PermanentError: The server refused the recipient
+            CircuitOpenError: SMTP is failing; retry after its retry_after
+            Exception: If the message could not be sent
+        """
+        if self.debug_mode:
+            logger.info(f"DEBUG MODE: Email code for {email}: {code}")
+            return {'success': True, 'message': 'Email sent successfully (DEBUG MODE)', 'email': email}
+        return self._send_through_breaker(email, code, max_attempts=1)
+
     def send_verification_code(self, email: str, code: str) -> bool:
         """
         Legacy method for backward compatibility
@@ -2,9 +2,8 @@
 Centralized error handler for authentication services
 """
 import logging
-import time
-from typing import Dict, Any, Optional, Callable
-from functools import wraps
+from typing import Dict, Any, Optional
+from .circuit_breaker import CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +29,16 @@ class AuthErrorHandler:
         logger.error(f"SMS {operation} failed for {phone}: {error_msg}")
         
         # Check for specific error types
-        if "timeout" in error_msg.lower():
+        if isinstance(error, CircuitOpenError):
+            return {
+                'success': False,
+                'error': 'Сервис SMS временно недоступен, попробуйте позже',
+                'user_message': 'Сервис SMS временно недоступен, попробуйте позже',
+                'error_type': 'unavailable',
+                'retry_after': int(error.retry_after) + 1,
+                'phone': phone
+            }
+        elif "timeout" in error_msg.lower():
             return {
                 'success': False,
                 'error': 'Сервис SMS временно недоступен, попробуйте позже',
@@ -80,7 +88,16 @@ class AuthErrorHandler:
         logger.error(f"Email {operation} failed for {email}: {error_msg}")
         
         # Check for specific error types
-        if "smtp" in error_msg.lower() or "connection" in error_msg.lower():
+        if isinstance(error, CircuitOpenError):
+            return {
+                'success': False,
+                'error': 'Ошибка при отправке письма, попробуйте позже',
+                'user_message': 'Ошибка при отправке письма, попробуйте позже',
+                'error_type': 'unavailable',
+                'retry_after': int(error.retry_after) + 1,
+                'email': email
+            }
+        elif "smtp" in error_msg.lower() or "connection" in error_msg.lower():
             return {
                 'success': False,
                 'error': 'Ошибка при отправке письма, попробуйте позже',
@@ -121,7 +138,15 @@ class AuthErrorHandler:
         logger.error(f"Google OAuth {operation} failed: {error_msg}")
         
         # Check for specific error types
-        if "token" in error_msg.lower() or "authorization" in error_msg.lower():
+        if isinstance(error, CircuitOpenError):
+            return {
+                'success': False,
+                'error': 'Вход через Google временно недоступен, попробуйте позже',
+                'user_message': 'Вход через Google временно недоступен, попробуйте позже',
+                'error_type': 'unavailable',
+                'retry_after': int(error.retry_after) + 1
+            }
+        elif "token" in error_msg.lower() or "authorization" in error_msg.lower():
             return {
                 'success': False,
                 'error': 'Не удалось войти через Google, попробуйте снова',
@@ -158,42 +183,6 @@ class AuthErrorHandler:
         else:
             logger.error(f"{operation} failed: {details}")
 
-def retry_on_failure(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0):
-    """
-    Decorator to retry operations on failure
-    
-    Args:
-        max_retries: Maximum number of retry attempts
-        delay: Initial delay between retries in seconds
-        backoff: Multiplier for delay after each retry
-    """
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            current_delay = delay
-            last_exception = None
-            
-            for attempt in range(max_retries + 1):
-                try:
-                    result = func(*args, **kwargs)
-                    if attempt > 0:
-                        logger.info(f"{func.__name__} succeeded on attempt {attempt + 1}")
-                    return result
-                except Exception as e:
-                    last_exception = e
-                    if attempt < max_retries:
-                        logger.warning(f"{func.__name__} failed on attempt {attempt + 1}: {str(e)}. Retrying in {current_delay}s...")
-                        time.sleep(current_delay)
-                        current_delay *= backoff
-                    else:
-                        logger.error(f"{func.__name__} failed after {max_retries + 1} attempts: {str(e)}")
-            
-            # If we get here, all retries failed
-            raise last_exception
-        
-        return wrapper
-    return decorator
-
 # Global instance
 auth_error_handler = AuthErrorHandler()
 
@@ -0,0 +1,201 @@
+"""
+Kinship-weighted ranking for the family home feed
+
+A bounded window of candidate posts is loaded with a single column query and
+scored in one pass with NumPy arrays: closeness in the family tree, how often
+the viewer interacted with the author, and an exponential recency decay.
+"""
+import logging
+import math
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+
+from app import db
+from app.models.user import User, UserStatus
+from app.models.post import Post, PostPrivacy
+from app.models.follow import Follow
+from app.models.like import Like
+from app.models.comment import Comment
+from app.models.genealogy import GenealogyTreeMember
+from app.services.kinship_service import kinship_service
+
+logger = logging.getLogger(__name__)
+
+class FamilyFeedRanker:
+    """Ranks home feed candidates by kinship distance, interactions and recency"""
+
+    def __init__(self):
+        self.candidate_limit = int(os.environ.get('FAMILY_FEED_CANDIDATES', '500'))
+        self.window_days = int(os.environ.get('FAMILY_FEED_WINDOW_DAYS', '30'))
+        self.max_kinship_depth = int(os.environ.get('FAMILY_FEED_MAX_KINSHIP_DEPTH', '6'))
+        self.recency_half_life_hours = float(os.environ.get('FAMILY_FEED_HALF_LIFE_HOURS', '24'))
+        self.kinship_weight = float(os.environ.get('FAMILY_FEED_KINSHIP_WEIGHT', '0.5'))
+        self.interaction_weight = float(os.environ.get('FAMILY_FEED_INTERACTION_WEIGHT', '0.2'))
+        self.recency_weight = float(os.environ.get('FAMILY_FEED_RECENCY_WEIGHT', '0.3'))
+
+    def get_kin_distances(self, user: User) -> Dict[uuid.UUID, int]:
+        """
+        Kinship distance from the user to every linked relative in their tree
+
+        Only person links granted through tree membership count, never the
+        self-set profile fields.
+
+        Args:
+            user: Viewing user
+
+        Returns:
+            Dictionary of relative user id -> number of steps in the family tree
+        """
+        linked = GenealogyTreeMember.linked_person(user)
+        if not linked:
+            return {}
+        tree_id, person_id = linked
+
+        try:
+            distances = kinship_service.kinship_distances(tree_id, person_id, self.max_kinship_depth)
+        except Exception as e:
+            logger.error(f"Error loading kinship distances for user {user.id}: {str(e)}")
+            return {}
+
+        if len(distances) <= 1:
+            return {}
+
+        members = db.session.query(GenealogyTreeMember.user_id, GenealogyTreeMember.gramps_person_id).join(
+            User, User.id == GenealogyTreeMember.user_id
+        ).filter(
+            GenealogyTreeMember.tree_id == tree_id,
+            GenealogyTreeMember.gramps_person_id.isnot(None),
+            GenealogyTreeMember.user_id != user.id,
+            User.status == UserStatus.ACTIVE
+        )
+        return {
+            member_id: distances[person_id]
+            for member_id, person_id in members
+            if person_id in distances
+        }
+
+    def get_interaction_counts(self, user_id: uuid.UUID, author_ids: List[uuid.UUID]) -> Dict[uuid.UUID, int]:
+        """Number of likes and comments the user left on each author's posts"""
+        if not author_ids:
+            return {}
+
+        since = datetime.now(timezone.utc) - timedelta(days=self.window_days * 3)
+        counts: Dict[uuid.UUID, int] = {}
+
+        for model in (Like, Comment):
+            owner_column = model.user_id if model is Like else model.author_id
+            rows = db.session.query(Post.author_id, func.count(model.id)).join(
+                Post, Post.id == model.post_id
+            ).filter(
+                owner_column == user_id,
+                Post.author_id.in_(author_ids),
+                model.created_at >= since
+            ).group_by(Post.author_id)
+
+            for author_id, count in rows:
+                counts[author_id] = counts.get(author_id, 0) + count
+
+        return counts
+
+    def _candidates(self, user_id: uuid.UUID, kin_ids: List[uuid.UUID]):
+        following_ids = db.session.query(Follow.followed_id).filter_by(follower_id=user_id)
+        since = datetime.now(timezone.utc) - timedelta(days=self.window_days)
+
+        return db.session.query(Post.id, Post.author_id, Post.created_at).filter(
+            or_(
+                Post.author_id.in_(following_ids),
+                Post.author_id.in_(kin_ids),
+                Post.author_id == user_id
+            ),
+            Post.privacy == PostPrivacy.PUBLIC,
+            Post.is_deleted == False,
+            Post.created_at >= since
+        ).order_by(Post.created_at.desc()).limit(self.candidate_limit).all()
+
+    @staticmethod
+    def _timestamp(value: datetime) -> float:
+        if value is None:
+            return 0.0
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+
+    def score(self, kin_distance: np.ndarray, interactions: np.ndarray, age_hours: np.ndarray) -> np.ndarray:
+        """
+        Combine feature arrays into one score per candidate
+
+        Args:
+            kin_distance: Steps in the family tree, NaN for non-relatives
+            interactions: Past likes and comments on the author
+            age_hours: Post age in hours
+
+        Returns:
+            Array of scores, higher ranks first
+        """
+        kinship = np.where(np.isnan(kin_distance), 0.0, 1.0 / (1.0 + np.nan_to_num(kin_distance)))
+
+        interaction = np.log1p(interactions)
+        if interaction.size and interaction.max() > 0:
+            interaction = interaction / interaction.max()
+
+        decay = math.log(2) / self.recency_half_life_hours
+        recency = np.exp(-decay * np.clip(age_hours, 0.0, None))
+
+        return (self.kinship_weight * kinship
+                + self.interaction_weight * interaction
+                + self.recency_weight * recency)
+
+    def rank(self, user: User, page: int = 1, per_page: int = 20) -> Tuple[List[Tuple[Post, Optional[int]]], int]:
+        """
+        Rank the user's candidate posts and return one page
+
+        Args:
+            user: Viewing user
+            page: 1-based page number
+            per_page: Posts per page
+
+        Returns:
+            Tuple of ([(post, kinship distance or None)], total candidates)
+        """
+        kin = self.get_kin_distances(user)
+        candidates = self._candidates(user.id, list(kin))
+        total = len(candidates)
+        if not total:
+            return [], 0
+
+        post_ids = [row.id for row in candidates]
+        author_ids = [row.author_id for row in candidates]
+        interaction_counts = self.get_interaction_counts(user.id, list(set(author_ids)))
+
+        now = datetime.now(timezone.utc).timestamp()
+        kin_distance = np.array([kin.get(author_id, np.nan) for author_id in author_ids], dtype=np.float64)
+        interactions = np.array([interaction_counts.get(author_id, 0) for author_id in author_ids], dtype=np.float64)
+        age_hours = (now - np.array([self._timestamp(row.created_at) for row in candidates])) / 3600.0
+
+        scores = self.score(kin_distance, interactions, age_hours)
+        # Stable sort keeps the newest-first candidate order for equal scores
+        order = np.argsort(-scores, kind='stable')
+
+        start = (max(page, 1) - 1) * per_page
+        page_order = order[start:start + per_page]
+        if not len(page_order):
+            return [], total
+
+        page_ids = [post_ids[i] for i in page_order]
+        posts_by_id = {post.id: post for post in Post.query.filter(Post.id.in_(page_ids))}
+
+        ranked = []
+        for i in page_order:
+            post = posts_by_id.get(post_ids[i])
+            if post:
+                distance = kin.get(post.author_id)
+                ranked.append((post, distance))
+        return ranked, total
+
+# Global instance
+family_feed_ranker = FamilyFeedRanker()
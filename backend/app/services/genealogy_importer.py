@@ -0,0 +1,353 @@
+"""
+Streaming importer for GEDCOM and Gramps XML family trees
+
+Files are parsed one record at a time (line-based for GEDCOM, iterparse with
+element release for Gramps XML) and written with multi-row upserts in
+fixed-size batches, so memory stays bounded regardless of tree size.
+"""
+import gzip
+import io
+import logging
+import os
+import uuid
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, update
+
+from app import db
+from app.models.genealogy import GenealogyPerson, GenealogyRelation, GenealogyTreeMember, RelationType
+from app.services.kinship_service import kinship_service
+
+logger = logging.getLogger(__name__)
+
+GEDCOM_FORMAT = 'gedcom'
+GRAMPS_XML_FORMAT = 'gramps_xml'
+SUPPORTED_FORMATS = (GEDCOM_FORMAT, GRAMPS_XML_FORMAT)
+
+PERSON, RELATION = 'person', 'relation'
+
+Record = Tuple[str, Any]
+
+def detect_format(path: str, filename: Optional[str] = None) -> Optional[str]:
+    """
+    Detect whether a file is GEDCOM or Gramps XML (optionally gzipped)
+
+    Args:
+        path: Path of the stored file
+        filename: Original filename, used for the extension hint
+
+    Returns:
+        Format name or None if unrecognized
+    """
+    name = (filename or path).lower()
+    if name.endswith(('.ged', '.gedcom')):
+        return GEDCOM_FORMAT
+
+    with open(path, 'rb') as f:
+        head = f.read(64)
+
+    if head[:2] == b'\x1f\x8b' or b'<?xml' in head:
+        # .gramps files are gzipped XML
+        return GRAMPS_XML_FORMAT
+    if head.lstrip(b'\xef\xbb\xbf').startswith(b'0 HEAD'):
+        return GEDCOM_FORMAT
+    return None
+
+def _parse_gedcom_name(value: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split a GEDCOM NAME value like 'John /Smith/' into given name and surname"""
+    given, _, rest = value.partition('/')
+    surname = rest.partition('/')[0]
+    return given.strip() or None, surname.strip() or None
+
+def _gedcom_record(tag: str, xref: str, lines: List[Tuple[int, str, str]]) -> Iterator[Record]:
+    if tag == 'INDI':
+        person = {'gramps_id': xref}
+        event = None
+        for level, sub_tag, value in lines:
+            if level == 1:
+                event = sub_tag
+                if sub_tag == 'NAME' and 'given_name' not in person:
+                    person['given_name'], person['surname'] = _parse_gedcom_name(value)
+                elif sub_tag == 'SEX' and value:
+                    person['gender'] = value.strip()[:1].upper()
+            elif level == 2:
+                if event == 'NAME' and sub_tag == 'GIVN' and value:
+                    person['given_name'] = value.strip()
+                elif event == 'NAME' and sub_tag == 'SURN' and value:
+                    person['surname'] = value.strip()
+                elif event == 'BIRT' and sub_tag == 'DATE':
+                    person['birth_date'] = value.strip()[:50]
+                elif event == 'DEAT' and sub_tag == 'DATE':
+                    person['death_date'] = value.strip()[:50]
+        yield PERSON, person
+
+    elif tag == 'FAM':
+        parents, children = [], []
+        for level, sub_tag, value in lines:
+            if level != 1 or not value.startswith('@'):
+                continue
+            if sub_tag in ('HUSB', 'WIFE'):
+                parents.append(value.strip('@'))
+            elif sub_tag == 'CHIL':
+                children.append(value.strip('@'))
+        yield from _family_relations(parents, children)
+
+def _family_relations(parents: List[str], children: List[str]) -> Iterator[Record]:
+    if len(parents) == 2:
+        yield RELATION, (parents[0], parents[1], RelationType.SPOUSE)
+    for parent in parents:
+        for child in children:
+            yield RELATION, (parent, child, RelationType.PARENT)
+
+def iter_gedcom(stream: io.TextIOBase) -> Iterator[Record]:
+    """
+    Yield person and relation records from a GEDCOM text stream
+
+    Only the lines of the current level-0 record are kept in memory.
+    """
+    record = None
+    for raw_line in stream:
+        line = raw_line.strip()
+        if not line:
+            continue
+        parts = line.split(' ', 2)
+        try:
+            level = int(parts[0])
+        except ValueError:
+            continue
+
+        if level == 0:
+            if record:
+                yield from _gedcom_record(*record)
+            record = None
+            if len(parts) == 3 and parts[1].startswith('@') and parts[2].strip() in ('INDI', 'FAM'):
+                record = (parts[2].strip(), parts[1].strip('@'), [])
+        elif record is not None:
+            tag = parts[1] if len(parts) > 1 else ''
+            value = parts[2] if len(parts) > 2 else ''
+            record[2].append((level, tag, value))
+
+    if record:
+        yield from _gedcom_record(*record)
+
+def _local_name(tag: str) -> str:
+    """Strip the Gramps XML namespace from a tag"""
+    return tag.rsplit('}', 1)[-1]
+
+def _gramps_person(elem: ET.Element) -> Optional[Dict[str, Any]]:
+    handle = elem.get('handle')
+    if not handle:
+        return None
+    person = {'gramps_id': handle}
+    for child in elem:
+        tag = _local_name(child.tag)
+        if tag == 'gender' and child.text:
+            person['gender'] = child.text.strip()[:1].upper()
+        elif tag == 'name' and 'given_name' not in person:
+            for part in child:
+                part_tag = _local_name(part.tag)
+                if part_tag == 'first' and part.text:
+                    person['given_name'] = part.text.strip()
+                elif part_tag == 'surname' and part.text and 'surname' not in person:
+                    person['surname'] = part.text.strip()
+            person.setdefault('given_name', None)
+    return person
+
+def _gramps_family(elem: ET.Element) -> Iterator[Record]:
+    parents, children = [], []
+    for child in elem:
+        tag = _local_name(child.tag)
+        if tag in ('father', 'mother') and child.get('hlink'):
+            parents.append(child.get('hlink'))
+        elif tag == 'childref' and child.get('hlink'):
+            children.append(child.get('hlink'))
+    yield from _family_relations(parents, children)
+
+def iter_gramps_xml(stream: io.BufferedIOBase) -> Iterator[Record]:
+    """
+    Yield person and relation records from a Gramps XML byte stream
+
+    Persons are keyed by Gramps handle, which is what families reference.
+    Every record under a top-level collection (people, families, events, ...)
+    is removed from the tree once parsed.
+    """
+    ancestors: List[ET.Element] = []
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            ancestors.append(elem)
+            continue
+
+        ancestors.pop()
+        if len(ancestors) != 2:
+            continue
+
+        tag = _local_name(elem.tag)
+        if tag == 'person':
+            person = _gramps_person(elem)
+            if person:
+                yield PERSON, person
+        elif tag == 'family':
+            yield from _gramps_family(elem)
+
+        # database > collection > record: release the parsed record
+        elem.clear()
+        ancestors[-1].remove(elem)
+
+def _dialect_insert(table):
+    """INSERT construct supporting ON CONFLICT for the current database"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+class GenealogyImporter:
+    """Imports a GEDCOM or Gramps XML file into a tree in bounded batches"""
+
+    PERSON_FIELDS = ('given_name', 'surname', 'gender', 'birth_date', 'death_date')
+
+    def __init__(self, tree_id: str, batch_size: Optional[int] = None,
+                 progress_callback: Optional[Callable[[int, int, int], None]] = None,
+                 import_id: Optional[uuid.UUID] = None):
+        self.tree_id = tree_id
+        self.import_id = import_id
+        self.batch_size = batch_size or int(os.environ.get('GENEALOGY_IMPORT_BATCH_SIZE', '1000'))
+        self.progress_callback = progress_callback
+        self.persons_count = 0
+        self.relations_count = 0
+        self._persons: Dict[str, Dict[str, Any]] = {}
+        self._relations: set = set()
+
+    @staticmethod
+    def _open_stream(raw: io.BufferedReader, source_format: str):
+        gzipped = raw.read(2) == b'\x1f\x8b'
+        raw.seek(0)
+        binary = gzip.GzipFile(fileobj=raw) if gzipped else raw
+        if source_format == GEDCOM_FORMAT:
+            return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace')
+        return binary
+
+    def run(self, path: str, source_format: str) -> Dict[str, int]:
+        """
+        Parse the file and write all persons and relations
+
+        Args:
+            path: Path of the uploaded file
+            source_format: GEDCOM_FORMAT or GRAMPS_XML_FORMAT
+
+        Returns:
+            Dictionary with import statistics
+        """
+        if source_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported genealogy format: {source_format}")
+
+        with open(path, 'rb') as raw:
+            stream = self._open_stream(raw, source_format)
+            parser = iter_gedcom if source_format == GEDCOM_FORMAT else iter_gramps_xml
+
+            for kind, value in parser(stream):
+                if kind == PERSON:
+                    self._persons[value['gramps_id']] = value
+                else:
+                    source_id, target_id, relation_type = value
+                    if relation_type == RelationType.SPOUSE:
+                        source_id, target_id = sorted((source_id, target_id))
+                    if source_id != target_id:
+                        self._relations.add((source_id, target_id, relation_type))
+
+                if len(self._persons) + len(self._relations) >= self.batch_size:
+                    self._flush(raw.tell())
+
+            self._flush(raw.tell())
+
+        linked_users = self.link_users()
+        kinship_service.invalidate(self.tree_id)
+        ancestry_rows = kinship_service.rebuild_closure(self.tree_id)
+        db.session.commit()
+
+        logger.info(f"Imported tree {self.tree_id}: {self.persons_count} persons, "
+                    f"{self.relations_count} relations, {linked_users} linked users")
+
+        return {
+            'persons_count': self.persons_count,
+            'relations_count': self.relations_count,
+            'linked_users_count': linked_users,
+            'ancestry_rows': ancestry_rows
+        }
+
+    def _flush(self, bytes_processed: int):
+        """Write the buffered batch with multi-row upserts and commit it
+
+        Rows that already exist keep the import_id of the import that inserted them.
+        """
+        if self._persons:
+            rows = [
+                {'tree_id': self.tree_id, 'gramps_id': gramps_id, 'import_id': self.import_id,
+                 **{field: person.get(field) for field in self.PERSON_FIELDS}}
+                for gramps_id, person in self._persons.items()
+            ]
+            stmt = _dialect_insert(GenealogyPerson.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['tree_id', 'gramps_id'],
+                set_={field: stmt.excluded[field] for field in self.PERSON_FIELDS}
+            )
+            db.session.execute(stmt)
+            self.persons_count += len(rows)
+            self._persons = {}
+
+        if self._relations:
+            rows = [
+                {'tree_id': self.tree_id, 'source_id': source_id, 'target_id': target_id,
+                 'relation_type': relation_type, 'import_id': self.import_id}
+                for source_id, target_id, relation_type in self._relations
+            ]
+            stmt = _dialect_insert(GenealogyRelation.__table__).values(rows)
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=['tree_id', 'source_id', 'target_id', 'relation_type']
+            )
+            db.session.execute(stmt)
+            self.relations_count += len(rows)
+            self._relations = set()
+
+        if self.progress_callback:
+            self.progress_callback(bytes_processed, self.persons_count, self.relations_count)
+        db.session.commit()
+
+    def discard(self) -> Dict[str, int]:
+        """Delete the persons and relations this import inserted after it failed part way"""
+        if self.import_id is None:
+            raise ValueError("Only an import with an import_id can be discarded")
+
+        relations_deleted = GenealogyRelation.query.filter(
+            GenealogyRelation.tree_id == self.tree_id,
+            GenealogyRelation.import_id == self.import_id
+        ).delete(synchronize_session=False)
+        persons_deleted = GenealogyPerson.query.filter(
+            GenealogyPerson.tree_id == self.tree_id,
+            GenealogyPerson.import_id == self.import_id
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        logger.info(f"Discarded failed import into tree {self.tree_id}: "
+                    f"{persons_deleted} persons, {relations_deleted} relations")
+
+        return {'persons_deleted': persons_deleted, 'relations_deleted': relations_deleted}
+
+    def link_users(self) -> int:
+        """Link imported persons to members of this tree linked to their gramps_person_id"""
+        matching_user = select(GenealogyTreeMember.user_id).where(
+            GenealogyTreeMember.gramps_person_id == GenealogyPerson.gramps_id,
+            GenealogyTreeMember.tree_id == self.tree_id
+        ).limit(1).scalar_subquery()
+
+        db.session.execute(
+            update(GenealogyPerson.__table__)
+            .where(GenealogyPerson.tree_id == self.tree_id)
+            .values(user_id=matching_user)
+        )
+
+        return GenealogyPerson.query.filter(
+            GenealogyPerson.tree_id == self.tree_id,
+            GenealogyPerson.user_id.isnot(None)
+        ).count()
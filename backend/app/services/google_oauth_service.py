@@ -1,9 +1,10 @@
-import requests
 import logging
 import os
 from typing import Dict, Any, Optional
 from urllib.parse import urlencode
-from .error_handler import auth_error_handler, retry_on_failure
+from .error_handler import auth_error_handler
+from .circuit_breaker import Deadline, PermanentError, resilient_call
+from .http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +21,8 @@ class GoogleOAuthService:
         self.auth_url = 'https://accounts.google.com/o/oauth2/v2/auth'
         self.token_url = 'https://oauth2.googleapis.com/token'
         self.user_info_url = 'https://www.googleapis.com/oauth2/v2/userinfo'
+        self.read_timeout = float(os.getenv('GOOGLE_OAUTH_TIMEOUT', '5'))
+        self.deadline_seconds = float(os.getenv('GOOGLE_OAUTH_DEADLINE', '8'))
         
         if not self.client_id or not self.client_secret:
             logger.warning("Google OAuth credentials not configured")
@@ -48,12 +51,13 @@ class GoogleOAuthService:
             
         return f"{self.auth_url}?{urlencode(params)}"
     
-    def _exchange_code_for_token_request(self, code: str) -> Dict[str, Any]:
+    def _exchange_code_for_token_request(self, code: str, deadline: Deadline) -> Dict[str, Any]:
         """
         Internal method to exchange authorization code for access token
         
         Args:
             code: Authorization code from Google
+            deadline: Time budget that bounds the request timeouts
             
         Returns:
             Dictionary with token information
@@ -70,10 +74,10 @@ class GoogleOAuthService:
         logger.info(f"🔐 Google OAuth: Token URL: {self.token_url}")
         logger.info(f"🔐 Google OAuth: Redirect URI: {self.redirect_uri}")
         
-        response = requests.post(self.token_url, data=data, timeout=30)
+        response = http_client.post(self.token_url, data=data,
+                                    timeout=deadline.timeout(http_client.connect_timeout, self.read_timeout))
         
         logger.info(f"🔐 Google OAuth: Token response status: {response.status_code}")
-        logger.info(f"🔐 Google OAuth: Token response text: {response.text}")
         
         if response.status_code == 200:
             token_data = response.json()
@@ -87,12 +91,12 @@ class GoogleOAuthService:
             }
         else:
             logger.error(f"❌ Google OAuth Error: Token exchange failed: {response.status_code} - {response.text}")
-            raise Exception(f"Token exchange failed: {response.status_code} - {response.text}")
+            error_class = PermanentError if response.status_code < 500 else Exception
+            raise error_class(f"Token exchange failed: {response.status_code} - {response.text}")
 
-    @retry_on_failure(max_retries=2, delay=1.0, backoff=2.0)
     def exchange_code_for_token(self, code: str) -> Dict[str, Any]:
         """
-        Exchange authorization code for access token with retry logic
+        Exchange authorization code for access token through the google_oauth circuit breaker
         
         Args:
             code: Authorization code from Google
@@ -101,19 +105,28 @@ class GoogleOAuthService:
             Dictionary with token information
         """
         try:
-            result = self._exchange_code_for_token_request(code)
+            # Codes are single-use: Google may have redeemed it even when the answer
+            # (5xx, read timeout) never arrived, and a retry would only hide that
+            # failure behind invalid_grant, so the exchange is attempted once
+            result = resilient_call(
+                'google_oauth',
+                lambda deadline: self._exchange_code_for_token_request(code, deadline),
+                deadline=Deadline(self.deadline_seconds),
+                max_attempts=1
+            )
             return result
                 
         except Exception as e:
             logger.error(f"❌ Google OAuth Error: Error exchanging code for token: {str(e)}")
             return auth_error_handler.handle_google_oauth_error(e, "Token exchange")
     
-    def _get_user_info_request(self, access_token: str) -> Dict[str, Any]:
+    def _get_user_info_request(self, access_token: str, deadline: Deadline) -> Dict[str, Any]:
         """
         Internal method to get user information from Google API
         
         Args:
             access_token: Google access token
+            deadline: Time budget that bounds the request timeouts
             
         Returns:
             Dictionary with user information
@@ -125,7 +138,8 @@ class GoogleOAuthService:
         logger.info(f"🔐 Google OAuth: Getting user info")
         logger.info(f"🔐 Google OAuth: User info URL: {self.user_info_url}")
         
-        response = requests.get(self.user_info_url, headers=headers, timeout=30)
+        response = http_client.get(self.user_info_url, headers=headers,
+                                   timeout=deadline.timeout(http_client.connect_timeout, self.read_timeout))
         
         logger.info(f"🔐 Google OAuth: User info response status: {response.status_code}")
         logger.info(f"🔐 Google OAuth: User info response text: {response.text}")
@@ -147,12 +161,12 @@ class GoogleOAuthService:
             }
         else:
             logger.error(f"❌ Google OAuth Error: Failed to get user info: {response.status_code} - {response.text}")
-            raise Exception(f"Failed to get user info: {response.status_code} - {response.text}")
+            error_class = PermanentError if response.status_code < 500 else Exception
+            raise error_class(f"Failed to get user info: {response.status_code} - {response.text}")
 
-    @retry_on_failure(max_retries=2, delay=1.0, backoff=2.0)
     def get_user_info(self, access_token: str) -> Dict[str, Any]:
         """
-        Get user information from Google API with retry logic
+        Get user information from Google API through the google_oauth circuit breaker
         
         Args:
             access_token: Google access token
@@ -161,7 +175,11 @@ class GoogleOAuthService:
             Dictionary with user information
         """
         try:
-            result = self._get_user_info_request(access_token)
+            result = resilient_call(
+                'google_oauth',
+                lambda deadline: self._get_user_info_request(access_token, deadline),
+                deadline=Deadline(self.deadline_seconds)
+            )
             return result
                 
         except Exception as e:
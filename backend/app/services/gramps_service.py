@@ -1,9 +1,12 @@
-import requests
+import io
 import os
 import uuid
-from werkzeug.utils import secure_filename
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, BinaryIO, List, Tuple
 import logging
+from .http_client import http_client
+from .media_storage import media_storage, UploadRejected
+
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
 logger = logging.getLogger(__name__)
 
@@ -13,61 +16,97 @@ class GrampsMediaService:
     def __init__(self):
         self.base_url = os.environ.get('GRAMPS_BASE_URL', 'http://grampsweb:5000')
         self.api_key = os.environ.get('GRAMPS_API_KEY', '')
-        self.session = requests.Session()
+        # Requests go through the shared pool; only the headers are per service
+        self.http = http_client
+        self.headers = {}
         
         # Set up authentication headers if API key is provided
         if self.api_key:
-            self.session.headers.update({
+            self.headers.update({
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json'
             })
     
     def upload_media_file(self, file_data: bytes, filename: str, mime_type: str) -> Optional[Dict[str, Any]]:
         """
-        Upload a media file to Gramps Web API
+        Upload a media file that is already in memory
         
         Args:
             file_data: Binary file data
             filename: Original filename
-            mime_type: MIME type of the file
+            mime_type: MIME type claimed by the client (the detected type wins)
             
         Returns:
             Dictionary with media information or None if failed
         """
-        try:
-            # Generate a unique filename to avoid conflicts
-            safe_filename = secure_filename(filename)
-            unique_filename = f"{uuid.uuid4().hex}_{safe_filename}"
+        return self.upload_media_stream(io.BytesIO(file_data), filename)
+    
+    def upload_media_stream(self, stream: BinaryIO, filename: str,
+                            max_size: int = DEFAULT_MAX_FILE_SIZE) -> Optional[Dict[str, Any]]:
+        """
+        Upload a media file from a stream without reading it into memory
+        
+        Args:
+            stream: Upload stream (ideally the HashingUploadFile the request
+                parser already wrote to disk)
+            filename: Original filename
+            max_size: Maximum size in bytes
+            
+        Returns:
+            Dictionary with media information or None if failed
             
+        Raises:
+            UploadRejected: The file is too large or not a supported image
+        """
+        try:
             # For now, we'll store files locally and return a mock Gramps response
             # This allows us to test the media upload functionality
             # TODO: Implement actual Gramps Web API integration
-            
-            # Create uploads directory if it doesn't exist
-            upload_dir = os.path.join(os.getcwd(), 'uploads')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Save file locally
-            file_path = os.path.join(upload_dir, unique_filename)
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            
-            logger.info(f"Successfully saved media file locally: {unique_filename}")
-            
-            # Return mock Gramps response for now
-            return {
-                'gramps_media_id': str(uuid.uuid4()),  # Mock ID
-                'gramps_url': f"https://my.ozimiz.org/api/uploads/{unique_filename}",  # Full URL for frontend
-                'filename': unique_filename,
-                'original_filename': filename,
-                'mime_type': mime_type,
-                'file_size': len(file_data)
-            }
-                
+            return self._media_info(media_storage.save(stream, filename, max_size), filename)
+        
+        except UploadRejected:
+            raise
         except Exception as e:
             logger.error(f"Error uploading media file: {str(e)}")
             return None
     
+    def upload_media_streams(self, uploads: List[Tuple[BinaryIO, str]],
+                             max_size: int = DEFAULT_MAX_FILE_SIZE) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Upload several media files at once, each as upload_media_stream
+        
+        Args:
+            uploads: (stream, filename) pairs
+            max_size: Maximum size in bytes of each file
+            
+        Returns:
+            (media information, None) or (None, exception) per file, in order
+        """
+        results = []
+        for (stream, filename), (stored, error) in zip(uploads, media_storage.save_all(uploads, max_size)):
+            if error and not isinstance(error, UploadRejected):
+                logger.error(f"Error uploading media file: {str(error)}")
+            results.append((self._media_info(stored, filename), None) if stored else (None, error))
+        return results
+    
+    @staticmethod
+    def _media_info(stored: Dict[str, Any], filename: str) -> Dict[str, Any]:
+        """Gramps-style media information of a file saved in local storage"""
+        unique_filename = stored['storage_key']
+        logger.info(f"Successfully saved media file locally: {unique_filename}")
+        
+        # Return mock Gramps response for now
+        return {
+            'gramps_media_id': str(uuid.uuid4()),  # Mock ID
+            'gramps_url': f"https://my.ozimiz.org/api/uploads/{unique_filename}",  # Full URL for frontend
+            'filename': unique_filename,
+            'original_filename': filename,
+            'mime_type': stored['mime_type'],
+            'file_size': stored['file_size'],
+            'sha256': stored['sha256'],
+            'deduplicated': stored['deduplicated']
+        }
+    
     def get_media_url(self, gramps_media_id: str) -> Optional[str]:
         """
         Get the URL for accessing a media file from Gramps
@@ -93,19 +132,29 @@ class GrampsMediaService:
         """
         Delete a media file from local storage
         
+        Deduplicated files are shared: only a reference is dropped, in the
+        caller's transaction, and the blob is removed by the media.collect_blobs
+        task once nothing points at it any more.
+        
         Args:
             filename: The filename to delete
             
         Returns:
             True if successful, False otherwise
         """
+        from app.models.media_blob import MediaBlob
         try:
             if not filename:
                 return False
+            
+            blob = MediaBlob.query.filter_by(storage_key=filename).first()
+            if blob:
+                MediaBlob.release(blob.id)
+                logger.info(f"Released a reference to media blob {filename}")
+                return True
                 
             # For now, try to delete local file
-            upload_dir = os.path.join(os.getcwd(), 'uploads')
-            file_path = os.path.join(upload_dir, filename)
+            file_path = media_storage.path_for(media_storage.resolve(filename))
             
             if os.path.exists(file_path):
                 os.remove(file_path)
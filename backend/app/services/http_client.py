@@ -0,0 +1,193 @@
+"""
+Shared outbound HTTP client for external APIs
+
+One requests.Session per process keeps a keep-alive connection pool per
+host, so repeated calls to the same API skip the TCP and TLS handshakes.
+Every request gets explicit (connect, read) timeouts, and a per-host
+semaphore caps how many requests a process runs against one host at once,
+so a slow upstream cannot absorb every worker. Per-host metrics are kept in
+memory and exposed through /api/admin/http-client-stats.
+"""
+import logging
+import os
+import ssl
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float]]
+
+class HostBusyError(requests.exceptions.ConnectionError):
+    """All request slots for a host stayed taken for the whole acquire timeout"""
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools share one SSL context (CA bundle loaded once)"""
+
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+class _HostMetrics:
+    __slots__ = ('requests', 'errors', 'timeouts', 'rejected', 'in_flight', 'total_seconds', 'max_seconds', 'statuses')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.statuses: Dict[str, int] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        completed = self.requests - self.in_flight
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'in_flight': self.in_flight,
+            'avg_ms': round(self.total_seconds / completed * 1000, 1) if completed > 0 else None,
+            'max_ms': round(self.max_seconds * 1000, 1),
+            'statuses': dict(self.statuses)
+        }
+
+class HttpClient:
+    """Process-wide pooled HTTP client with per-host limits and metrics"""
+
+    def __init__(self):
+        self.connect_timeout = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05'))
+        self.read_timeout = float(os.environ.get('HTTP_READ_TIMEOUT', '10'))
+        self.max_per_host = int(os.environ.get('HTTP_MAX_CONCURRENCY_PER_HOST', '10'))
+        self.max_hosts = int(os.environ.get('HTTP_POOL_HOSTS', '20'))
+        self.acquire_timeout = float(os.environ.get('HTTP_ACQUIRE_TIMEOUT', '5'))
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._pid: Optional[int] = None
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._metrics: Dict[str, _HostMetrics] = {}
+
+    @property
+    def session(self) -> requests.Session:
+        """The process's session, recreated after fork so workers never share sockets"""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+                    self._slots = {}
+                    self._metrics = {}
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _PooledAdapter(
+            ssl.create_default_context(),
+            pool_connections=self.max_hosts,
+            pool_maxsize=self.max_per_host,
+            pool_block=False,
+            max_retries=0
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _host_state(self, host: str):
+        with self._lock:
+            slots = self._slots.get(host)
+            if slots is None:
+                slots = self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+                self._metrics[host] = _HostMetrics()
+            return slots, self._metrics[host]
+
+    def request(self, method: str, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the shared pool
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            timeout: Seconds, or (connect, read); defaults to HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT
+            **kwargs: Passed to requests.Session.request
+
+        Returns:
+            The response; raising for error statuses is left to the caller
+
+        Raises:
+            HostBusyError: No request slot for the host became free in time
+            requests.exceptions.RequestException: Connection errors and timeouts
+        """
+        session = self.session
+        host = urlsplit(url).netloc.lower()
+        slots, metrics = self._host_state(host)
+
+        if not slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                metrics.rejected += 1
+            raise HostBusyError(f"Too many concurrent requests to {host}")
+
+        with self._lock:
+            metrics.requests += 1
+            metrics.in_flight += 1
+        started = time.monotonic()
+        status = None
+        try:
+            response = session.request(
+                method, url, timeout=timeout or (self.connect_timeout, self.read_timeout), **kwargs
+            )
+            status = f"{response.status_code // 100}xx"
+            return response
+        except requests.exceptions.Timeout:
+            with self._lock:
+                metrics.timeouts += 1
+            raise
+        except requests.exceptions.RequestException:
+            with self._lock:
+                metrics.errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            slots.release()
+            with self._lock:
+                metrics.in_flight -= 1
+                metrics.total_seconds += elapsed
+                metrics.max_seconds = max(metrics.max_seconds, elapsed)
+                if status:
+                    metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-host counters of this process"""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'max_per_host': self.max_per_host,
+                'timeouts': {'connect': self.connect_timeout, 'read': self.read_timeout},
+                'hosts': {host: metrics.to_dict() for host, metrics in self._metrics.items()}
+            }
+
+# Global instance
+http_client = HttpClient()
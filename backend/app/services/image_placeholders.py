@@ -0,0 +1,90 @@
+"""
+Image placeholders
+
+Feeds paint a placeholder while the real image loads, without another
+request: both values are computed once by the variant task and travel
+inline with the media entries of a post.
+
+- BlurHash (https://blurha.sh): a ~30 character string decoded by clients
+  into a smooth colour field.
+- LQIP: a tiny (16 px) WebP as a data URI, which any <img> or CSS
+  background can show directly.
+"""
+import base64
+import io
+import math
+
+import numpy as np
+from PIL import Image
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+# Pixels the BlurHash is computed from: the result only holds a few cosines anyway
+_BLURHASH_SAMPLE_EDGE = 32
+
+def _base83(value: int, length: int) -> str:
+    return ''.join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+def _linear_to_srgb(value: float) -> int:
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+def _sign_pow(value: float, exponent: float) -> float:
+    return math.copysign(abs(value) ** exponent, value)
+
+def blurhash(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    """
+    BlurHash of an image
+
+    Args:
+        image: Any Pillow image; it is downscaled first
+        x_components, y_components: Cosine components per axis (1-9)
+
+    Returns:
+        The BlurHash string
+    """
+    sample = image.convert('RGB')
+    sample.thumbnail((_BLURHASH_SAMPLE_EDGE, _BLURHASH_SAMPLE_EDGE), Image.Resampling.BILINEAR)
+    pixels = _srgb_to_linear(np.asarray(sample, dtype=np.float64))
+    height, width = pixels.shape[:2]
+
+    basis_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    # factors[j, i] = mean over pixels of colour * cos(i x) * cos(j y), doubled for AC terms
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, pixels) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, math.floor(float(np.abs(ac).max()) * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for component in ac:
+        r, g, b = (
+            int(max(0, min(18, math.floor(_sign_pow(value / maximum, 0.5) * 9 + 9.5))))
+            for value in component
+        )
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+def lqip_data_uri(image: Image.Image, edge: int = 16, quality: int = 30) -> str:
+    """Tiny WebP rendition of an image as a data: URI"""
+    preview = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'PA') else 'RGB')
+    preview.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    preview.save(buffer, format='WEBP', quality=quality)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
@@ -0,0 +1,268 @@
+"""
+On-demand image resizing
+
+Avatars and grids ask for sizes that are not among the pre-generated
+variants (/api/media/<id>/file?w=&h=&fmt=). Requested sizes are snapped up
+to an allowed list so the number of renditions per image stays small, and
+every rendition is rendered once into a cache under the uploads directory:
+
+- writes are atomic (temp file, fsync, rename), so a half-written file is
+  never served;
+- concurrent requests for the same rendition are coalesced: one renders,
+  the others (threads/greenlets of this worker or other workers) wait for
+  it and serve the cached file;
+- decoding and encoding run on the storage's native thread pool, so a
+  gevent worker keeps serving other requests while Pillow works;
+- the cache is bounded in bytes: the media.evict_resize_cache task
+  periodically deletes the least recently used files, hits refreshing their
+  modification time.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from .image_variants import AVIF_SUPPORTED
+from .media_storage import HashingUploadFile, media_storage, shard_key
+
+logger = logging.getLogger(__name__)
+
+RESIZE_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG', 'avif': 'AVIF'}
+
+# Cache keys are relative to the uploads directory, so files are served like any other
+CACHE_PREFIX = '.cache'
+
+# Cross-worker render locks are striped over a fixed number of lock files
+_LOCK_STRIPES = 64
+
+# A hit only rewrites the modification time when it is older than this
+_TOUCH_INTERVAL = 3600
+
+def _parse_edges(value: str) -> List[int]:
+    """'64,128,256' -> [64, 128, 256]"""
+    return sorted({int(item) for item in value.split(',') if item.strip()})
+
+class ResizeRejected(ValueError):
+    """The requested size or format is not valid"""
+
+class ImageResizer:
+    """Renders and caches resized copies of stored images"""
+
+    def __init__(self):
+        # Allowed edge lengths in pixels; requests are rounded up to one of them
+        self.edges = _parse_edges(os.environ.get(
+            'MEDIA_RESIZE_SIZES', '32,48,64,96,128,160,240,320,480,640,960,1280'
+        ))
+        self.max_cache_bytes = int(os.environ.get('MEDIA_RESIZE_CACHE_BYTES', str(1024 ** 3)))
+        self.lock_timeout = float(os.environ.get('MEDIA_RESIZE_LOCK_TIMEOUT', '30'))
+        self.quality = int(os.environ.get('MEDIA_RESIZE_QUALITY', '80'))
+        self.cache_dir = os.path.join(media_storage.upload_dir, CACHE_PREFIX)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def formats(self) -> List[str]:
+        return [fmt for fmt in RESIZE_FORMATS if fmt != 'avif' or AVIF_SUPPORTED]
+
+    def snap(self, value: Optional[str]) -> Optional[int]:
+        """
+        Round a requested edge up to the nearest allowed size
+
+        Raises:
+            ResizeRejected: The value is not a positive integer
+        """
+        if value in (None, ''):
+            return None
+        try:
+            edge = int(value)
+        except ValueError:
+            raise ResizeRejected(f'Invalid size: {value}')
+        if edge <= 0:
+            raise ResizeRejected(f'Invalid size: {value}')
+        return next((allowed for allowed in self.edges if allowed >= edge), self.edges[-1])
+
+    @staticmethod
+    def rendition_key(storage_key: str, width: Optional[int], height: Optional[int], image_format: str) -> str:
+        """Cache key of a rendition; all renditions of an original share a directory"""
+        stem = os.path.splitext(os.path.basename(storage_key))[0]
+        directory = os.path.dirname(shard_key(stem))
+        return f"{CACHE_PREFIX}/{directory}/{stem}_{width or 0}x{height or 0}.{image_format}"
+
+    def get(self, storage_key: str, width: Optional[int], height: Optional[int], image_format: str) -> str:
+        """
+        Cache key of the rendition, rendering it first if needed
+
+        Args:
+            storage_key: Key of the original image
+            width, height: Allowed edge lengths (see snap); with both, the
+                image is cropped to fill them, with one it is scaled to fit
+            image_format: One of formats
+
+        Returns:
+            Storage key of the cached rendition
+        """
+        if image_format not in self.formats:
+            raise ResizeRejected(f'Unsupported format: {image_format}')
+        if not width and not height:
+            raise ResizeRejected('Width or height is required')
+
+        key = self.rendition_key(storage_key, width, height, image_format)
+        path = media_storage.path_for(key)
+        if self._hit(path):
+            return key
+
+        with self._coalesced(key):
+            if not self._hit(path):
+                media_storage.executor.submit(
+                    self._render, storage_key, path, width, height, image_format
+                ).result()
+        return key
+
+    def _hit(self, path: str) -> bool:
+        """Whether the rendition is cached; refreshes its LRU position"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        if now - mtime > _TOUCH_INTERVAL:
+            try:
+                os.utime(path, (now, now))
+            except FileNotFoundError:
+                # Evicted in between: render again
+                return False
+        return True
+
+    @contextmanager
+    def _coalesced(self, key: str):
+        """
+        Hold the render lock of a rendition
+
+        A per-key lock serialises threads (or greenlets) of this process, a
+        striped flock other workers. The flock is polled rather than
+        blocking so a gevent worker keeps serving other requests meanwhile;
+        after lock_timeout the caller renders regardless.
+        """
+        with self._inflight_lock:
+            lock, waiters = self._inflight.get(key, (threading.Lock(), 0))
+            self._inflight[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                locks_dir = os.path.join(self.cache_dir, '.locks')
+                os.makedirs(locks_dir, exist_ok=True)
+                stripe = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) % _LOCK_STRIPES
+                with open(os.path.join(locks_dir, f'{stripe:02d}.lock'), 'a') as lock_file:
+                    deadline = time.monotonic() + self.lock_timeout
+                    while True:
+                        try:
+                            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                            break
+                        except BlockingIOError:
+                            if time.monotonic() > deadline:
+                                logger.warning(f"Timed out waiting for the render lock of {key}")
+                                break
+                            time.sleep(0.05)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._inflight_lock:
+                lock, waiters = self._inflight[key]
+                if waiters == 1:
+                    del self._inflight[key]
+                else:
+                    self._inflight[key] = (lock, waiters - 1)
+
+    def _render(self, storage_key: str, path: str, width: Optional[int], height: Optional[int], image_format: str):
+        """Resize the original and atomically store the result at path"""
+        with Image.open(media_storage.path_for(media_storage.resolve(storage_key))) as image:
+            # JPEG decodes straight at 1/2, 1/4 or 1/8 scale when that is still large enough
+            image.draft('RGB', (width or height, height or width))
+            image = ImageOps.exif_transpose(image)
+            mode = 'RGBA' if image.mode in ('RGBA', 'LA', 'P', 'PA') and image_format != 'jpeg' else 'RGB'
+            image = image.convert(mode)
+
+            if width and height:
+                # Never upscale: shrink the box, keeping its aspect ratio
+                scale = min(1.0, image.width / width, image.height / height)
+                box = (max(1, round(width * scale)), max(1, round(height * scale)))
+                image = ImageOps.fit(image, box, Image.Resampling.LANCZOS)
+            else:
+                image.thumbnail((width or image.width, height or image.height), Image.Resampling.LANCZOS,
+                                reducing_gap=3.0)
+
+            os.makedirs(os.path.join(self.cache_dir, '.tmp'), exist_ok=True)
+            with HashingUploadFile(os.path.join(self.cache_dir, '.tmp')) as output:
+                options = {'quality': self.quality}
+                if image_format == 'jpeg':
+                    options['progressive'] = True
+                elif image_format == 'webp':
+                    options['method'] = 4
+                image.save(output, format=RESIZE_FORMATS[image_format], **options)
+                output.commit(path)
+                size = output.size
+
+        logger.info(f"Rendered {os.path.basename(path)} ({size} bytes)")
+
+    def evict(self) -> int:
+        """
+        Delete the least recently used renditions until the cache is under
+        90% of its size limit
+
+        Returns:
+            Number of files deleted
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        for directory, subdirectories, files in os.walk(self.cache_dir):
+            if directory == self.cache_dir:
+                subdirectories[:] = [name for name in subdirectories if not name.startswith('.')]
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_cache_bytes:
+            return 0
+
+        deleted = 0
+        target = self.max_cache_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        logger.info(f"Evicted {deleted} cached renditions")
+        return deleted
+
+    def purge(self, storage_key: str) -> int:
+        """Delete every cached rendition of an original; returns the count"""
+        directory = os.path.dirname(media_storage.path_for(self.rendition_key(storage_key, 0, 0, 'webp')))
+        prefix = os.path.splitext(os.path.basename(storage_key))[0] + '_'
+        try:
+            names = [name for name in os.listdir(directory) if name.startswith(prefix)]
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        return len(names)
+
+# Global instance
+image_resizer = ImageResizer()
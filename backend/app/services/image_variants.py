@@ -0,0 +1,138 @@
+"""
+Responsive image variants
+
+After an upload is stored, a background task renders downscaled copies of
+the original (thumbnail, medium, large) as WebP, plus AVIF when the Pillow
+build can encode it, and records them on the content blob and every Media
+row sharing it. Feeds then serve the variant that fits the layout instead
+of the full-size original. The BlurHash and LQIP placeholders are computed
+in the same pass, from the smallest variant.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image, ImageOps
+
+from .image_placeholders import blurhash, lqip_data_uri
+from .media_storage import media_storage, shard_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pillow_avif  # noqa: F401  Registers the AVIF codec on older Pillow builds
+except ImportError:
+    pass
+
+Image.init()
+AVIF_SUPPORTED = 'AVIF' in Image.SAVE
+
+# EXIF orientations that swap width and height
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+def _parse_sizes(value: str) -> List[Tuple[str, int]]:
+    """'thumbnail:320,medium:720' -> [('thumbnail', 320), ('medium', 720)]"""
+    sizes = []
+    for item in value.split(','):
+        name, _, edge = item.strip().partition(':')
+        if name and edge:
+            sizes.append((name, int(edge)))
+    return sizes
+
+class ImageVariantGenerator:
+    """Renders the configured variants of stored images"""
+
+    def __init__(self):
+        # Longest edge in pixels per variant name
+        self.sizes = _parse_sizes(os.environ.get('MEDIA_VARIANT_SIZES', 'thumbnail:320,medium:720,large:1440'))
+        self.webp_quality = int(os.environ.get('MEDIA_WEBP_QUALITY', '80'))
+        self.avif_quality = int(os.environ.get('MEDIA_AVIF_QUALITY', '60'))
+        self.avif_enabled = AVIF_SUPPORTED and os.environ.get('MEDIA_AVIF_ENABLED', 'true').lower() == 'true'
+
+    @property
+    def formats(self) -> List[str]:
+        return ['webp', 'avif'] if self.avif_enabled else ['webp']
+
+    def _save(self, image: Image.Image, storage_key: str, image_format: str) -> int:
+        """Encode into a temp file, then move it into storage atomically"""
+        upload = media_storage.new_upload()
+        try:
+            if image_format == 'avif':
+                image.save(upload, format='AVIF', quality=self.avif_quality)
+            else:
+                image.save(upload, format='WEBP', quality=self.webp_quality, method=4)
+            upload.commit(media_storage.path_for(storage_key))
+        finally:
+            upload.close()
+        return os.path.getsize(media_storage.path_for(storage_key))
+
+    def generate(self, source, key_prefix: str) -> Dict[str, Any]:
+        """
+        Render every variant of a stored image and record them, with the
+        placeholders, on the row
+
+        Args:
+            source: MediaBlob (or legacy Media) whose file is in local storage
+            key_prefix: Prefix of the variant storage keys
+
+        Returns:
+            The variants dictionary stored on source.variants
+        """
+        with Image.open(media_storage.path_for(media_storage.resolve(source.storage_key))) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in _ROTATED_ORIENTATIONS:
+                width, height = height, width
+            largest = max(edge for _, edge in self.sizes)
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale, much cheaper than a full decode
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P', 'PA') else 'RGB')
+
+            variants = {}
+            previous = None
+            # Largest first, so each variant is resized from the previous one
+            for name, edge in sorted(self.sizes, key=lambda size: size[1], reverse=True):
+                resized = image.copy()
+                resized.thumbnail((edge, edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                if previous and variants[previous]['width'] == resized.width:
+                    # The original is smaller than this size: reuse the files
+                    variants[name] = variants[previous]
+                    continue
+
+                files = {}
+                for image_format in self.formats:
+                    storage_key = shard_key(f"{key_prefix}_{name}.{image_format}")
+                    files[image_format] = {
+                        'storage_key': storage_key,
+                        'file_size': self._save(resized, storage_key, image_format)
+                    }
+                variants[name] = {'width': resized.width, 'height': resized.height, 'files': files}
+                image, previous = resized, name
+
+            # The smallest variant is plenty for a blurred placeholder
+            source.blurhash = blurhash(image)
+            source.lqip = lqip_data_uri(image)
+
+        source.width = width
+        source.height = height
+        source.variants = variants
+        logger.info(f"Generated {len(variants)} variants of {source.storage_key}")
+        return variants
+
+    @staticmethod
+    def delete_files(variants: Dict[str, Any]):
+        """Remove the files listed in a variants dictionary"""
+        storage_keys = {
+            file['storage_key']
+            for variant in (variants or {}).values()
+            for file in variant.get('files', {}).values()
+        }
+        for storage_key in storage_keys:
+            media_storage.remove(storage_key)
+
+    def delete(self, media):
+        """Remove the variant files of a media file"""
+        self.delete_files(media.variants)
+
+# Global instance
+image_variants = ImageVariantGenerator()
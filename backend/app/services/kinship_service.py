@@ -0,0 +1,554 @@
+"""
+Kinship engine over Gramps family trees
+
+Each tree is loaded into a compact in-memory graph (dense integer ids with
+CSR adjacency arrays) that answers "how are A and B related" with a
+bidirectional BFS. Graphs and pair results are cached per worker; the
+ancestor/descendant closure table is rebuilt whenever a tree is ingested.
+"""
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app import db
+from app.models.genealogy import GenealogyPerson, GenealogyRelation, GenealogyAncestry, RelationType
+
+logger = logging.getLogger(__name__)
+
+UP, DOWN, SPOUSE = 'up', 'down', 'spouse'
+_REVERSE_STEP = {UP: DOWN, DOWN: UP, SPOUSE: SPOUSE}
+
+# Paths longer than this are not considered kinship
+MAX_KINSHIP_DEPTH = 16
+
+def _build_csr(size: int, pairs: List[Tuple[int, int]]) -> Tuple[array, array]:
+    """Build (offsets, targets) adjacency arrays from (source, target) pairs"""
+    offsets = array('i', [0]) * (size + 1)
+    for source, _ in pairs:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    targets = array('i', [0]) * len(pairs)
+    cursor = array('i', offsets)
+    for source, target in pairs:
+        targets[cursor[source]] = target
+        cursor[source] += 1
+    return offsets, targets
+
+def _ordinal(n: int) -> str:
+    names = {1: 'first', 2: 'second', 3: 'third', 4: 'fourth', 5: 'fifth'}
+    return names.get(n, f'{n}th')
+
+def _generations(n: int, base: str, grand: str) -> str:
+    """parent/grandparent/great-grandparent style naming"""
+    if n == 1:
+        return base
+    return 'great-' * (n - 2) + grand
+
+def blood_relationship_name(up: int, down: int) -> str:
+    """
+    Name a blood relationship from the number of generations up to the
+    closest common ancestor and back down to the other person
+    """
+    if up == 0 and down == 0:
+        return 'self'
+    if down == 0:
+        return _generations(up, 'parent', 'grandparent')
+    if up == 0:
+        return _generations(down, 'child', 'grandchild')
+    if up == 1 and down == 1:
+        return 'sibling'
+    if down == 1:
+        return _generations(up - 1, 'aunt/uncle', 'grand-aunt/uncle')
+    if up == 1:
+        return _generations(down - 1, 'niece/nephew', 'grand-niece/nephew')
+
+    degree = min(up, down) - 1
+    removed = abs(up - down)
+    name = f'{_ordinal(degree)} cousin'
+    if removed == 1:
+        name += ' once removed'
+    elif removed == 2:
+        name += ' twice removed'
+    elif removed > 2:
+        name += f' {removed} times removed'
+    return name
+
+_SPOUSE_SIDE_NAMES = {
+    'parent': 'parent-in-law',
+    'sibling': 'sibling-in-law',
+    'child': 'stepchild'
+}
+
+_RELATIVE_SPOUSE_NAMES = {
+    'child': 'child-in-law',
+    'sibling': 'sibling-in-law',
+    'parent': 'step-parent'
+}
+
+def describe_path(steps: List[str]) -> Dict[str, Any]:
+    """
+    Turn a list of path steps (up/down/spouse) into a relationship description
+
+    Args:
+        steps: Steps from the first person to the second
+
+    Returns:
+        Dictionary with relationship name, kinship degree and blood flag
+    """
+    if steps == [SPOUSE]:
+        return {'relationship': 'spouse', 'degree': 0, 'blood': False,
+                'generations_up': 0, 'generations_down': 0}
+
+    leading_spouse = bool(steps) and steps[0] == SPOUSE
+    trailing_spouse = len(steps) > 1 and steps[-1] == SPOUSE
+    core = steps[int(leading_spouse):len(steps) - int(trailing_spouse)]
+
+    up = 0
+    while up < len(core) and core[up] == UP:
+        up += 1
+    down = len(core) - up
+    is_lineal = SPOUSE not in core and all(step == DOWN for step in core[up:])
+
+    if not is_lineal:
+        return {
+            'relationship': 'relative by marriage' if SPOUSE in steps else 'relative',
+            'degree': None,
+            'blood': False,
+            'generations_up': None,
+            'generations_down': None
+        }
+
+    name = blood_relationship_name(up, down)
+    if leading_spouse and trailing_spouse:
+        name = 'sibling-in-law' if name == 'sibling' else f"spouse's {name}'s spouse"
+    elif leading_spouse:
+        name = _SPOUSE_SIDE_NAMES.get(name, f"spouse's {name}")
+    elif trailing_spouse:
+        name = _RELATIVE_SPOUSE_NAMES.get(name, f"{name}'s spouse")
+
+    return {
+        'relationship': name,
+        # Civil-law degree: number of generations separating the two people
+        'degree': up + down,
+        'blood': not (leading_spouse or trailing_spouse),
+        'generations_up': up,
+        'generations_down': down
+    }
+
+class KinshipGraph:
+    """
+    Immutable in-memory genealogy graph of a single tree
+
+    Persons are mapped to dense integer indices and each edge kind is
+    stored in CSR form (offsets + targets arrays).
+    """
+
+    def __init__(self, tree_id: str, person_ids: List[str],
+                 parent_edges: List[Tuple[int, int]], spouse_edges: List[Tuple[int, int]]):
+        self.tree_id = tree_id
+        self.person_ids = person_ids
+        self.index = {person_id: i for i, person_id in enumerate(person_ids)}
+        size = len(person_ids)
+        self._parents = _build_csr(size, [(child, parent) for parent, child in parent_edges])
+        self._children = _build_csr(size, parent_edges)
+        self._spouses = _build_csr(size, spouse_edges + [(b, a) for a, b in spouse_edges])
+
+    @classmethod
+    def from_edges(cls, tree_id: str, edges: Iterable[Tuple[str, str, Any]]) -> 'KinshipGraph':
+        """
+        Build a graph from (source_id, target_id, relation_type) edges
+
+        For parent edges the source is the parent of the target.
+        """
+        index: Dict[str, int] = {}
+        person_ids: List[str] = []
+        parent_edges: List[Tuple[int, int]] = []
+        spouse_edges: List[Tuple[int, int]] = []
+
+        def to_index(person_id):
+            i = index.get(person_id)
+            if i is None:
+                i = index[person_id] = len(person_ids)
+                person_ids.append(person_id)
+            return i
+
+        for source_id, target_id, relation_type in edges:
+            if source_id == target_id:
+                continue
+            source, target = to_index(source_id), to_index(target_id)
+            if getattr(relation_type, 'value', relation_type) == RelationType.PARENT.value:
+                parent_edges.append((source, target))
+            else:
+                spouse_edges.append((source, target))
+
+        return cls(tree_id, person_ids, parent_edges, spouse_edges)
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def __contains__(self, person_id):
+        return person_id in self.index
+
+    @staticmethod
+    def _slice(csr: Tuple[array, array], node: int):
+        offsets, targets = csr
+        return targets[offsets[node]:offsets[node + 1]]
+
+    def parents(self, node: int):
+        return self._slice(self._parents, node)
+
+    def children(self, node: int):
+        return self._slice(self._children, node)
+
+    def spouses(self, node: int):
+        return self._slice(self._spouses, node)
+
+    def neighbors(self, node: int) -> Iterator[Tuple[int, str]]:
+        for parent in self.parents(node):
+            yield parent, UP
+        for child in self.children(node):
+            yield child, DOWN
+        for spouse in self.spouses(node):
+            yield spouse, SPOUSE
+
+    def _expand(self, frontier: List[int], visited: Dict, other: Dict):
+        """Expand one BFS level; return the next frontier and the best meeting node"""
+        next_frontier = []
+        best_meet, best_length = None, None
+        for node in frontier:
+            depth = visited[node][2]
+            for neighbor, step in self.neighbors(node):
+                if neighbor in visited:
+                    continue
+                visited[neighbor] = (node, step, depth + 1)
+                next_frontier.append(neighbor)
+                if neighbor in other:
+                    length = depth + 1 + other[neighbor][2]
+                    if best_length is None or length < best_length:
+                        best_meet, best_length = neighbor, length
+        return next_frontier, best_meet
+
+    def find_path(self, source_id: str, target_id: str,
+                  max_depth: int = MAX_KINSHIP_DEPTH) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Find the shortest path between two persons with bidirectional BFS
+
+        Returns:
+            (person ids along the path, steps) or None if not connected
+        """
+        source = self.index.get(source_id)
+        target = self.index.get(target_id)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return [source_id], []
+
+        forward = {source: (None, None, 0)}
+        backward = {target: (None, None, 0)}
+        forward_frontier, backward_frontier = [source], [target]
+        depth = 0
+        meet = None
+
+        while forward_frontier and backward_frontier and depth < max_depth:
+            # Always grow the smaller side
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meet = self._expand(forward_frontier, forward, backward)
+            else:
+                backward_frontier, meet = self._expand(backward_frontier, backward, forward)
+            depth += 1
+            if meet is not None:
+                break
+
+        if meet is None:
+            return None
+
+        nodes, steps = [meet], []
+        node = meet
+        while forward[node][0] is not None:
+            previous, step, _ = forward[node]
+            nodes.append(previous)
+            steps.append(step)
+            node = previous
+        nodes.reverse()
+        steps.reverse()
+
+        node = meet
+        while backward[node][0] is not None:
+            previous, step, _ = backward[node]
+            nodes.append(previous)
+            steps.append(_REVERSE_STEP[step])
+            node = previous
+
+        return [self.person_ids[i] for i in nodes], steps
+
+    def distances_from(self, source_id: str, max_depth: int = MAX_KINSHIP_DEPTH) -> Dict[str, int]:
+        """Number of steps from source to every person within max_depth"""
+        source = self.index.get(source_id)
+        if source is None:
+            return {}
+        distances = {source: 0}
+        frontier = [source]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbor, _ in self.neighbors(node):
+                    if neighbor not in distances:
+                        distances[neighbor] = depth
+                        next_frontier.append(neighbor)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return {self.person_ids[i]: depth for i, depth in distances.items()}
+
+    def relationship(self, source_id: str, target_id: str) -> Optional[Dict[str, Any]]:
+        """Describe how target is related to source, or None if unrelated"""
+        found = self.find_path(source_id, target_id)
+        if not found:
+            return None
+        path, steps = found
+        result = describe_path(steps)
+        result['path'] = path
+        result['steps'] = steps
+        return result
+
+    def iter_ancestry(self) -> Iterator[Tuple[str, str, int]]:
+        """
+        Yield (ancestor_id, descendant_id, depth) for every lineal pair
+
+        Persons are visited in topological order (ancestors first) and the
+        ancestor map of a person is dropped as soon as all of its children
+        have been processed, so memory stays proportional to the widest
+        generation rather than the whole tree.
+        """
+        size = len(self.person_ids)
+        pending_parents = [len(self.parents(i)) for i in range(size)]
+        pending_children = [len(self.children(i)) for i in range(size)]
+        ancestors: Dict[int, Dict[int, int]] = {}
+        queue = deque(i for i in range(size) if pending_parents[i] == 0)
+        processed = 0
+
+        while queue:
+            node = queue.popleft()
+            processed += 1
+            merged: Dict[int, int] = {}
+            for parent in self.parents(node):
+                for ancestor, depth in ancestors.get(parent, {}).items():
+                    if merged.get(ancestor, depth + 2) > depth + 1:
+                        merged[ancestor] = depth + 1
+                merged[parent] = 1
+                pending_children[parent] -= 1
+                if pending_children[parent] == 0:
+                    ancestors.pop(parent, None)
+
+            for ancestor, depth in merged.items():
+                yield self.person_ids[ancestor], self.person_ids[node], depth
+
+            if pending_children[node]:
+                ancestors[node] = merged
+            for child in self.children(node):
+                pending_parents[child] -= 1
+                if pending_parents[child] == 0:
+                    queue.append(child)
+
+        if processed < size:
+            logger.warning(f"Tree {self.tree_id} has parent cycles; {size - processed} persons skipped in closure")
+
+class _TreeCacheEntry:
+    __slots__ = ('graph', 'loaded_at', 'pairs')
+
+    def __init__(self, graph: KinshipGraph):
+        self.graph = graph
+        self.loaded_at = time.monotonic()
+        self.pairs: 'OrderedDict[Tuple, Any]' = OrderedDict()
+
+class KinshipService:
+    """Loads, caches and queries per-tree kinship graphs"""
+
+    CLOSURE_BATCH_SIZE = 5000
+
+    def __init__(self):
+        self.max_trees = int(os.environ.get('KINSHIP_CACHE_TREES', '32'))
+        self.max_pairs = int(os.environ.get('KINSHIP_CACHE_PAIRS', '4096'))
+        self.ttl = int(os.environ.get('KINSHIP_CACHE_TTL', '600'))
+        self._trees: 'OrderedDict[str, _TreeCacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load_graph(self, tree_id: str) -> KinshipGraph:
+        rows = db.session.query(
+            GenealogyRelation.source_id,
+            GenealogyRelation.target_id,
+            GenealogyRelation.relation_type
+        ).filter(GenealogyRelation.tree_id == tree_id).execution_options(yield_per=10000)
+        return KinshipGraph.from_edges(tree_id, rows)
+
+    def _get_entry(self, tree_id: str) -> _TreeCacheEntry:
+        with self._lock:
+            entry = self._trees.get(tree_id)
+            if entry and time.monotonic() - entry.loaded_at < self.ttl:
+                self._trees.move_to_end(tree_id)
+                return entry
+
+        entry = _TreeCacheEntry(self._load_graph(tree_id))
+        with self._lock:
+            self._trees[tree_id] = entry
+            self._trees.move_to_end(tree_id)
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+        return entry
+
+    def get_graph(self, tree_id: str) -> KinshipGraph:
+        return self._get_entry(tree_id).graph
+
+    def invalidate(self, tree_id: str):
+        with self._lock:
+            self._trees.pop(tree_id, None)
+
+    def relationship(self, tree_id: str, source_id: str, target_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Describe how target is related to source within a tree
+
+        Args:
+            tree_id: Gramps tree ID
+            source_id: Gramps person ID of the reference person
+            target_id: Gramps person ID of the other person
+
+        Returns:
+            Relationship dictionary or None if the persons are not related
+        """
+        entry = self._get_entry(tree_id)
+        key = (source_id, target_id)
+        with self._lock:
+            if key in entry.pairs:
+                entry.pairs.move_to_end(key)
+                return entry.pairs[key]
+
+        result = entry.graph.relationship(source_id, target_id)
+        with self._lock:
+            entry.pairs[key] = result
+            while len(entry.pairs) > self.max_pairs:
+                entry.pairs.popitem(last=False)
+        return result
+
+    def kinship_distances(self, tree_id: str, person_id: str, max_depth: int = 6) -> Dict[str, int]:
+        """
+        Graph distance from a person to every relative within max_depth steps
+
+        Spouse edges count as one step, so in-laws are included.
+        """
+        entry = self._get_entry(tree_id)
+        key = ('distances', person_id, max_depth)
+        with self._lock:
+            if key in entry.pairs:
+                entry.pairs.move_to_end(key)
+                return entry.pairs[key]
+
+        result = entry.graph.distances_from(person_id, max_depth)
+        with self._lock:
+            entry.pairs[key] = result
+            while len(entry.pairs) > self.max_pairs:
+                entry.pairs.popitem(last=False)
+        return result
+
+    def degree(self, tree_id: str, source_id: str, target_id: str) -> Optional[int]:
+        """Degree of kinship between two persons, or None if not related"""
+        result = self.relationship(tree_id, source_id, target_id)
+        return result['degree'] if result else None
+
+    def ingest(self, tree_id: str, persons: List[Dict[str, Any]],
+               relations: List[Tuple[str, str, RelationType]]) -> Dict[str, int]:
+        """
+        Store persons and relations of a tree and rebuild its closure table
+
+        Existing persons are updated in place; relations already present are
+        skipped. The caller is responsible for committing.
+        """
+        existing = dict(db.session.query(GenealogyPerson.gramps_id, GenealogyPerson.id).filter(
+            GenealogyPerson.tree_id == tree_id
+        ).all())
+
+        new_persons, updated_persons = [], []
+        for person in persons:
+            values = {
+                'given_name': person.get('given_name'),
+                'surname': person.get('surname'),
+                'gender': person.get('gender'),
+                'birth_date': person.get('birth_date'),
+                'death_date': person.get('death_date')
+            }
+            if person['gramps_id'] in existing:
+                updated_persons.append({'id': existing[person['gramps_id']], **values})
+            else:
+                existing[person['gramps_id']] = None
+                new_persons.append({'tree_id': tree_id, 'gramps_id': person['gramps_id'], **values})
+
+        if new_persons:
+            db.session.execute(GenealogyPerson.__table__.insert(), new_persons)
+        if updated_persons:
+            db.session.bulk_update_mappings(GenealogyPerson, updated_persons)
+
+        known = set(db.session.query(
+            GenealogyRelation.source_id, GenealogyRelation.target_id, GenealogyRelation.relation_type
+        ).filter(GenealogyRelation.tree_id == tree_id).all())
+
+        new_relations = []
+        for source_id, target_id, relation_type in relations:
+            if relation_type == RelationType.SPOUSE:
+                # Spouse edges are undirected; store each couple once
+                source_id, target_id = sorted((source_id, target_id))
+            key = (source_id, target_id, relation_type)
+            if source_id == target_id or key in known:
+                continue
+            known.add(key)
+            new_relations.append({
+                'tree_id': tree_id,
+                'source_id': source_id,
+                'target_id': target_id,
+                'relation_type': relation_type
+            })
+
+        if new_relations:
+            db.session.execute(GenealogyRelation.__table__.insert(), new_relations)
+
+        self.invalidate(tree_id)
+        closure_rows = self.rebuild_closure(tree_id)
+
+        return {
+            'persons_created': len(new_persons),
+            'persons_updated': len(updated_persons),
+            'relations_created': len(new_relations),
+            'ancestry_rows': closure_rows
+        }
+
+    def rebuild_closure(self, tree_id: str) -> int:
+        """Recompute the ancestor/descendant closure table of a tree"""
+        graph = self._load_graph(tree_id)
+        GenealogyAncestry.query.filter_by(tree_id=tree_id).delete(synchronize_session=False)
+
+        table = GenealogyAncestry.__table__
+        batch, total = [], 0
+        for ancestor_id, descendant_id, depth in graph.iter_ancestry():
+            batch.append({
+                'tree_id': tree_id,
+                'ancestor_id': ancestor_id,
+                'descendant_id': descendant_id,
+                'depth': depth
+            })
+            if len(batch) >= self.CLOSURE_BATCH_SIZE:
+                db.session.execute(table.insert(), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(table.insert(), batch)
+            total += len(batch)
+
+        logger.info(f"Rebuilt kinship closure for tree {tree_id}: {total} rows")
+        return total
+
+# Global instance
+kinship_service = KinshipService()
@@ -0,0 +1,498 @@
+"""
+Streaming storage of uploaded media
+
+The multipart parser writes every uploaded file straight into a temporary
+file next to the uploads directory. While the chunks are written, their
+size is counted (data past the limit is dropped, not stored), a SHA-256
+digest is updated and the leading bytes are kept for type detection, so
+no upload is ever held in memory as a whole.
+
+Storage is content-addressed: an accepted upload is stored under its
+SHA-256, fsynced and atomically renamed into the uploads directory, unless
+the same content is already there. Anything else is removed when the
+request closes. MediaBlob rows count the references to each stored file.
+
+Files are sharded by the first four hex digits of their name
+(ab/cd/abcd...jpg) so no directory grows past a few thousand entries.
+Files from before the sharded layout are still found at the top level
+until scripts/migrate_upload_layout.py has moved them.
+
+Resumable uploads are written chunk by chunk, at their offset, into a
+partial file next to the uploads directory. Each chunk is checked against
+its SHA-256 before it counts; finalizing hashes the complete file in
+chunks and renames it into place like any other upload.
+
+Multi-file uploads are moved into storage concurrently on a small thread
+pool (MEDIA_UPLOAD_WORKERS), since each file costs an fsync.
+
+Stored files are served with strong ETags and Range support. With
+MEDIA_SERVE_MODE=x-accel the response only carries an X-Accel-Redirect
+header and nginx streams the bytes from an internal location, so no
+Python worker is held while a file is downloaded.
+"""
+import fcntl
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from urllib.parse import quote
+
+from flask import Request, Response, abort, request, send_file
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes needed to recognise every supported format
+_HEADER_SIZE = 16
+
+_EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif', 'image/webp': 'webp'}
+
+_HEX_PREFIX = re.compile(r'[0-9a-f]{4}')
+
+# sha256.ext originals and sha256_variant.ext variants: the name fixes the bytes
+# Hidden directories under the uploads directory hold temp files, partial
+# uploads and genealogy imports; only the resize cache is served from them
+_SERVED_HIDDEN_DIRS = {'.cache'}
+
+_CONTENT_ADDRESSED = re.compile(r'[0-9a-f]{64}(_[a-z0-9]+)?\.[a-z0-9]+')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def shard_key(filename: str) -> str:
+    """
+    Sharded storage key of a file name: 'abcd12...jpg' -> 'ab/cd/abcd12...jpg'
+    
+    Names that do not start with hex digits (legacy uploads) are placed by
+    a hash of the name instead.
+    """
+    name = os.path.basename(filename)
+    prefix = name[:4] if _HEX_PREFIX.match(name) else hashlib.sha256(name.encode()).hexdigest()[:4]
+    return f"{prefix[:2]}/{prefix[2:]}/{name}"
+
+class UploadRejected(ValueError):
+    """The upload is too large, is not a supported image or lost its stored file"""
+
+    def __init__(self, reason: str, message: str):
+        self.reason = reason
+        super().__init__(message)
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """MIME type of a JPEG, PNG, GIF or WebP image from its first bytes"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+class HashingUploadFile:
+    """
+    Write-through temporary file that measures and hashes what is written
+
+    Reads, seeks and the rest of the file API are delegated to the
+    underlying temporary file, so it can stand in for werkzeug's spooled
+    upload stream.
+    """
+
+    def __init__(self, directory: str, max_size: Optional[int] = None, file: Optional[BinaryIO] = None):
+        self._file = file or tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self.path = self._file.name
+        self.max_size = max_size
+        self.size = 0
+        self.header = b''
+        self._hash = hashlib.sha256()
+        self._committed = False
+
+    @property
+    def oversized(self) -> bool:
+        return self.max_size is not None and self.size > self.max_size
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @classmethod
+    def adopt(cls, path: str, max_size: Optional[int] = None) -> 'HashingUploadFile':
+        """
+        Wrap a file that is already complete on disk, measuring it in chunks
+
+        The file must be on the uploads filesystem; like any upload it is
+        removed on close unless it was committed.
+        """
+        upload = cls(os.path.dirname(path), max_size, open(path, 'rb+'))
+        while not upload.oversized:
+            chunk = upload._file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            upload._measure(chunk)
+        return upload
+
+    def _measure(self, data: bytes):
+        if len(self.header) < _HEADER_SIZE:
+            self.header += data[:_HEADER_SIZE - len(self.header)]
+        self.size += len(data)
+        if not self.oversized:
+            self._hash.update(data)
+
+    def write(self, data: bytes) -> int:
+        self._measure(data)
+        # Past the limit the upload is only counted: it is rejected anyway
+        if not self.oversized:
+            self._file.write(data)
+        return len(data)
+
+    def commit(self, destination: str):
+        """Durably move the file to its final path (same filesystem, atomic)"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # NamedTemporaryFile is private to the worker; stored media is served by others too
+        os.chmod(self.path, 0o644)
+        os.replace(self.path, destination)
+        self._committed = True
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._committed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class MediaUploadRequest(Request):
+    """
+    Request whose file uploads are streamed to disk through HashingUploadFile
+
+    Views that accept media set max_file_size before touching request.files
+    to stop storing any single file past that size.
+    """
+
+    max_file_size: Optional[int] = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return media_storage.new_upload(self.max_file_size)
+
+def _native_thread_pool(max_workers: int):
+    """
+    Executor running on OS threads
+
+    Under gevent's monkey patching a plain ThreadPoolExecutor would start
+    greenlets, which take turns on one thread; gevent's executor keeps real
+    threads so file work does not stall the worker's other requests.
+    """
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+            return GeventThreadPoolExecutor(max_workers=max_workers)
+    except ImportError:
+        pass
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='media-upload')
+
+class MediaStorage:
+    """Local media storage under the uploads directory"""
+
+    def __init__(self):
+        self.upload_dir = os.path.abspath(os.environ.get('MEDIA_UPLOAD_DIR') or os.path.join(os.getcwd(), 'uploads'))
+        # Same filesystem as upload_dir, so the final rename is atomic
+        self.temp_dir = os.path.join(self.upload_dir, '.tmp')
+        self.partial_dir = os.path.join(self.upload_dir, '.partial')
+        # 'flask' streams files from the worker, 'x-accel' hands them to nginx
+        self.serve_mode = os.environ.get('MEDIA_SERVE_MODE', 'flask').lower()
+        # nginx internal location aliasing upload_dir
+        self.accel_prefix = '/' + os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-uploads/').strip('/') + '/'
+        self.max_age = int(os.environ.get('MEDIA_MAX_AGE', '86400'))
+        # Files of one request saved at the same time; shared by all requests of the process
+        self.upload_workers = int(os.environ.get('MEDIA_UPLOAD_WORKERS', '4'))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Created on first use: gevent patches threading after this module is imported
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = _native_thread_pool(self.upload_workers)
+        return self._executor
+
+    def new_upload(self, max_size: Optional[int] = None) -> HashingUploadFile:
+        """Empty temporary upload file in the storage's temp directory"""
+        os.makedirs(self.temp_dir, exist_ok=True)
+        return HashingUploadFile(self.temp_dir, max_size)
+
+    def path_for(self, storage_key: str) -> str:
+        """
+        Absolute path of a storage key
+        
+        Raises:
+            ValueError: The key points outside the uploads directory
+        """
+        path = os.path.normpath(os.path.join(self.upload_dir, storage_key))
+        if not path.startswith(self.upload_dir + os.sep):
+            raise ValueError(f"Invalid storage key: {storage_key}")
+        return path
+
+    def resolve(self, storage_key: str) -> str:
+        """
+        Storage key under which the file actually is on disk
+        
+        Keys are tried as given, then in the other layout, so sharded keys
+        find files that were not migrated yet and old flat keys (e.g. in
+        previously published URLs) find migrated files.
+        """
+        alternative = os.path.basename(storage_key) if '/' in storage_key else shard_key(storage_key)
+        for key in (storage_key, alternative):
+            try:
+                if os.path.isfile(self.path_for(key)):
+                    return key
+            except ValueError:
+                return storage_key
+        return storage_key
+
+    @staticmethod
+    def content_key(sha256: str, mime_type: str) -> str:
+        """Storage key of a file with the given content"""
+        return shard_key(f"{sha256}.{_EXTENSIONS.get(mime_type, 'bin')}")
+
+    def exists(self, storage_key: str) -> bool:
+        """Whether a stored file is on disk, in either layout"""
+        try:
+            return os.path.isfile(self.path_for(self.resolve(storage_key)))
+        except ValueError:
+            return False
+
+    def remove(self, storage_key: str) -> bool:
+        """Delete a stored file; False if it was already gone"""
+        try:
+            os.remove(self.path_for(self.resolve(storage_key)))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def save(self, stream: BinaryIO, filename: str, max_size: int) -> Dict[str, Any]:
+        """
+        Validate an upload and move it into storage
+
+        Args:
+            stream: Upload stream; a HashingUploadFile is committed as is,
+                anything else is first copied in chunks
+            filename: Original filename
+            max_size: Maximum size in bytes
+
+        Returns:
+            Dictionary with storage_key, file_size, mime_type, sha256 and
+            whether the content was already stored (deduplicated)
+
+        Raises:
+            UploadRejected: The file is too large or not a supported image
+        """
+        if isinstance(stream, HashingUploadFile):
+            upload, owned = stream, False
+        else:
+            upload, owned = self.new_upload(max_size), True
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                upload.write(chunk)
+                if upload.oversized:
+                    break
+
+        try:
+            if upload.size > max_size:
+                raise UploadRejected('too_large', f'File {filename} is too large (max {max_size // (1024 * 1024)}MB)')
+            mime_type = sniff_image_type(upload.header)
+            if not mime_type:
+                raise UploadRejected('invalid_type', f'File {filename} is not a supported image')
+
+            storage_key = self.content_key(upload.sha256, mime_type)
+            deduplicated = self.exists(storage_key)
+            if deduplicated:
+                # Same bytes are already stored; the temp file is dropped on close
+                logger.info(f"Upload {filename} matches stored {storage_key}")
+            else:
+                upload.commit(self.path_for(storage_key))
+                logger.info(f"Stored upload {storage_key} ({upload.size} bytes)")
+            return {
+                'storage_key': storage_key,
+                'file_size': upload.size,
+                'mime_type': mime_type,
+                'sha256': upload.sha256,
+                'deduplicated': deduplicated
+            }
+        finally:
+            if owned:
+                upload.close()
+
+    @staticmethod
+    def is_content_addressed(storage_key: str) -> bool:
+        """Whether the key names its content, so the file behind it never changes"""
+        return bool(_CONTENT_ADDRESSED.fullmatch(os.path.basename(storage_key)))
+
+    def send(self, storage_key: str, mimetype: Optional[str] = None, immutable: Optional[bool] = None) -> Response:
+        """
+        Response serving a stored file
+
+        Args:
+            storage_key: Key of the file, in either layout
+            mimetype: Content type; guessed from the name when omitted
+            immutable: Cache the response forever; by default only when the
+                requested key is content-addressed
+
+        Returns:
+            The file, a 304 when If-None-Match matches, or (x-accel mode) an
+            empty response that nginx completes, Range requests included
+        """
+        key = self.resolve(storage_key)
+        if any(part.startswith('.') and part not in _SERVED_HIDDEN_DIRS for part in key.split('/')[:-1]):
+            abort(404)
+        try:
+            stat = os.stat(self.path_for(key))
+        except (OSError, ValueError):
+            abort(404)
+
+        name = os.path.basename(key)
+        if self.is_content_addressed(key):
+            etag = name
+        else:
+            etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        if immutable is None:
+            immutable = self.is_content_addressed(storage_key)
+        max_age = IMMUTABLE_MAX_AGE if immutable else self.max_age
+
+        if self.serve_mode == 'x-accel':
+            response = Response(mimetype=mimetype or mimetypes.guess_type(name)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = quote(self.accel_prefix + key)
+            response.set_etag(etag)
+            response.last_modified = stat.st_mtime
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            # Only If-None-Match is answered here; nginx handles Range on the file
+            response.make_conditional(request)
+            if response.status_code == 304:
+                # Otherwise nginx would replace the 304 with the full file
+                del response.headers['X-Accel-Redirect']
+        else:
+            response = send_file(self.path_for(key), mimetype=mimetype, etag=etag, conditional=True, max_age=max_age)
+
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+    def save_all(self, uploads: List[Tuple[BinaryIO, str]], max_size: int) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Save several uploads concurrently on the bounded upload pool
+
+        Args:
+            uploads: (stream, filename) pairs
+            max_size: Maximum size in bytes of each file
+
+        Returns:
+            (result of save, None) or (None, exception) per upload, in order
+        """
+        def save(upload):
+            try:
+                return self.save(upload[0], upload[1], max_size), None
+            except Exception as e:
+                return None, e
+
+        if len(uploads) < 2:
+            return [save(upload) for upload in uploads]
+        return list(self.executor.map(save, uploads))
+
+    def save_bytes(self, data: bytes, filename: str, max_size: int) -> Dict[str, Any]:
+        """Same as save, for data that is already in memory"""
+        return self.save(io.BytesIO(data), filename, max_size)
+
+    def partial_path(self, session_id) -> str:
+        """Path of the partial file of a resumable upload session"""
+        return os.path.join(self.partial_dir, f"{session_id}.part")
+
+    def create_partial(self, session_id):
+        """Create the empty partial file of a new resumable upload"""
+        os.makedirs(self.partial_dir, exist_ok=True)
+        open(self.partial_path(session_id), 'wb').close()
+
+    def remove_partial(self, session_id) -> bool:
+        """Delete the partial file of a resumable upload; False if it was already gone"""
+        try:
+            os.remove(self.partial_path(session_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def write_chunk(self, session_id, offset: int, stream: BinaryIO, max_size: int, sha256: str) -> int:
+        """
+        Store one chunk of a resumable upload at its offset
+
+        Whatever was written past the offset before (a chunk interrupted
+        mid-transfer) is dropped first, and the chunk is dropped again
+        unless its digest matches, so the file only grows by verified chunks.
+
+        Args:
+            session_id: Upload session id
+            offset: Byte offset of the chunk, the session's received size
+            stream: Chunk data
+            max_size: Largest number of bytes accepted
+            sha256: Expected hex digest of the chunk
+
+        Returns:
+            Number of bytes stored
+
+        Raises:
+            UploadRejected: The chunk is too large or its checksum differs
+            BlockingIOError: Another request is writing to the same upload
+            FileNotFoundError: The partial file was collected
+        """
+        with open(self.partial_path(session_id), 'r+b') as partial:
+            fcntl.flock(partial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            partial.truncate(offset)
+            partial.seek(offset)
+            digest = hashlib.sha256()
+            written = 0
+            try:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_size:
+                        raise UploadRejected('too_large', f'Chunk is too large (max {max_size} bytes)')
+                    partial.write(chunk)
+                    digest.update(chunk)
+                if digest.hexdigest() != sha256.lower():
+                    raise UploadRejected('checksum_mismatch', 'Chunk checksum does not match its data')
+            except Exception:
+                partial.truncate(offset)
+                raise
+            partial.flush()
+            os.fsync(partial.fileno())
+        return written
+
+# Global instance
+media_storage = MediaStorage()
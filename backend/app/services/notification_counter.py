@@ -0,0 +1,180 @@
+"""
+Unread notification counters cached in Redis
+
+Counter changes are queued on the SQLAlchemy session and applied only after
+the transaction commits, so a rolled back notification never leaks into the
+cache. A missing key is rebuilt from the database on the next read, and a
+periodic task reconciles all cached counters.
+"""
+import logging
+import os
+import uuid
+from typing import Dict, Iterable, Optional
+
+import redis
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app import db
+from app.services.redis_client import get_redis
+from app.services.realtime import realtime_hub
+from app.services.session_effects import is_outer_commit, track
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = 'unread_counter_changes'
+
+# Apply a delta only to an existing counter; never let it go negative
+_INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if value < 0 then
+        redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+        value = 0
+    end
+    return value
+end
+return nil
+"""
+
+class UnreadCounter:
+    """Per-user unread notification counter stored in Redis"""
+
+    KEY_PREFIX = 'notifications:unread:'
+
+    def __init__(self):
+        self.ttl = int(os.environ.get('NOTIFICATION_COUNTER_TTL', 7 * 24 * 3600))
+        self._incr_script = None
+
+    def _key(self, user_id) -> str:
+        return f'{self.KEY_PREFIX}{user_id}'
+
+    @staticmethod
+    def _count_from_db(user_id) -> int:
+        from app.models.notification import Notification
+        return Notification.query.filter_by(user_id=user_id, read=False).count()
+
+    def get(self, user_id: uuid.UUID) -> int:
+        """
+        Get the unread count, computing and caching it on a miss
+
+        Args:
+            user_id: Notification recipient
+
+        Returns:
+            Number of unread notifications
+        """
+        try:
+            cached = get_redis().get(self._key(user_id))
+            if cached is not None:
+                return max(int(cached), 0)
+        except redis.RedisError as e:
+            logger.warning(f"Unread counter unavailable, counting in database: {str(e)}")
+            return self._count_from_db(user_id)
+
+        count = self._count_from_db(user_id)
+        try:
+            # NX: a concurrent reset or reconcile wins over this read-through value
+            get_redis().set(self._key(user_id), count, ex=self.ttl, nx=True)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache unread counter for {user_id}: {str(e)}")
+        return count
+
+    def _pending(self, user_id, session: Optional[Session]) -> list:
+        changes = (session or db.session).info.setdefault(_SESSION_KEY, {})
+        # [reset to zero first, delta]
+        return changes.setdefault(str(user_id), [False, 0])
+
+    def queue_delta(self, user_id, delta: int, session: Optional[Session] = None):
+        """Change the counter by delta once the current transaction commits"""
+        self._pending(user_id, session)[1] += delta
+
+    def queue_reset(self, user_id, session: Optional[Session] = None):
+        """Set the counter to zero once the current transaction commits"""
+        pending = self._pending(user_id, session)
+        pending[0], pending[1] = True, 0
+
+    def apply(self, changes: Dict[str, list]):
+        """Apply committed counter changes to Redis"""
+        try:
+            client = get_redis()
+            if self._incr_script is None:
+                self._incr_script = client.register_script(_INCR_IF_EXISTS)
+
+            counts = {}
+            for user_id, (reset, delta) in changes.items():
+                if reset:
+                    counts[user_id] = max(delta, 0)
+                    client.set(self._key(user_id), counts[user_id], ex=self.ttl)
+                elif delta:
+                    counts[user_id] = self._incr_script(keys=[self._key(user_id)], args=[delta])
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update unread counters, dropping them: {str(e)}")
+            self._drop(changes.keys())
+            return
+
+        for user_id, count in counts.items():
+            if count is not None:
+                realtime_hub.publish_to_user(user_id, 'unread_count', {'unread_count': int(count)})
+
+    def _drop(self, user_ids: Iterable[str]):
+        try:
+            get_redis().delete(*[self._key(user_id) for user_id in user_ids])
+        except redis.RedisError:
+            # Keys expire on their own; reconcile fixes them in the meantime
+            pass
+
+    def reconcile(self, batch_size: int = 500) -> int:
+        """
+        Overwrite every cached counter with the count from the database
+
+        Returns:
+            Number of counters reconciled
+        """
+        from app.models.notification import Notification
+
+        client = get_redis()
+        reconciled = 0
+        batch = []
+        for key in client.scan_iter(match=f'{self.KEY_PREFIX}*', count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                reconciled += self._reconcile_batch(client, batch, Notification)
+                batch = []
+        if batch:
+            reconciled += self._reconcile_batch(client, batch, Notification)
+        return reconciled
+
+    def _reconcile_batch(self, client, keys, notification_model) -> int:
+        user_ids = {}
+        for key in keys:
+            try:
+                user_ids[uuid.UUID(key[len(self.KEY_PREFIX):])] = key
+            except ValueError:
+                client.delete(key)
+
+        counts = dict(
+            db.session.query(notification_model.user_id, func.count(notification_model.id))
+            .filter(notification_model.user_id.in_(list(user_ids)), notification_model.read == False)
+            .group_by(notification_model.user_id)
+        )
+
+        pipe = client.pipeline(transaction=False)
+        for user_id, key in user_ids.items():
+            pipe.set(key, counts.get(user_id, 0), ex=self.ttl, xx=True)
+        pipe.execute()
+        return len(user_ids)
+
+# Global instance
+unread_counter = UnreadCounter()
+
+@event.listens_for(Session, 'after_commit')
+def _apply_unread_counter_changes(session):
+    if not is_outer_commit(session):
+        return
+    changes = session.info.pop(_SESSION_KEY, None)
+    if changes:
+        unread_counter.apply(changes)
+
+# Rolled back with savepoints (e.g. a failed outbox handler) and transactions
+track(_SESSION_KEY)
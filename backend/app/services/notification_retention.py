@@ -0,0 +1,131 @@
+"""
+Retention for social_notifications
+
+Read notifications older than the retention window are copied to gzip
+compressed JSON Lines archives and then deleted. Like user-initiated bulk
+deletes, this works in bounded batches, one short transaction each, so no
+single statement holds row locks for long.
+"""
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+
+from app import db
+from app.models.notification import Notification
+from app.services.notification_counter import unread_counter
+
+logger = logging.getLogger(__name__)
+
+class NotificationRetention:
+    """Archives and deletes notifications in bounded batches"""
+
+    def __init__(self):
+        self.retention_days = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '90'))
+        self.batch_size = int(os.environ.get('NOTIFICATION_RETENTION_BATCH_SIZE', '1000'))
+        self.max_batches = int(os.environ.get('NOTIFICATION_RETENTION_MAX_BATCHES', '100'))
+        self.archive_dir = os.environ.get(
+            'NOTIFICATION_ARCHIVE_DIR', os.path.join(os.getcwd(), 'archives', 'notifications')
+        )
+
+    def _archive_path(self, started_at: datetime) -> str:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        return os.path.join(self.archive_dir, f"notifications-{started_at.strftime('%Y%m%dT%H%M%S')}.jsonl.gz")
+
+    @staticmethod
+    def _serialize(row) -> str:
+        return json.dumps({key: value for key, value in row._mapping.items()}, default=str)
+
+    def archive_expired(self, retention_days: Optional[int] = None) -> dict:
+        """
+        Archive and delete read notifications past the retention window
+
+        Each batch is appended to the archive and flushed before it is
+        deleted, so a crash can at worst archive some rows twice.
+
+        Args:
+            retention_days: Override of NOTIFICATION_RETENTION_DAYS
+
+        Returns:
+            Dictionary with the number of archived rows and the archive path
+        """
+        started_at = datetime.now(timezone.utc)
+        cutoff = started_at - timedelta(days=retention_days or self.retention_days)
+        table = Notification.__table__
+        path = None
+        archived = 0
+
+        for _ in range(self.max_batches):
+            rows = db.session.execute(
+                select(table).where(
+                    table.c.read == True,
+                    table.c.created_at < cutoff
+                ).order_by(table.c.created_at, table.c.id).limit(self.batch_size)
+            ).all()
+            if not rows:
+                break
+
+            if path is None:
+                path = self._archive_path(started_at)
+            with gzip.open(path, 'at', encoding='utf-8') as archive:
+                for row in rows:
+                    archive.write(self._serialize(row) + '\n')
+
+            db.session.execute(table.delete().where(table.c.id.in_([row.id for row in rows])))
+            db.session.commit()
+            archived += len(rows)
+
+            if len(rows) < self.batch_size:
+                break
+
+        if archived:
+            logger.info(f"Archived {archived} notifications older than {cutoff.date()} to {path}")
+        return {'archived': archived, 'archive': path}
+
+    def delete_for_user(self, user_id: uuid.UUID, before: datetime) -> int:
+        """
+        Delete a user's notifications last updated up to `before` in batches
+
+        Aggregated notifications keep their created_at when new actors are
+        folded in, so updated_at decides: one refreshed after the request
+        is kept, like a notification created after it.
+
+        Args:
+            user_id: Owner of the notifications
+            before: Notifications updated later (after the request) are kept
+
+        Returns:
+            Number of notifications deleted
+        """
+        table = Notification.__table__
+        deleted = 0
+
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, table.c.read).where(
+                    table.c.user_id == user_id,
+                    table.c.updated_at <= before
+                ).limit(self.batch_size)
+            ).all()
+            if not rows:
+                break
+
+            db.session.execute(table.delete().where(table.c.id.in_([row.id for row in rows])))
+            unread = sum(1 for row in rows if not row.read)
+            if unread:
+                unread_counter.queue_delta(user_id, -unread)
+            db.session.commit()
+            deleted += len(rows)
+
+            if len(rows) < self.batch_size:
+                break
+
+        return deleted
+
+# Global instance
+notification_retention = NotificationRetention()
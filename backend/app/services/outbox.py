@@ -0,0 +1,205 @@
+"""
+Transactional outbox processing
+
+Request handlers record side effects as OutboxEvent rows in the same
+transaction as their core write. A Celery task drains pending events in
+batches (SKIP LOCKED, so several workers can run at once) and runs the
+handler registered for each event type. Failed events are retried with
+exponential backoff until MAX_ATTEMPTS.
+"""
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.outbox import OutboxEvent
+from app.models.notification import Notification
+from app.models.post import Post, PostPrivacy
+from app.models.follow import Follow, FollowStatus
+from app.services.realtime import realtime_hub
+from app.services.session_effects import is_outer_commit, track
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+_handlers: Dict[str, Callable[[dict], None]] = {}
+
+def outbox_handler(event_type: str):
+    """Register the handler of an outbox event type"""
+    def register(func):
+        _handlers[event_type] = func
+        return func
+    return register
+
+def _uuid(value):
+    return uuid.UUID(value) if value else None
+
+@outbox_handler('post.created')
+def handle_post_created(payload):
+    realtime_hub.queue_new_post(payload['author_id'], payload['post_id'])
+
+@outbox_handler('post.liked')
+def handle_post_liked(payload):
+    if payload['author_id'] == payload['actor_id']:
+        return
+    Notification.create_notification(
+        user_id=_uuid(payload['author_id']),
+        notification_type='like',
+        actor_id=_uuid(payload['actor_id']),
+        target_id=_uuid(payload['post_id']),
+        payload={'post_id': payload['post_id']}
+    )
+
+@outbox_handler('comment.created')
+def handle_comment_created(payload):
+    if payload['author_id'] == payload['actor_id']:
+        return
+    Notification.create_notification(
+        user_id=_uuid(payload['author_id']),
+        notification_type='comment',
+        actor_id=_uuid(payload['actor_id']),
+        target_id=_uuid(payload['post_id']),
+        payload={'post_id': payload['post_id'], 'comment_id': payload['comment_id']}
+    )
+
+@outbox_handler('post.mentioned')
+def handle_post_mentioned(payload):
+    post = Post.query.get(_uuid(payload['post_id']))
+    if not post or post.is_deleted or post.privacy == PostPrivacy.PRIVATE:
+        return
+
+    recipients = [_uuid(user_id) for user_id in payload.get('user_ids', []) if user_id != payload['author_id']]
+    if recipients and post.privacy == PostPrivacy.FOLLOWERS_ONLY:
+        # Only mentioned users who can see the post hear about it
+        followers = db.session.query(Follow.follower_id).filter(
+            Follow.followed_id == post.author_id,
+            Follow.follower_id.in_(recipients),
+            Follow.status == FollowStatus.ACCEPTED
+        )
+        allowed = {follower_id for follower_id, in followers}
+        recipients = [user_id for user_id in recipients if user_id in allowed]
+
+    Notification.create_many(
+        recipients,
+        notification_type='mention',
+        actor_id=_uuid(payload['author_id']),
+        target_id=post.id,
+        payload={'post_id': payload['post_id']}
+    )
+
+@outbox_handler('user.followed')
+def handle_user_followed(payload):
+    Notification.create_notification(
+        user_id=_uuid(payload['followed_id']),
+        notification_type='follow',
+        actor_id=_uuid(payload['follower_id']),
+        target_id=_uuid(payload['followed_id']),
+        payload={'action': payload.get('action')}
+    )
+
+@outbox_handler('friend.requested')
+def handle_friend_requested(payload):
+    Notification.create_notification(
+        user_id=_uuid(payload['requestee_id']),
+        notification_type='friend_request',
+        actor_id=_uuid(payload['requester_id']),
+        target_id=_uuid(payload['requestee_id']),
+        payload={'action': 'friend_request_sent'}
+    )
+
+@outbox_handler('friend.accepted')
+def handle_friend_accepted(payload):
+    Notification.create_notification(
+        user_id=_uuid(payload['requester_id']),
+        notification_type='friend_accepted',
+        actor_id=_uuid(payload['requestee_id']),
+        target_id=_uuid(payload['requester_id']),
+        payload={'action': 'friend_request_accepted'}
+    )
+
+class OutboxProcessor:
+    """Drains pending outbox events in batches"""
+
+    def __init__(self):
+        self.batch_size = int(os.environ.get('OUTBOX_BATCH_SIZE', '200'))
+        self.max_batches = int(os.environ.get('OUTBOX_MAX_BATCHES', '50'))
+        self.retention_hours = int(os.environ.get('OUTBOX_RETENTION_HOURS', '24'))
+
+    def _claim_batch(self):
+        now = datetime.now(timezone.utc)
+        return OutboxEvent.query.filter(
+            OutboxEvent.processed_at.is_(None),
+            OutboxEvent.available_at <= now,
+            OutboxEvent.attempts < MAX_ATTEMPTS
+        ).order_by(OutboxEvent.available_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+    def process_batch(self) -> int:
+        """
+        Process one batch of pending events in a single transaction
+
+        Returns:
+            Number of events claimed
+        """
+        events = self._claim_batch()
+        for outbox_event in events:
+            handler = _handlers.get(outbox_event.event_type)
+            try:
+                # Savepoint: a failing handler does not roll back the rest of the batch
+                with db.session.begin_nested():
+                    if handler is None:
+                        raise LookupError(f"No outbox handler for {outbox_event.event_type}")
+                    handler(outbox_event.payload or {})
+                outbox_event.processed_at = datetime.now(timezone.utc)
+            except Exception as e:
+                outbox_event.attempts += 1
+                outbox_event.last_error = str(e)[:2000]
+                outbox_event.available_at = datetime.now(timezone.utc) + timedelta(seconds=2 ** outbox_event.attempts)
+                logger.error(f"Outbox event {outbox_event.id} ({outbox_event.event_type}) failed "
+                             f"attempt {outbox_event.attempts}: {str(e)}")
+        db.session.commit()
+        return len(events)
+
+    def drain(self) -> int:
+        """Process batches until the outbox is empty or max_batches is reached"""
+        processed = 0
+        for _ in range(self.max_batches):
+            claimed = self.process_batch()
+            processed += claimed
+            if claimed < self.batch_size:
+                break
+        return processed
+
+    def purge(self) -> int:
+        """Delete processed events older than the retention window"""
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.retention_hours)
+        deleted = OutboxEvent.query.filter(
+            OutboxEvent.processed_at.isnot(None),
+            OutboxEvent.processed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+# Global instance
+outbox_processor = OutboxProcessor()
+
+@event.listens_for(Session, 'after_commit')
+def _trigger_outbox_drain(session):
+    if not is_outer_commit(session):
+        return
+    if not session.info.pop('outbox_pending', False):
+        return
+    from app.tasks.outbox import drain_outbox
+    try:
+        # No publish retries: the periodic drain picks the events up if the broker is down
+        drain_outbox.apply_async(retry=False)
+    except Exception as e:
+        logger.warning(f"Could not enqueue outbox drain: {str(e)}")
+
+# An event emitted in a rolled back savepoint does not wake the drainer
+track('outbox_pending')
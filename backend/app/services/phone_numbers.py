@@ -0,0 +1,55 @@
+"""
+Phone number normalization and hashing helpers shared by auth and contact matching
+"""
+import hashlib
+import re
+
+PHONE_HASH_LENGTH = 64  # hex-encoded SHA-256
+
+def normalize_phone_number(phone: str) -> str:
+    """
+    Normalize a phone number to international (E.164-like) format
+
+    Args:
+        phone: Phone number in any common local or international format
+
+    Returns:
+        Phone number as '+' followed by digits, e.g. '+77011234567'
+    """
+    # Remove all non-digit characters
+    digits = re.sub(r'\D', '', phone)
+
+    # Handle different formats
+    if digits.startswith('8') and len(digits) == 11:
+        # Russian format: 8XXXXXXXXXX -> +7XXXXXXXXX
+        digits = '7' + digits[1:]
+    elif digits.startswith('7') and len(digits) == 11:
+        # Already in correct format
+        pass
+    elif len(digits) == 10:
+        # Add country code
+        digits = '7' + digits
+
+    return '+' + digits
+
+def hash_phone_number(phone: str, normalized: bool = False) -> str:
+    """
+    Hash a phone number for contact matching
+
+    Clients compute the same value locally (SHA-256 over the normalized
+    number, hex-encoded) so raw address books never leave the device.
+
+    Args:
+        phone: Phone number
+        normalized: Set when the number is already normalized
+
+    Returns:
+        Lowercase hex SHA-256 digest
+    """
+    if not normalized:
+        phone = normalize_phone_number(phone)
+    return hashlib.sha256(phone.encode('utf-8')).hexdigest()
+
+def is_valid_phone_hash(value) -> bool:
+    """Check that a value looks like a hex-encoded SHA-256 digest"""
+    return isinstance(value, str) and re.fullmatch(r'[0-9a-f]{64}', value) is not None
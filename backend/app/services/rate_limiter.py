@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
 import threading
 
 class RateLimiter:
@@ -45,13 +45,47 @@ class RateLimiter:
                 self._requests[identifier] = requests
                 return False
     
-    def get_remaining_time(self, identifier: str, window_minutes: int = 1) -> int:
+    def check_limits(self, identifier: str, limits: Sequence[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """
+        Check several windows at once and count the request only if all allow it
+        
+        Each window is tracked under "<identifier>:<window_minutes>", so
+        get_remaining_time can be asked about the one that denied the request.
+        
+        Args:
+            identifier: Key of the rate-limited caller
+            limits: (max_requests, window_minutes) pairs
+            
+        Returns:
+            The first exceeded (max_requests, window_minutes) pair, or None if allowed
+        """
+        with self._lock:
+            now = datetime.utcnow()
+            windows = []
+            
+            for max_requests, window_minutes in limits:
+                key = f"{identifier}:{window_minutes}"
+                window_start = now - timedelta(minutes=window_minutes)
+                requests = [req_time for req_time in self._requests.get(key, []) if req_time > window_start]
+                self._requests[key] = requests
+                
+                if len(requests) >= max_requests:
+                    return max_requests, window_minutes
+                windows.append(requests)
+            
+            # Nothing is consumed unless every window has room
+            for requests in windows:
+                requests.append(now)
+            return None
+    
+    def get_remaining_time(self, identifier: str, window_minutes: int = 1, max_requests: int = 3) -> int:
         """
         Get remaining time in seconds until next request is allowed
         
         Args:
             identifier: Phone number or email
             window_minutes: Time window in minutes
+            max_requests: Maximum requests allowed in window
             
         Returns:
             Seconds until next request is allowed
@@ -63,7 +97,7 @@ class RateLimiter:
             requests = self._requests.get(identifier, [])
             requests = [req_time for req_time in requests if req_time > window_start]
             
-            if len(requests) < 3:
+            if len(requests) < max_requests:
                 return 0
             
             # Find the oldest request in the window
@@ -77,7 +111,7 @@ class RateLimiter:
         """Clean up old entries to prevent memory leaks"""
         with self._lock:
             now = datetime.utcnow()
-            cutoff = now - timedelta(hours=1)  # Keep only last hour
+            cutoff = now - timedelta(hours=24)  # Keep the longest window in use (daily limits)
             
             for identifier in list(self._requests.keys()):
                 requests = self._requests[identifier]
@@ -0,0 +1,258 @@
+"""
+Real-time events delivered over Server-Sent Events
+
+Per-user events (new notifications, unread count changes) are appended to a
+capped Redis stream, which gives them ids for Last-Event-ID replay, and
+announced on a pub/sub channel. "New posts" hints are only published.
+
+Each web process holds a single pub/sub connection, subscribed only to the
+channels of the users connected to it and of the authors they follow, and
+fans messages out to in-process queues, so idle SSE connections cost no
+Redis connections and a process never receives other processes' traffic.
+Events raised inside a transaction are published after it commits.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, Iterable, Optional, Set
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.services.redis_client import get_redis
+from app.services.session_effects import is_outer_commit, track
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = 'realtime_events'
+
+USER_CHANNEL_PREFIX = 'rt:user:'
+POSTS_CHANNEL_PREFIX = 'rt:posts:'
+USER_STREAM_PREFIX = 'rt:events:'
+
+# How often the listener applies subscription changes while no message arrives
+_SYNC_INTERVAL = 0.25
+# How long a new connection waits for its channels to be subscribed
+_SUBSCRIBE_WAIT = 2.0
+
+def stream_id_key(event_id: str):
+    """Sortable key of a Redis stream id like '1700000000000-3'"""
+    ms, _, seq = event_id.partition('-')
+    return int(ms), int(seq or 0)
+
+class RealtimeHub:
+    """Publishes events to Redis and dispatches them to local SSE connections"""
+
+    def __init__(self):
+        self.stream_maxlen = int(os.environ.get('REALTIME_STREAM_MAXLEN', '200'))
+        self.stream_ttl = int(os.environ.get('REALTIME_STREAM_TTL', 24 * 3600))
+        self.queue_size = int(os.environ.get('REALTIME_QUEUE_SIZE', '100'))
+        self._lock = threading.Lock()
+        self._users: Dict[str, Set[queue.Queue]] = {}
+        self._authors: Dict[str, Set[queue.Queue]] = {}
+        self._listener: Optional[threading.Thread] = None
+        # Bumped on every registry change; the listener reports the one it applied
+        self._generation = 0
+        self._synced_generation = 0
+        self._synced = threading.Condition()
+
+    # Publishing
+
+    def publish_to_user(self, user_id, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+        """
+        Store an event in the user's stream and announce it
+
+        Returns:
+            Stream id of the event, or None if Redis is unavailable
+        """
+        payload = json.dumps(data, default=str)
+        stream_key = f'{USER_STREAM_PREFIX}{user_id}'
+        try:
+            client = get_redis()
+            event_id = client.xadd(stream_key, {'event': event_type, 'data': payload},
+                                   maxlen=self.stream_maxlen, approximate=True)
+            pipe = client.pipeline(transaction=False)
+            pipe.expire(stream_key, self.stream_ttl)
+            pipe.publish(f'{USER_CHANNEL_PREFIX}{user_id}',
+                         json.dumps({'id': event_id, 'event': event_type, 'data': payload}))
+            pipe.execute()
+            return event_id
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish {event_type} event for {user_id}: {str(e)}")
+            return None
+
+    def publish_new_post(self, author_id, post_id):
+        """Hint followers of the author that the feed has new posts"""
+        try:
+            get_redis().publish(
+                f'{POSTS_CHANNEL_PREFIX}{author_id}',
+                json.dumps({'event': 'new_posts', 'data': json.dumps(
+                    {'author_id': str(author_id), 'post_id': str(post_id)}
+                )})
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish new post hint for {author_id}: {str(e)}")
+
+    def queue_event(self, user_id, event_type: str, data: Dict[str, Any], session: Optional[Session] = None):
+        """Publish a user event once the current transaction commits"""
+        events = (session or db.session).info.setdefault(_SESSION_KEY, [])
+        events.append(('user', str(user_id), event_type, data))
+
+    def queue_new_post(self, author_id, post_id, session: Optional[Session] = None):
+        """Publish a new post hint once the current transaction commits"""
+        events = (session or db.session).info.setdefault(_SESSION_KEY, [])
+        events.append(('post', str(author_id), str(post_id), None))
+
+    def flush(self, events):
+        for kind, key, name, data in events:
+            if kind == 'user':
+                self.publish_to_user(key, name, data)
+            else:
+                self.publish_new_post(key, name)
+
+    # Replay
+
+    def replay(self, user_id, last_event_id: str, limit: int = 500):
+        """Events stored after last_event_id, oldest first"""
+        try:
+            stream_id_key(last_event_id)
+        except ValueError:
+            return []
+        try:
+            entries = get_redis().xrange(f'{USER_STREAM_PREFIX}{user_id}',
+                                         min=f'({last_event_id}', count=limit)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to replay events for {user_id}: {str(e)}")
+            return []
+        return [
+            {'id': entry_id, 'event': fields.get('event'), 'data': fields.get('data')}
+            for entry_id, fields in entries
+        ]
+
+    # Local fan-out
+
+    def subscribe(self, user_id, author_ids: Iterable) -> queue.Queue:
+        """
+        Register a connection for a user's events and its followees' post hints
+
+        Returns once the listener has subscribed to the new channels (or
+        after a short wait), so events published afterwards are delivered.
+        """
+        self._ensure_listener()
+        connection = queue.Queue(maxsize=self.queue_size)
+        connection.overflowed = False
+        connection.author_ids = {str(author_id) for author_id in author_ids}
+        with self._lock:
+            self._users.setdefault(str(user_id), set()).add(connection)
+            for author_id in connection.author_ids:
+                self._authors.setdefault(author_id, set()).add(connection)
+            self._generation += 1
+            generation = self._generation
+        with self._synced:
+            self._synced.wait_for(lambda: self._synced_generation >= generation, timeout=_SUBSCRIBE_WAIT)
+        return connection
+
+    def unsubscribe(self, user_id, connection: queue.Queue):
+        with self._lock:
+            self._discard(self._users, str(user_id), connection)
+            for author_id in connection.author_ids:
+                self._discard(self._authors, author_id, connection)
+            self._generation += 1
+
+    @staticmethod
+    def _discard(registry, key, connection):
+        connections = registry.get(key)
+        if connections:
+            connections.discard(connection)
+            if not connections:
+                del registry[key]
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(connections) for connections in self._users.values())
+
+    def _ensure_listener(self):
+        if self._listener and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='realtime-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """Receive the real-time messages of this process's connections and dispatch them"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                subscribed: Set[str] = set()
+                while True:
+                    # The pub/sub connection is only ever used from this thread
+                    subscribed = self._sync_channels(pubsub, subscribed)
+                    message = pubsub.get_message(timeout=_SYNC_INTERVAL)
+                    if message and message.get('type') == 'message':
+                        self._dispatch(message['channel'], message['data'])
+            except redis.RedisError as e:
+                logger.warning(f"Realtime listener disconnected, reconnecting: {str(e)}")
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+            threading.Event().wait(1)
+
+    def _sync_channels(self, pubsub, subscribed: Set[str]) -> Set[str]:
+        """Subscribe to the channels of connected users and their followees, drop the rest"""
+        with self._lock:
+            generation = self._generation
+            if generation == self._synced_generation and subscribed:
+                return subscribed
+            wanted = {f'{USER_CHANNEL_PREFIX}{user_id}' for user_id in self._users}
+            wanted.update(f'{POSTS_CHANNEL_PREFIX}{author_id}' for author_id in self._authors)
+
+        added, removed = wanted - subscribed, subscribed - wanted
+        if added:
+            pubsub.subscribe(*added)
+        if removed:
+            pubsub.unsubscribe(*removed)
+
+        with self._synced:
+            self._synced_generation = generation
+            self._synced.notify_all()
+        return wanted
+
+    def _dispatch(self, channel: str, raw: str):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+
+        with self._lock:
+            if channel.startswith(USER_CHANNEL_PREFIX):
+                targets = list(self._users.get(channel[len(USER_CHANNEL_PREFIX):], ()))
+            else:
+                targets = list(self._authors.get(channel[len(POSTS_CHANNEL_PREFIX):], ()))
+
+        for connection in targets:
+            try:
+                connection.put_nowait(message)
+            except queue.Full:
+                # Slow client: the stream is closed and it catches up with Last-Event-ID
+                connection.overflowed = True
+
+# Global instance
+realtime_hub = RealtimeHub()
+
+@event.listens_for(Session, 'after_commit')
+def _publish_realtime_events(session):
+    if not is_outer_commit(session):
+        return
+    events = session.info.pop(_SESSION_KEY, None)
+    if events:
+        realtime_hub.flush(events)
+
+# Dropped with rolled back savepoints and transactions
+track(_SESSION_KEY)
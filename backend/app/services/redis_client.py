@@ -0,0 +1,32 @@
+"""
+Shared Redis connection for caches and real-time features
+
+One connection pool per process, created lazily from REDIS_URL. Callers must
+treat Redis as optional and fall back to the database when it is unavailable.
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_lock = threading.Lock()
+
+def get_redis() -> redis.Redis:
+    """Get the process-wide Redis client"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+                    decode_responses=True,
+                    socket_connect_timeout=float(os.environ.get('REDIS_CONNECT_TIMEOUT', '0.5')),
+                    socket_timeout=float(os.environ.get('REDIS_SOCKET_TIMEOUT', '1.0')),
+                    health_check_interval=30
+                )
+    return _client
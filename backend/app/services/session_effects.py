@@ -0,0 +1,61 @@
+"""
+Savepoint-aware bookkeeping for deferred side effects
+
+Unread counter changes, real-time events and outbox wake-ups are collected
+in session.info and applied once the outer transaction commits. Work done
+in a savepoint (begin_nested) that is rolled back must not leave its side
+effects behind, so the collected state is snapshotted whenever a savepoint
+begins and put back if that savepoint rolls back. A rollback of the outer
+transaction discards everything.
+
+after_commit also fires when a savepoint is released; handlers apply their
+side effects only for the outer commit (see is_outer_commit).
+"""
+import copy
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_SNAPSHOTS_KEY = 'savepoint_snapshots'
+
+# session.info keys holding deferred side effects
+_tracked_keys = set()
+
+def track(key: str):
+    """Roll the session.info entry under key back with savepoints"""
+    _tracked_keys.add(key)
+
+def is_outer_commit(session) -> bool:
+    """Whether an after_commit event is for the outer transaction rather than a released savepoint"""
+    return not session.in_nested_transaction()
+
+@event.listens_for(Session, 'after_transaction_create')
+def _snapshot_side_effects(session, transaction):
+    if not transaction.nested:
+        return
+    session.info.setdefault(_SNAPSHOTS_KEY, {})[transaction] = {
+        key: copy.deepcopy(session.info[key]) for key in _tracked_keys if key in session.info
+    }
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _roll_back_side_effects(session, previous_transaction):
+    if not previous_transaction.nested:
+        for key in _tracked_keys:
+            session.info.pop(key, None)
+        session.info.pop(_SNAPSHOTS_KEY, None)
+        return
+
+    snapshot = session.info.get(_SNAPSHOTS_KEY, {}).pop(previous_transaction, None)
+    if snapshot is None:
+        return
+    for key in _tracked_keys:
+        if key in snapshot:
+            session.info[key] = snapshot[key]
+        else:
+            session.info.pop(key, None)
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_snapshots(session, transaction):
+    # Released savepoints keep their snapshot until the outer transaction ends
+    if transaction.parent is None:
+        session.info.pop(_SNAPSHOTS_KEY, None)
@@ -5,7 +5,9 @@ import logging
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 import os
-from .error_handler import auth_error_handler, retry_on_failure
+from .error_handler import auth_error_handler
+from .circuit_breaker import CircuitOpenError, Deadline, DeadlineExceeded, PermanentError, resilient_call
+from .http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +20,11 @@ class MobizonSMSService:
         self.api_key = os.getenv('MOBIZON_API_KEY')
         if not self.api_key:
             logger.warning("MOBIZON_API_KEY not set in environment variables")
-        # Correct Mobizon API endpoint according to documentation
-        self.base_url = 'https://api.mobizon.kz/service/message/sendsmsmessage'
-        self.timeout = int(os.getenv('SMS_SERVICE_TIMEOUT', '30'))
+        # Correct Mobizon API endpoint according to documentation; SMS_API_URL points load tests at a stub
+        self.base_url = os.getenv('SMS_API_URL', 'https://api.mobizon.kz/service/message/sendsmsmessage')
+        self.timeout = float(os.getenv('SMS_SERVICE_TIMEOUT', '10'))  # Read timeout; connect uses HTTP_CONNECT_TIMEOUT
         self.debug_mode = os.getenv('SMS_DEBUG_MODE', 'false').lower() == 'true'
+        self.deadline_seconds = float(os.getenv('SMS_DEADLINE_SECONDS', '5'))  # Budget for all attempts of one SMS
         
     def generate_verification_code(self, length: int = 6) -> str:
         """Generate a random verification code"""
@@ -49,16 +52,20 @@ class MobizonSMSService:
         
         return phone if phone.startswith('+') else f"+{phone}"
     
-    def _send_sms_request(self, formatted_phone: str, message: str) -> Dict[str, Any]:
+    def _send_sms_request(self, formatted_phone: str, message: str, deadline: Deadline) -> Dict[str, Any]:
         """
-        Internal method to send SMS request to Mobizon API with retry logic
+        Internal method to send one SMS request to Mobizon API
         
         Args:
             formatted_phone: Phone number in international format
             message: SMS message text
+            deadline: Time budget that bounds the request timeouts
             
         Returns:
             Dictionary with send result
+            
+        Raises:
+            PermanentError: Mobizon rejected the request itself (bad number, key, text)
         """
         # Mobizon API parameters according to documentation
         params = {
@@ -69,10 +76,10 @@ class MobizonSMSService:
         
         logger.info(f"📱 SMS Request: Sending SMS to {formatted_phone}")
         logger.info(f"📱 SMS Request: Mobizon API URL: {self.base_url}")
-        logger.info(f"📱 SMS Request: Mobizon API params: {params}")
         
         # Send request to Mobizon API
-        response = requests.post(self.base_url, data=params, timeout=self.timeout)
+        response = http_client.post(self.base_url, data=params,
+                                    timeout=deadline.timeout(http_client.connect_timeout, self.timeout))
         
         logger.info(f"📱 SMS Response: Status {response.status_code}")
         logger.info(f"📱 SMS Response: Text {response.text}")
@@ -94,15 +101,25 @@ class MobizonSMSService:
                 error_msg = result.get('message', 'Unknown error')
                 error_code = result.get('code', 'Unknown code')
                 logger.error(f"❌ SMS Error: Mobizon API error {error_code} - {error_msg}")
-                raise Exception(f"Mobizon API error {error_code}: {error_msg}")
+                raise PermanentError(f"Mobizon API error {error_code}: {error_msg}")
         else:
             logger.error(f"❌ SMS Error: HTTP {response.status_code}: {response.text}")
-            raise Exception(f"HTTP error: {response.status_code} - {response.text}")
+            # 4xx means the request is wrong and will not succeed on retry
+            error_class = PermanentError if response.status_code < 500 else Exception
+            raise error_class(f"HTTP error: {response.status_code} - {response.text}")
+
+    def _send_through_breaker(self, formatted_phone: str, message: str, max_attempts: int) -> Dict[str, Any]:
+        """Send through the mobizon circuit breaker within SMS_DEADLINE_SECONDS"""
+        return resilient_call(
+            'mobizon',
+            lambda deadline: self._send_sms_request(formatted_phone, message, deadline),
+            deadline=Deadline(self.deadline_seconds),
+            max_attempts=max_attempts
+        )
 
-    @retry_on_failure(max_retries=3, delay=1.0, backoff=2.0)
     def send_verification_sms(self, phone: str, code: str) -> Dict[str, Any]:
         """
-        Send verification SMS via Mobizon API with retry logic
+        Send verification SMS via Mobizon API, retrying transient failures within the deadline
         
         Args:
             phone: Phone number in international format
@@ -129,12 +146,14 @@ class MobizonSMSService:
                     'code': code
                 }
             
-            # Send SMS with retry logic
-            result = self._send_sms_request(formatted_phone, message)
+            result = self._send_through_breaker(formatted_phone, message, max_attempts=3)
             result['code'] = code
             return result
                 
-        except requests.exceptions.Timeout as e:
+        except CircuitOpenError as e:
+            logger.warning(f"SMS not sent to {phone}: {str(e)}")
+            return auth_error_handler.handle_sms_error(e, phone, "SMS send")
+        except (requests.exceptions.Timeout, DeadlineExceeded) as e:
             logger.error(f"SMS API request timeout for {phone}: {str(e)}")
             return auth_error_handler.handle_sms_error(e, phone, "SMS send timeout")
         except requests.exceptions.ConnectionError as e:
@@ -165,6 +184,29 @@ class MobizonSMSService:
         except:
             return False
     
+    def deliver_verification_code(self, phone: str, code: str) -> Dict[str, Any]:
+        """
+        Send a verification SMS once, for the background delivery task
+        
+        Unlike send_verification_sms, errors are raised so the caller can
+        schedule a retry without blocking: PermanentError must not be retried,
+        CircuitOpenError carries how long to wait.
+        
+        Args:
+            phone: Phone number in international format
+            code: Verification code to send
+            
+        Returns:
+            Dictionary with send result
+        """
+        formatted_phone = self.format_phone_number(phone)
+        if self.debug_mode:
+            logger.info(f"DEBUG MODE: SMS would be sent to {formatted_phone} with code {code}")
+            return {'success': True, 'message': 'SMS sent successfully (DEBUG MODE)', 'phone': formatted_phone}
+        
+        message = f"Ваш код подтверждения: {code}. Не сообщайте его никому."
+        return self._send_through_breaker(formatted_phone, message, max_attempts=1)
+    
     def send_verification_code(self, phone: str, code: str) -> bool:
         """
         Send verification code (wrapper for send_verification_sms)
@@ -0,0 +1,12 @@
+from .auth_codes import deliver_code, fail_undelivered_codes
+from .genealogy import import_genealogy_file
+from .media import generate_variants, collect_media_blobs, collect_upload_sessions, evict_resize_cache
+from .notifications import (
+    reconcile_unread_counters, archive_expired_notifications, delete_user_notifications, send_email_digests
+)
+from .outbox import drain_outbox, purge_outbox
+
+__all__ = ['deliver_code', 'fail_undelivered_codes', 'import_genealogy_file', 'generate_variants',
+           'collect_media_blobs', 'collect_upload_sessions', 'evict_resize_cache', 'reconcile_unread_counters',
+           'archive_expired_notifications', 'delete_user_notifications', 'send_email_digests', 'drain_outbox',
+           'purge_outbox']
@@ -0,0 +1,110 @@
+from sqlalchemy.sql import func
+from app import celery, db
+from app.models.code import Code
+from app.services.sms_service import sms_service
+from app.services.email_service import email_service
+from app.services.circuit_breaker import CircuitOpenError, PermanentError
+from app.services.redis_client import get_redis
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import uuid
+import redis
+
+logger = logging.getLogger(__name__)
+
+CODE_DELIVERY_QUEUE = os.environ.get('CODE_DELIVERY_QUEUE', 'auth_codes')
+CODE_DELIVERY_MAX_RETRIES = int(os.environ.get('CODE_DELIVERY_MAX_RETRIES', 3))
+# A code that could not be delivered within this window is not worth sending any more
+CODE_DELIVERY_EXPIRES = int(os.environ.get('CODE_DELIVERY_EXPIRES', 300))
+# Plaintext codes wait for the worker here, never in task arguments (broker, logs, results)
+CODE_SECRET_PREFIX = 'auth_code:'
+
+def _secret_key(code_id):
+    return f'{CODE_SECRET_PREFIX}{code_id}'
+
+@celery.task(bind=True, name='auth.deliver_code', max_retries=CODE_DELIVERY_MAX_RETRIES)
+def deliver_code(self, code_id):
+    """Send a verification code by SMS or email and record the delivery result"""
+    code = Code.query.get(uuid.UUID(code_id))
+    if not code or not code.is_active or code.delivery_status != 'pending':
+        logger.warning(f"Verification code {code_id} not found or already handled")
+        return
+    
+    code.delivery_attempts += 1
+    try:
+        # A Redis error is retried like a provider error
+        plain_code = get_redis().get(_secret_key(code_id))
+        if plain_code is None:
+            raise PermanentError('Code expired before it could be delivered')
+        if code.type == 'phone':
+            sms_service.deliver_verification_code(code.identifier, plain_code)
+        else:
+            email_service.deliver_verification_code(code.identifier, plain_code)
+    except Exception as e:
+        code.delivery_error = str(e)[:1000]
+        if not isinstance(e, PermanentError) and self.request.retries < self.max_retries:
+            db.session.commit()
+            # Retried by the broker, the worker is free in the meantime; an open
+            # circuit says when the provider is worth trying again
+            countdown = max(e.retry_after, 1) if isinstance(e, CircuitOpenError) else 2 ** self.request.retries
+            raise self.retry(exc=e, countdown=countdown)
+        
+        logger.error(f"Giving up delivering code {code_id} to {code.type}: {str(e)}")
+        code.delivery_status = 'failed'
+        code.is_active = False
+        db.session.commit()
+        _discard_secret(code_id)
+        return 'failed'
+    
+    code.delivery_status = 'sent'
+    code.delivery_error = None
+    code.delivered_at = func.now()
+    db.session.commit()
+    _discard_secret(code_id)
+    return 'sent'
+
+def _discard_secret(code_id):
+    try:
+        get_redis().delete(_secret_key(code_id))
+    except redis.RedisError as e:
+        # It expires with CODE_DELIVERY_EXPIRES anyway
+        logger.warning(f"Failed to discard plaintext of code {code_id}: {str(e)}")
+
+def undelivered_cutoff():
+    """Codes created before this and still pending will never be delivered"""
+    return datetime.now(timezone.utc) - timedelta(seconds=CODE_DELIVERY_EXPIRES)
+
+@celery.task(name='auth.fail_undelivered_codes')
+def fail_undelivered_codes():
+    """Mark codes whose delivery task expired in the queue as failed"""
+    failed = Code.fail_undelivered(undelivered_cutoff())
+    db.session.commit()
+    if failed:
+        logger.warning(f"Marked {failed} undelivered verification codes as failed")
+    return failed
+
+def queue_code_delivery(code, plain_code):
+    """
+    Hand a committed code to the delivery queue
+    
+    Returns:
+        True if the task was enqueued; otherwise the code is marked failed
+    """
+    try:
+        # Kept only until delivery; the database holds the hash
+        get_redis().set(_secret_key(code.id), plain_code, ex=CODE_DELIVERY_EXPIRES)
+        deliver_code.apply_async(
+            args=[str(code.id)],
+            queue=CODE_DELIVERY_QUEUE,
+            expires=CODE_DELIVERY_EXPIRES,
+            retry=False
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to enqueue delivery of code {code.id}: {str(e)}")
+        code.delivery_status = 'failed'
+        code.delivery_error = 'Delivery queue is unavailable'
+        code.is_active = False
+        db.session.commit()
+        return False
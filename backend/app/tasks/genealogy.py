@@ -0,0 +1,57 @@
+from sqlalchemy.sql import func
+from app import celery, db
+from app.models.genealogy import GenealogyImport, ImportStatus
+from app.services.genealogy_importer import GenealogyImporter
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+@celery.task(name='genealogy.import_file')
+def import_genealogy_file(import_id):
+    """Run a pending genealogy import job"""
+    job = GenealogyImport.query.get(uuid.UUID(import_id))
+    if not job or job.status != ImportStatus.PENDING:
+        logger.warning(f"Genealogy import {import_id} not found or already processed")
+        return
+    
+    job.status = ImportStatus.RUNNING
+    job.started_at = func.now()
+    job.total_bytes = os.path.getsize(job.file_path) if os.path.exists(job.file_path) else 0
+    db.session.commit()
+    
+    def report_progress(bytes_processed, persons_count, relations_count):
+        # Committed together with each imported batch
+        job.bytes_processed = bytes_processed
+        job.persons_count = persons_count
+        job.relations_count = relations_count
+    
+    importer = GenealogyImporter(job.tree_id, progress_callback=report_progress, import_id=job.id)
+    try:
+        stats = importer.run(job.file_path, job.source_format)
+        
+        job.status = ImportStatus.COMPLETED
+        job.bytes_processed = job.total_bytes
+        job.persons_count = stats['persons_count']
+        job.relations_count = stats['relations_count']
+        job.linked_users_count = stats['linked_users_count']
+        job.finished_at = func.now()
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Genealogy import {import_id} failed: {str(e)}")
+        db.session.rollback()
+        # Batches were committed as they were parsed: remove the partial tree
+        try:
+            importer.discard()
+        except Exception as cleanup_error:
+            db.session.rollback()
+            logger.error(f"Failed to discard rows of genealogy import {import_id}: {str(cleanup_error)}")
+        job = GenealogyImport.query.get(uuid.UUID(import_id))
+        job.status = ImportStatus.FAILED
+        job.error = str(e)[:1000]
+        job.finished_at = func.now()
+        db.session.commit()
+    finally:
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
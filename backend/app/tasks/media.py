@@ -0,0 +1,119 @@
+from PIL import Image, UnidentifiedImageError
+from app import celery, db
+from app.models.media import Media
+from app.models.media_blob import MediaBlob
+from app.models.post import Post
+from app.models.upload_session import UploadSession
+from app.services.image_resizer import image_resizer
+from app.services.image_variants import image_variants
+from app.services.media_storage import media_storage
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TASK_QUEUE = os.environ.get('MEDIA_TASK_QUEUE', 'media')
+# How long an unreferenced blob is kept, so a re-upload can revive it
+MEDIA_BLOB_GRACE_SECONDS = int(os.environ.get('MEDIA_BLOB_GRACE_SECONDS', 3600))
+
+@celery.task(bind=True, name='media.generate_variants', max_retries=2)
+def generate_variants(self, media_id):
+    """Render the responsive variants of an uploaded image"""
+    media = Media.query.get(uuid.UUID(media_id))
+    if not media:
+        logger.warning(f"Media {media_id} not found, skipping variants")
+        return
+    
+    blob = MediaBlob.query.get(media.blob_id) if media.blob_id else None
+    source = blob or media
+    
+    try:
+        if not (blob and blob.variants):
+            # Duplicates share the blob's files; legacy media get their own
+            image_variants.generate(source, blob.sha256 if blob else media.id.hex)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        # Retrying cannot help: the original keeps being served as is
+        logger.error(f"Cannot render variants of media {media_id}: {str(e)}")
+        return 'failed'
+    except OSError as e:
+        db.session.rollback()
+        raise self.retry(exc=e, countdown=30)
+    
+    targets = Media.query.filter_by(blob_id=blob.id).all() if blob else [media]
+    for target in targets:
+        target.width, target.height, target.variants = source.width, source.height, source.variants
+        target.blurhash, target.lqip = source.blurhash, source.lqip
+        # Posts keep a snapshot of their media; refresh it so feeds link the variants
+        if target.post_id:
+            post = Post.query.get(target.post_id)
+            if post and post.media:
+                post.media = [
+                    target.to_dict() if isinstance(item, dict) and item.get('id') == str(target.id) else item
+                    for item in post.media
+                ]
+    
+    db.session.commit()
+    return 'generated'
+
+@celery.task(name='media.collect_blobs')
+def collect_media_blobs():
+    """Delete blobs that lost their last reference, with their variants and renditions"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=MEDIA_BLOB_GRACE_SECONDS)
+    collected = 0
+    while True:
+        blobs = MediaBlob.lock_unreferenced(cutoff)
+        if not blobs:
+            break
+        # Files go while the rows are locked: an upload of the same content
+        # waits, then finds the file gone and is rejected (Media.attach_blob)
+        for blob in blobs:
+            media_storage.remove(blob.storage_key)
+            image_variants.delete_files(blob.variants)
+            image_resizer.purge(blob.storage_key)
+            db.session.delete(blob)
+        db.session.commit()
+        collected += len(blobs)
+    if collected:
+        logger.info(f"Collected {collected} unreferenced media blobs")
+    return collected
+
+@celery.task(name='media.evict_resize_cache')
+def evict_resize_cache():
+    """Keep the on-demand resize cache under its size limit"""
+    return image_resizer.evict()
+
+@celery.task(name='media.collect_upload_sessions')
+def collect_upload_sessions():
+    """Delete expired resumable upload sessions and their partial files"""
+    collected = 0
+    while True:
+        sessions = UploadSession.get_expired(datetime.now(timezone.utc))
+        if not sessions:
+            break
+        session_ids = [session.id for session in sessions]
+        for session in sessions:
+            db.session.delete(session)
+        db.session.commit()
+        
+        for session_id in session_ids:
+            media_storage.remove_partial(session_id)
+        collected += len(session_ids)
+    if collected:
+        logger.info(f"Collected {collected} expired upload sessions")
+    return collected
+
+def queue_variant_generation(media):
+    """
+    Hand a committed media row to the variant workers
+    
+    Returns:
+        True if the task was enqueued; otherwise the original is served as is
+    """
+    try:
+        generate_variants.apply_async(args=[str(media.id)], queue=MEDIA_TASK_QUEUE)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to enqueue variants of media {media.id}: {str(e)}")
+        return False
@@ -0,0 +1,37 @@
+from app import celery
+from app.services.notification_counter import unread_counter
+from app.services.notification_retention import notification_retention
+from app.services.email_digest import email_digest_sender
+from datetime import datetime
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+@celery.task(name='notifications.reconcile_unread_counters')
+def reconcile_unread_counters():
+    """Overwrite cached unread counters with counts from the database"""
+    reconciled = unread_counter.reconcile()
+    logger.info(f"Reconciled {reconciled} unread notification counters")
+    return reconciled
+
+@celery.task(name='notifications.archive_expired')
+def archive_expired_notifications():
+    """Archive and delete read notifications past retention"""
+    result = notification_retention.archive_expired()
+    logger.info(f"Archived {result['archived']} expired notifications")
+    return result
+
+@celery.task(name='notifications.delete_for_user')
+def delete_user_notifications(user_id, before):
+    """Delete a user's notifications in chunks (DELETE /api/notifications/delete-all)"""
+    deleted = notification_retention.delete_for_user(uuid.UUID(user_id), datetime.fromisoformat(before))
+    logger.info(f"Deleted {deleted} notifications of user {user_id}")
+    return deleted
+
+@celery.task(name='notifications.send_email_digests')
+def send_email_digests(frequency):
+    """Email unread notification digests to users subscribed with this frequency"""
+    stats = email_digest_sender.send_digests(frequency)
+    logger.info(f"Sent {stats['sent']} {frequency} email digests, deferred {stats['deferred']}")
+    return stats
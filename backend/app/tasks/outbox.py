@@ -0,0 +1,20 @@
+from app import celery
+from app.services.outbox import outbox_processor
+import logging
+
+logger = logging.getLogger(__name__)
+
+@celery.task(name='outbox.drain')
+def drain_outbox():
+    """Process pending outbox events"""
+    processed = outbox_processor.drain()
+    if processed:
+        logger.info(f"Processed {processed} outbox events")
+    return processed
+
+@celery.task(name='outbox.purge')
+def purge_outbox():
+    """Delete processed outbox events past retention"""
+    deleted = outbox_processor.purge()
+    logger.info(f"Purged {deleted} processed outbox events")
+    return deleted
@@ -0,0 +1,9 @@
+"""
+Celery worker entry point
+
+Usage: celery -A celery_worker.celery worker -B --loglevel=info
+"""
+from app import create_app, celery
+
+app = create_app()
+app.app_context().push()
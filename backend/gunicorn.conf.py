@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration
+
+Usage: gunicorn -c gunicorn.conf.py run:app
+
+The gevent worker class lets one process hold thousands of idle
+Server-Sent Events connections (/api/notifications/stream). psycopg2 is made
+cooperative in every gevent worker, otherwise a slow query would block all
+greenlets of the process.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('FLASK_RUN_PORT', '5000')}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '2000'))
+# Streams are long-lived; gevent workers heartbeat independently of requests
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,44 @@
+"""Add transactional outbox table
+
+Revision ID: 0b7d4e2f9a61
+Revises: f1a8c3e6b247
+Create Date: 2026-10-19 17:30:51.402671
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7d4e2f9a61'
+down_revision = 'f1a8c3e6b247'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('social_outbox_events',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('social_outbox_events', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_social_outbox_events_pending', ['available_at'],
+            unique=False,
+            postgresql_where=sa.text('processed_at IS NULL'),
+            sqlite_where=sa.text('processed_at IS NULL')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('social_outbox_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_social_outbox_events_pending')
+
+    op.drop_table('social_outbox_events')
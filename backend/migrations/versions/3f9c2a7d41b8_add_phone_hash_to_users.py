@@ -0,0 +1,29 @@
+"""Add phone_hash column to users for contact matching
+
+Revision ID: 3f9c2a7d41b8
+Revises: 6ad7840256a7
+Create Date: 2026-10-19 10:12:44.201317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d41b8'
+down_revision = '6ad7840256a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_social_users_phone_hash'), ['phone_hash'], unique=True)
+
+    # Existing numbers are hashed by d5a9f3b1c7e2, through the same normalization as the model
+
+def downgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_social_users_phone_hash'))
+        batch_op.drop_column('phone_hash')
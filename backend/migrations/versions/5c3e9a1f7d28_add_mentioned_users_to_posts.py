@@ -0,0 +1,26 @@
+"""Add resolved mentions to posts
+
+Revision ID: 5c3e9a1f7d28
+Revises: 0b7d4e2f9a61
+Create Date: 2026-10-19 18:05:31.402617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e9a1f7d28'
+down_revision = '0b7d4e2f9a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mentioned_users', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('social_posts', schema=None) as batch_op:
+        batch_op.drop_column('mentioned_users')
@@ -0,0 +1,26 @@
+"""Index notifications for retention
+
+Revision ID: 8d2f6b0c4e19
+Revises: 5c3e9a1f7d28
+Create Date: 2026-10-19 18:47:12.530941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f6b0c4e19'
+down_revision = '5c3e9a1f7d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_social_notifications_read_created', ['read', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_social_notifications_read_created')
@@ -0,0 +1,69 @@
+"""Add genealogy persons, relations and ancestry closure tables
+
+Revision ID: a1d47e0c9b35
+Revises: 3f9c2a7d41b8
+Create Date: 2026-10-19 11:03:27.845120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d47e0c9b35'
+down_revision = '3f9c2a7d41b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('social_genealogy_persons',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('tree_id', sa.String(length=100), nullable=False),
+        sa.Column('gramps_id', sa.String(length=100), nullable=False),
+        sa.Column('given_name', sa.String(length=255), nullable=True),
+        sa.Column('surname', sa.String(length=255), nullable=True),
+        sa.Column('gender', sa.String(length=1), nullable=True),
+        sa.Column('birth_date', sa.String(length=50), nullable=True),
+        sa.Column('death_date', sa.String(length=50), nullable=True),
+        sa.Column('user_id', sa.UUID(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['social_users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tree_id', 'gramps_id', name='unique_tree_person')
+    )
+    op.create_table('social_genealogy_relations',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('tree_id', sa.String(length=100), nullable=False),
+        sa.Column('source_id', sa.String(length=100), nullable=False),
+        sa.Column('target_id', sa.String(length=100), nullable=False),
+        sa.Column('relation_type', sa.Enum('PARENT', 'SPOUSE', name='relationtype'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tree_id', 'source_id', 'target_id', 'relation_type', name='unique_tree_relation')
+    )
+    with op.batch_alter_table('social_genealogy_relations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_social_genealogy_relations_tree_id'), ['tree_id'], unique=False)
+
+    op.create_table('social_genealogy_ancestry',
+        sa.Column('tree_id', sa.String(length=100), nullable=False),
+        sa.Column('ancestor_id', sa.String(length=100), nullable=False),
+        sa.Column('descendant_id', sa.String(length=100), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('tree_id', 'ancestor_id', 'descendant_id')
+    )
+    with op.batch_alter_table('social_genealogy_ancestry', schema=None) as batch_op:
+        batch_op.create_index('ix_genealogy_ancestry_descendant', ['tree_id', 'descendant_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('social_genealogy_ancestry', schema=None) as batch_op:
+        batch_op.drop_index('ix_genealogy_ancestry_descendant')
+
+    op.drop_table('social_genealogy_ancestry')
+    with op.batch_alter_table('social_genealogy_relations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_social_genealogy_relations_tree_id'))
+
+    op.drop_table('social_genealogy_relations')
+    op.drop_table('social_genealogy_persons')
+    sa.Enum(name='relationtype').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,47 @@
+"""Add resumable upload sessions
+
+Revision ID: a3f6d2c8e915
+Revises: e9b3c5a7d140
+Create Date: 2026-10-19 23:02:47.655310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f6d2c8e915'
+down_revision = 'e9b3c5a7d140'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('social_upload_sessions',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('owner_id', sa.UUID(), nullable=False),
+        sa.Column('post_id', sa.UUID(), nullable=True),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=False),
+        sa.Column('received_size', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('status', sa.String(length=20), server_default='active', nullable=False),
+        sa.Column('media_id', sa.UUID(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['social_users.id'], ),
+        sa.ForeignKeyConstraint(['post_id'], ['social_posts.id'], ),
+        sa.ForeignKeyConstraint(['media_id'], ['social_media.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('social_upload_sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_social_upload_sessions_owner_id'), ['owner_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_social_upload_sessions_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('social_upload_sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_social_upload_sessions_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_social_upload_sessions_owner_id'))
+
+    op.drop_table('social_upload_sessions')
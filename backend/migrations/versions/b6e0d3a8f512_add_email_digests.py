@@ -0,0 +1,32 @@
+"""Add email digest preference and notification emailed_at
+
+Revision ID: b6e0d3a8f512
+Revises: 8d2f6b0c4e19
+Create Date: 2026-10-19 19:26:44.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e0d3a8f512'
+down_revision = '8d2f6b0c4e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_digest', sa.String(length=10), server_default='off', nullable=False))
+
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('emailed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.drop_column('emailed_at')
+
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.drop_column('email_digest')
@@ -0,0 +1,36 @@
+"""Add BlurHash and LQIP placeholders to media
+
+Revision ID: b7d4e2f9a361
+Revises: a3f6d2c8e915
+Create Date: 2026-10-20 00:41:09.327514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e2f9a361'
+down_revision = 'a3f6d2c8e915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_media_blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blurhash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('lqip', sa.Text(), nullable=True))
+
+    with op.batch_alter_table('social_media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blurhash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('lqip', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('social_media', schema=None) as batch_op:
+        batch_op.drop_column('lqip')
+        batch_op.drop_column('blurhash')
+
+    with op.batch_alter_table('social_media_blobs', schema=None) as batch_op:
+        batch_op.drop_column('lqip')
+        batch_op.drop_column('blurhash')
@@ -0,0 +1,78 @@
+"""Add genealogy tree members
+
+Revision ID: c2e8f4a6d193
+Revises: b7d4e2f9a361
+Create Date: 2026-10-20 10:12:38.204716
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e8f4a6d193'
+down_revision = 'b7d4e2f9a361'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    members = op.create_table('social_genealogy_tree_members',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('tree_id', sa.String(length=100), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('gramps_person_id', sa.String(length=100), nullable=True),
+        sa.Column('role', sa.String(length=20), server_default='member', nullable=False),
+        sa.Column('added_by_id', sa.UUID(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['social_users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['added_by_id'], ['social_users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tree_id', 'user_id', name='uq_genealogy_tree_member')
+    )
+    with op.batch_alter_table('social_genealogy_tree_members', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_social_genealogy_tree_members_user_id'), ['user_id'], unique=False)
+
+    connection = op.get_bind()
+    # Importers own the trees they created; their own person link is kept
+    owners = connection.execute(sa.text(
+        "SELECT DISTINCT i.tree_id, i.owner_id, "
+        "CASE WHEN u.gramps_tree_id = i.tree_id THEN u.gramps_person_id END "
+        "FROM social_genealogy_imports i JOIN social_users u ON u.id = i.owner_id"
+    )).fetchall()
+    seen = set()
+    rows = []
+    for tree_id, owner_id, person_id in owners:
+        if (tree_id, owner_id) in seen:
+            continue
+        seen.add((tree_id, owner_id))
+        rows.append({
+            'id': uuid.uuid4(), 'tree_id': tree_id, 'user_id': owner_id,
+            'gramps_person_id': person_id, 'role': 'owner', 'added_by_id': owner_id
+        })
+    if rows:
+        op.bulk_insert(members, rows)
+
+    # Every other link was self-assigned through the profile and is not trusted
+    connection.execute(sa.text(
+        "UPDATE social_users SET gramps_tree_id = NULL, gramps_person_id = NULL "
+        "WHERE gramps_tree_id IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM social_genealogy_tree_members m "
+        "WHERE m.user_id = social_users.id AND m.tree_id = social_users.gramps_tree_id)"
+    ))
+    connection.execute(sa.text(
+        "UPDATE social_genealogy_persons SET user_id = NULL "
+        "WHERE user_id IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM social_genealogy_tree_members m "
+        "WHERE m.user_id = social_genealogy_persons.user_id AND m.tree_id = social_genealogy_persons.tree_id "
+        "AND m.gramps_person_id = social_genealogy_persons.gramps_id)"
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('social_genealogy_tree_members', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_social_genealogy_tree_members_user_id'))
+
+    op.drop_table('social_genealogy_tree_members')
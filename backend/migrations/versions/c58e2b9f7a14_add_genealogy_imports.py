@@ -0,0 +1,44 @@
+"""Add genealogy import jobs table
+
+Revision ID: c58e2b9f7a14
+Revises: a1d47e0c9b35
+Create Date: 2026-10-19 12:40:09.512734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58e2b9f7a14'
+down_revision = 'a1d47e0c9b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('social_genealogy_imports',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('tree_id', sa.String(length=100), nullable=False),
+        sa.Column('owner_id', sa.UUID(), nullable=False),
+        sa.Column('source_format', sa.String(length=20), nullable=False),
+        sa.Column('original_filename', sa.String(length=255), nullable=True),
+        sa.Column('file_path', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='importstatus'), nullable=False),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('bytes_processed', sa.BigInteger(), nullable=True),
+        sa.Column('persons_count', sa.Integer(), nullable=True),
+        sa.Column('relations_count', sa.Integer(), nullable=True),
+        sa.Column('linked_users_count', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['social_users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('social_genealogy_imports')
+    sa.Enum(name='importstatus').drop(op.get_bind(), checkfirst=True)
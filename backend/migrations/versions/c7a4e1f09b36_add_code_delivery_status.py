@@ -0,0 +1,36 @@
+"""Add delivery status to verification codes
+
+Revision ID: c7a4e1f09b36
+Revises: b6e0d3a8f512
+Create Date: 2026-10-19 20:03:57.664120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a4e1f09b36'
+down_revision = 'b6e0d3a8f512'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Codes issued before this migration were sent synchronously
+    with op.batch_alter_table('social_codes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('delivery_status', sa.String(length=20), server_default='sent', nullable=False))
+        batch_op.add_column(sa.Column('delivery_attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('delivery_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True))
+
+    with op.batch_alter_table('social_codes', schema=None) as batch_op:
+        batch_op.alter_column('delivery_status', server_default='pending')
+
+
+def downgrade():
+    with op.batch_alter_table('social_codes', schema=None) as batch_op:
+        batch_op.drop_column('delivered_at')
+        batch_op.drop_column('delivery_error')
+        batch_op.drop_column('delivery_attempts')
+        batch_op.drop_column('delivery_status')
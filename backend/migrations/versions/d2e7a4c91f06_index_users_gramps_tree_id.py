@@ -0,0 +1,26 @@
+"""Index users by family tree for the family feed
+
+Revision ID: d2e7a4c91f06
+Revises: c58e2b9f7a14
+Create Date: 2026-10-19 14:05:12.583920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e7a4c91f06'
+down_revision = 'c58e2b9f7a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_social_users_gramps_tree_id'), ['gramps_tree_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_social_users_gramps_tree_id'))
@@ -0,0 +1,52 @@
+"""Contact matching opt-out and normalized phone hash backfill
+
+Revision ID: d5a9f3b1c7e2
+Revises: c2e8f4a6d193
+Create Date: 2026-10-20 14:03:51.662094
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.phone_numbers import hash_phone_number
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a9f3b1c7e2'
+down_revision = 'c2e8f4a6d193'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('discoverable_by_phone', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+    # Hash every number the way User._update_phone_hash does (normalized first),
+    # on any database; this also replaces hashes of raw, unnormalized numbers
+    connection = op.get_bind()
+    users = connection.execute(sa.text(
+        "SELECT id, phone_number FROM social_users WHERE phone_number IS NOT NULL ORDER BY created_at"
+    )).fetchall()
+    connection.execute(sa.text("UPDATE social_users SET phone_hash = NULL"))
+    seen = set()
+    for user_id, phone_number in users:
+        phone_hash = hash_phone_number(phone_number)
+        if phone_hash in seen:
+            # Two accounts store the same number in different formats; the older one keeps it
+            logger.warning(f"Phone number of user {user_id} duplicates another account, not hashed")
+            continue
+        seen.add(phone_hash)
+        connection.execute(
+            sa.text("UPDATE social_users SET phone_hash = :phone_hash WHERE id = :id"),
+            {'phone_hash': phone_hash, 'id': user_id}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('social_users', schema=None) as batch_op:
+        batch_op.drop_column('discoverable_by_phone')
@@ -0,0 +1,55 @@
+"""Aggregate unread notifications per target
+
+Revision ID: e4b19c7d2a53
+Revises: d2e7a4c91f06
+Create Date: 2026-10-19 15:20:37.114508
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b19c7d2a53'
+down_revision = 'd2e7a4c91f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('actor_count', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('actor_sample', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True))
+
+    op.execute("UPDATE social_notifications SET updated_at = created_at")
+
+    # Keep only the newest unread notification of each group unread so the
+    # unique index can be built; older duplicates stay as read history
+    op.execute(
+        "UPDATE social_notifications SET read = TRUE "
+        "WHERE read = FALSE AND target_id IS NOT NULL AND EXISTS ("
+        "SELECT 1 FROM social_notifications newer "
+        "WHERE newer.user_id = social_notifications.user_id "
+        "AND newer.type = social_notifications.type "
+        "AND newer.target_id = social_notifications.target_id "
+        "AND newer.read = FALSE "
+        "AND (newer.created_at > social_notifications.created_at "
+        "OR (newer.created_at = social_notifications.created_at AND newer.id > social_notifications.id)))"
+    )
+
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.create_index(
+            'uq_social_notifications_unread_group', ['user_id', 'type', 'target_id'],
+            unique=True,
+            postgresql_where=sa.text('read = false'),
+            sqlite_where=sa.text('read = 0')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.drop_index('uq_social_notifications_unread_group')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('actor_sample')
+        batch_op.drop_column('actor_count')
@@ -0,0 +1,30 @@
+"""Index pending verification codes for the undelivered sweep
+
+Revision ID: e7c1b9d4f2a8
+Revises: d5a9f3b1c7e2
+Create Date: 2026-10-20 16:41:09.318245
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c1b9d4f2a8'
+down_revision = 'd5a9f3b1c7e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_codes', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_social_codes_pending_created_at', ['created_at'], unique=False,
+            postgresql_where=sa.text("delivery_status = 'pending'"),
+            sqlite_where=sa.text("delivery_status = 'pending'")
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('social_codes', schema=None) as batch_op:
+        batch_op.drop_index('ix_social_codes_pending_created_at')
@@ -0,0 +1,61 @@
+"""Add content-addressed media blobs
+
+Revision ID: e9b3c5a7d140
+Revises: c7a4e1f09b36
+Create Date: 2026-10-19 21:14:32.418093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b3c5a7d140'
+down_revision = 'c7a4e1f09b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('social_media_blobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('storage_key', sa.String(length=255), nullable=False),
+        sa.Column('mime_type', sa.String(length=100), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('variants', sa.JSON(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256')
+    )
+    with op.batch_alter_table('social_media_blobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_social_media_blobs_storage_key'), ['storage_key'], unique=False)
+        batch_op.create_index(
+            'ix_social_media_blobs_unreferenced', ['updated_at'],
+            unique=False,
+            postgresql_where=sa.text('ref_count = 0'),
+            sqlite_where=sa.text('ref_count = 0')
+        )
+
+    # Existing media keep their own files (blob_id stays NULL)
+    with op.batch_alter_table('social_media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_id', sa.UUID(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_social_media_blob_id'), ['blob_id'], unique=False)
+        batch_op.create_foreign_key('fk_social_media_blob_id', 'social_media_blobs', ['blob_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('social_media', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_social_media_blob_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_social_media_blob_id'))
+        batch_op.drop_column('blob_id')
+
+    with op.batch_alter_table('social_media_blobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_social_media_blobs_unreferenced')
+        batch_op.drop_index(batch_op.f('ix_social_media_blobs_storage_key'))
+
+    op.drop_table('social_media_blobs')
@@ -0,0 +1,26 @@
+"""Index notifications for keyset pagination
+
+Revision ID: f1a8c3e6b247
+Revises: e4b19c7d2a53
+Create Date: 2026-10-19 16:42:09.877215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a8c3e6b247'
+down_revision = 'e4b19c7d2a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_social_notifications_user_updated', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('social_notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_social_notifications_user_updated')
@@ -0,0 +1,32 @@
+"""Record which import inserted each genealogy person and relation
+
+Revision ID: f3d8a2c6e591
+Revises: e7c1b9d4f2a8
+Create Date: 2026-10-21 10:12:37.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3d8a2c6e591'
+down_revision = 'e7c1b9d4f2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('social_genealogy_persons', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('import_id', sa.UUID(), nullable=True))
+
+    with op.batch_alter_table('social_genealogy_relations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('import_id', sa.UUID(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('social_genealogy_relations', schema=None) as batch_op:
+        batch_op.drop_column('import_id')
+
+    with op.batch_alter_table('social_genealogy_persons', schema=None) as batch_op:
+        batch_op.drop_column('import_id')
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Export the follow and friend graphs as a compact CSR snapshot for offline analytics.
+
+Rows are streamed with a server-side cursor, so memory stays bounded by the
+number of users rather than the number of edges. The output directory contains
+NumPy .npy files that can be memory-mapped without touching the database:
+
+    node_ids.npy          users' UUIDs as 16 raw bytes, sorted (row i = node i)
+    follows_offsets.npy   int64[N + 1], follower i follows targets[offsets[i]:offsets[i + 1]]
+    follows_targets.npy   node indices of the followed users
+    friends_offsets.npy   same layout for accepted friendships (stored in both directions)
+    friends_targets.npy
+    manifest.json         counts, dtypes and export time, written last
+
+Usage:
+    python scripts/export_graph_snapshot.py --output /data/graph-2024-06-01
+"""
+
+import os
+import sys
+import json
+import uuid
+import argparse
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from app import create_app, db
+from app.models import User, Follow, Friend
+from app.models.follow import FollowStatus
+from app.models.friend import FriendStatus
+
+SNAPSHOT_VERSION = 1
+NODE_DTYPE = 'S16'
+OFFSET_DTYPE = np.int64
+
+def stream_rows(statement, batch_size):
+    """Yield lists of rows from a server-side cursor"""
+    result = db.session.execute(
+        statement.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for partition in result.partitions():
+        yield partition
+
+def uuid_bytes(values):
+    """Convert UUIDs to a fixed-width byte array comparable with node_ids"""
+    return np.array([value.bytes for value in values], dtype=NODE_DTYPE)
+
+def export_nodes(output_dir, batch_size):
+    """Write the sorted node id array and return it memory-mapped"""
+    count = db.session.execute(select(db.func.count(User.id))).scalar()
+    path = os.path.join(output_dir, 'node_ids.npy')
+    nodes = open_memmap(path, mode='w+', dtype=NODE_DTYPE, shape=(count,))
+
+    written = 0
+    for rows in stream_rows(select(User.id).order_by(User.id), batch_size):
+        batch = uuid_bytes(row[0] for row in rows)[:count - written]
+        nodes[written:written + len(batch)] = batch
+        written += len(batch)
+
+    # Byte order is the index order, whatever the database collation is
+    nodes = nodes[:written]
+    nodes.sort()
+    nodes.flush()
+    return np.load(path, mmap_mode='r')[:written]
+
+def edge_batches(statements, nodes, batch_size):
+    """Yield (source, target) node index arrays, dropping edges to unknown users"""
+    if not len(nodes):
+        return
+    for statement in statements:
+        for rows in stream_rows(statement, batch_size):
+            sources = uuid_bytes(row[0] for row in rows)
+            targets = uuid_bytes(row[1] for row in rows)
+
+            source_index = np.searchsorted(nodes, sources)
+            target_index = np.searchsorted(nodes, targets)
+            np.clip(source_index, 0, len(nodes) - 1, out=source_index)
+            np.clip(target_index, 0, len(nodes) - 1, out=target_index)
+
+            known = (nodes[source_index] == sources) & (nodes[target_index] == targets)
+            yield source_index[known], target_index[known]
+
+def export_csr(output_dir, name, statements, nodes, batch_size):
+    """
+    Write one graph as CSR arrays in two streaming passes
+
+    The first pass counts out-degrees to size the arrays, the second places
+    every target at its slot. Both passes run in the same transaction.
+    """
+    size = len(nodes)
+    counts = np.zeros(size, dtype=OFFSET_DTYPE)
+    for sources, _ in edge_batches(statements, nodes, batch_size):
+        counts += np.bincount(sources, minlength=size)
+
+    offsets = open_memmap(os.path.join(output_dir, f'{name}_offsets.npy'),
+                          mode='w+', dtype=OFFSET_DTYPE, shape=(size + 1,))
+    offsets[0] = 0
+    np.cumsum(counts, out=offsets[1:])
+    edge_count = int(offsets[-1])
+
+    target_dtype = np.int32 if size < 2 ** 31 else np.int64
+    targets = open_memmap(os.path.join(output_dir, f'{name}_targets.npy'),
+                          mode='w+', dtype=target_dtype, shape=(edge_count,))
+
+    cursor = np.array(offsets[:-1])
+    for sources, batch_targets in edge_batches(statements, nodes, batch_size):
+        # Stable sort groups the batch by source so each edge gets its own slot
+        order = np.argsort(sources, kind='stable')
+        sources, batch_targets = sources[order], batch_targets[order]
+        unique, first, run_lengths = np.unique(sources, return_index=True, return_counts=True)
+        slots = np.repeat(cursor[unique] - first, run_lengths) + np.arange(len(sources))
+        # Edges added between the passes may not fit; the snapshot keeps the counted ones
+        fits = slots < np.repeat(offsets[unique + 1], run_lengths)
+        targets[slots[fits]] = batch_targets[fits]
+        cursor[unique] += run_lengths
+
+    offsets.flush()
+    targets.flush()
+    return {'edges': edge_count, 'targets_dtype': np.dtype(target_dtype).name}
+
+def export_snapshot(output_dir, batch_size=10000):
+    """Export nodes, follows and friends into output_dir and return the manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        # Readers treat a directory with a manifest as complete
+        os.remove(manifest_path)
+
+    if db.engine.dialect.name == 'postgresql':
+        # One consistent view of the graph across all passes
+        db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+
+    nodes = export_nodes(output_dir, batch_size)
+
+    follows = [
+        select(Follow.follower_id, Follow.followed_id)
+        .where(Follow.status == FollowStatus.ACCEPTED)
+        .order_by(Follow.follower_id)
+    ]
+    friends = [
+        select(Friend.requester_id, Friend.requestee_id)
+        .where(Friend.status == FriendStatus.ACCEPTED)
+        .order_by(Friend.requester_id),
+        select(Friend.requestee_id, Friend.requester_id)
+        .where(Friend.status == FriendStatus.ACCEPTED)
+        .order_by(Friend.requestee_id)
+    ]
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'exported_at': datetime.utcnow().isoformat(),
+        'nodes': len(nodes),
+        'node_dtype': NODE_DTYPE,
+        'offsets_dtype': np.dtype(OFFSET_DTYPE).name,
+        'graphs': {
+            'follows': export_csr(output_dir, 'follows', follows, nodes, batch_size),
+            'friends': export_csr(output_dir, 'friends', friends, nodes, batch_size)
+        }
+    }
+    db.session.rollback()
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_snapshot(snapshot_dir):
+    """
+    Memory-map an exported snapshot
+
+    Returns:
+        Dictionary with 'manifest', 'node_ids' and '<graph>_offsets' /
+        '<graph>_targets' arrays for every exported graph
+    """
+    with open(os.path.join(snapshot_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    snapshot = {
+        'manifest': manifest,
+        'node_ids': np.load(os.path.join(snapshot_dir, 'node_ids.npy'), mmap_mode='r')[:manifest['nodes']]
+    }
+    for name in manifest['graphs']:
+        for part in ('offsets', 'targets'):
+            key = f'{name}_{part}'
+            snapshot[key] = np.load(os.path.join(snapshot_dir, f'{key}.npy'), mmap_mode='r')
+    return snapshot
+
+def node_index(snapshot, user_id):
+    """Node index of a user UUID in a loaded snapshot, or None"""
+    nodes = snapshot['node_ids']
+    key = np.array([uuid.UUID(str(user_id)).bytes], dtype=NODE_DTYPE)
+    i = int(np.searchsorted(nodes, key)[0])
+    if i < len(nodes) and nodes[i] == key[0]:
+        return i
+    return None
+
+def node_uuid(snapshot, i):
+    """User UUID of node i (NumPy strips trailing zero bytes of 'S' values)"""
+    return uuid.UUID(bytes=bytes(snapshot['node_ids'][i]).ljust(16, b'\0'))
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Export the social graph as a CSR snapshot')
+    parser.add_argument('--output', required=True, help='Directory to write the snapshot to')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows fetched per cursor round-trip')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"Exporting graph snapshot to {args.output}...")
+        manifest = export_snapshot(args.output, batch_size=args.batch_size)
+        print(f"Nodes: {manifest['nodes']}")
+        for name, stats in manifest['graphs'].items():
+            print(f"{name}: {stats['edges']} edges")
+
+if __name__ == "__main__":
+    main()
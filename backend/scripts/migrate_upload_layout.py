@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Move uploaded media from the flat uploads/ directory into the sharded layout.
+
+Media and media blob rows whose storage_key has no directory part are
+processed in batches ordered by id. For every row the original file and its
+variants are moved to ab/cd/<name> and the keys (storage_key, variants and
+the gramps_url of media) are rewritten; each batch is committed on its own.
+
+The script can be stopped and re-run at any time. Files are moved before
+the keys are committed and moving a file that is already in place is a
+no-op, so an interrupted batch is simply redone. Serving stays correct in
+between because lookups fall back to the other layout.
+
+Usage:
+    python scripts/migrate_upload_layout.py --dry-run
+    python scripts/migrate_upload_layout.py --batch-size 500
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Media, MediaBlob
+from app.services.media_storage import media_storage, shard_key
+
+logger = logging.getLogger('migrate_upload_layout')
+
+def move_file(storage_key, dry_run):
+    """Move one flat file to its sharded key; returns the new key"""
+    new_key = shard_key(storage_key)
+    source = media_storage.path_for(storage_key)
+    destination = media_storage.path_for(new_key)
+
+    if os.path.isfile(source):
+        if not dry_run:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            # Same filesystem: atomic, and overwriting an identical copy is harmless
+            os.replace(source, destination)
+    elif not os.path.isfile(destination):
+        logger.warning(f"File for {storage_key} is missing, rewriting the key anyway")
+    return new_key
+
+def migrate_variants(variants, dry_run):
+    """Return variants with every flat file key moved and rewritten"""
+    if not variants:
+        return variants
+    migrated = {}
+    for name, variant in variants.items():
+        files = {}
+        for image_format, file in variant.get('files', {}).items():
+            key = file['storage_key']
+            files[image_format] = dict(file, storage_key=key if '/' in key else move_file(key, dry_run))
+        migrated[name] = dict(variant, files=files)
+    return migrated
+
+def migrate_model(model, batch_size, dry_run):
+    """Migrate every flat row of a model; returns the number of rows"""
+    migrated = 0
+    last_id = None
+    while True:
+        query = model.query.filter(~model.storage_key.contains('/'))
+        if last_id is not None:
+            query = query.filter(model.id > last_id)
+        rows = query.order_by(model.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            old_key = row.storage_key
+            row.storage_key = move_file(old_key, dry_run)
+            row.variants = migrate_variants(row.variants, dry_run)
+            gramps_url = getattr(row, 'gramps_url', None)
+            if gramps_url and gramps_url.endswith(f"/uploads/{old_key}"):
+                row.gramps_url = gramps_url[:-len(old_key)] + row.storage_key
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        migrated += len(rows)
+        print(f"{model.__tablename__}: {migrated} rows migrated", flush=True)
+    return migrated
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Move uploaded media into the sharded directory layout')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows committed per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would be moved without changing anything')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    app = create_app()
+    with app.app_context():
+        print(f"Uploads directory: {media_storage.upload_dir}")
+        # Blobs first: media rows of deduplicated files then find them in place
+        blobs = migrate_model(MediaBlob, args.batch_size, args.dry_run)
+        media = migrate_model(Media, args.batch_size, args.dry_run)
+        suffix = ' (dry run, nothing changed)' if args.dry_run else ''
+        print(f"Done: {blobs} blobs and {media} media rows{suffix}")
+
+if __name__ == "__main__":
+    main()
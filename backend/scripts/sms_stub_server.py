@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Mobizon SMS API, for load tests.
+
+Answers POST requests the way sendsmsmessage does, with configurable
+latency and error rate, and prints request rates. Point the backend at it with
+SMS_API_URL and keep SMS_DEBUG_MODE=false:
+
+    python scripts/sms_stub_server.py --port 8025 --latency 0.3 --error-rate 0.05
+    SMS_API_URL=http://localhost:8025/service/message/sendsmsmessage MOBIZON_API_KEY=test \\
+        celery -A celery_worker.celery worker -Q auth_codes --pool=gevent --concurrency=50
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+class StubStats:
+    """Counters printed by the reporter thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.message_ids = itertools.count(1)
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        with self.lock:
+            return f"requests={self.requests} errors={self.errors} rate={self.requests / elapsed:.1f} req/s"
+
+def make_handler(stats, latency, jitter, error_rate):
+    class MobizonStubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            params = parse_qs(self.rfile.read(length).decode(errors='replace'))
+
+            delay = latency + random.uniform(0, jitter)
+            if delay:
+                time.sleep(delay)
+
+            with stats.lock:
+                stats.requests += 1
+                failed = random.random() < error_rate
+                if failed:
+                    stats.errors += 1
+
+            if not params.get('apiKey') or not params.get('recipient'):
+                body = {'code': 100, 'message': 'apiKey and recipient are required', 'data': {}}
+            elif failed:
+                body = {'code': 999, 'message': 'Stubbed failure', 'data': {}}
+            else:
+                body = {'code': 0, 'message': '', 'data': {'campaignId': 1, 'messageId': next(stats.message_ids)}}
+
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # Per-request logging would dominate the load test
+            pass
+
+    return MobizonStubHandler
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Stub Mobizon SMS API for load tests')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8025, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds to wait before answering')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Extra random latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an API error')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='Seconds between rate reports')
+    args = parser.parse_args()
+
+    stats = StubStats()
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(stats, args.latency, args.jitter, args.error_rate))
+    server.daemon_threads = True
+
+    def report():
+        while True:
+            time.sleep(args.report_interval)
+            print(stats.report(), flush=True)
+
+    threading.Thread(target=report, daemon=True).start()
+    print(f"Mobizon stub listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for testing email throughput.
+
+Accepts every message and throws it away, printing connection and message
+rates. Optionally answers a fraction of messages with a temporary 451 error
+to exercise the digest sender's backpressure handling.
+
+Usage:
+    python scripts/smtp_sink.py --port 1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_SSL=false MAIL_SUPPRESS_SEND=false \\
+        MAIL_DEFAULT_SENDER=noreply@localhost celery -A celery_worker.celery worker -B
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+class SinkStats:
+    """Counters printed by the reporter"""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = 0
+        self.bytes = 0
+        self.deferred = 0
+        self.started = time.monotonic()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (f"connections={self.connections} messages={self.messages} "
+                f"deferred={self.deferred} bytes={self.bytes} "
+                f"rate={self.messages / elapsed:.1f} msg/s")
+
+async def handle_client(reader, writer, stats, defer_ratio, delay):
+    """Speak just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+    stats.connections += 1
+
+    async def reply(line):
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    await reply("220 smtp-sink ready")
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode(errors='replace').strip().upper()
+
+            if command.startswith('EHLO'):
+                writer.write(b"250-smtp-sink\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+                await writer.drain()
+            elif command.startswith('HELO'):
+                await reply("250 smtp-sink")
+            elif command.startswith('MAIL FROM') or command.startswith('RCPT TO'):
+                await reply("250 OK")
+            elif command == 'DATA':
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data_line = await reader.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                    size += len(data_line)
+                if delay:
+                    await asyncio.sleep(delay)
+                if defer_ratio and random.random() < defer_ratio:
+                    stats.deferred += 1
+                    await reply("451 Try again later")
+                else:
+                    stats.messages += 1
+                    stats.bytes += size
+                    await reply("250 OK queued")
+            elif command in ('RSET', 'NOOP'):
+                await reply("250 OK")
+            elif command == 'QUIT':
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def reporter(stats, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(stats.report(), flush=True)
+
+async def serve(host, port, defer_ratio, delay, interval):
+    stats = SinkStats()
+    server = await asyncio.start_server(
+        lambda r, w: handle_client(r, w, stats, defer_ratio, delay), host, port
+    )
+    print(f"SMTP sink listening on {host}:{port}", flush=True)
+    asyncio.create_task(reporter(stats, interval))
+    async with server:
+        await server.serve_forever()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Accept and discard SMTP messages, reporting throughput')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=1025, help='Port to listen on')
+    parser.add_argument('--defer-ratio', type=float, default=0.0, help='Fraction of messages answered with 451')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before acknowledging a message')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='Seconds between throughput reports')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.defer_ratio, args.delay, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -97,6 +97,17 @@ const MediaGallery: React.FC<MediaGalleryProps> = ({
 
   const isImage = (mimeType: string) => mimeType.startsWith('image/');
 
+  // Feeds load downscaled variants; the browser picks one from srcset.
+  // The inline LQIP shows through as a blurred background until the image arrives.
+  const variantProps = (item: Media, sizes: string) => ({
+    src: item.url || item.gramps_url,
+    srcSet: item.srcset || undefined,
+    sizes: item.srcset ? sizes : undefined,
+    style: item.lqip
+      ? { backgroundImage: `url(${item.lqip})`, backgroundSize: 'cover', backgroundPosition: 'center' }
+      : undefined,
+  });
+
   const renderMediaGrid = () => {
     const imageMedia = media.filter(m => isImage(m.mime_type));
     
@@ -107,7 +118,7 @@ const MediaGallery: React.FC<MediaGalleryProps> = ({
       return (
         <div className="relative rounded-lg overflow-hidden">
           <img
-            src={imageMedia[0].gramps_url}
+            {...variantProps(imageMedia[0], '(max-width: 640px) 100vw, 640px')}
             alt={imageMedia[0].original_filename}
             className="w-full h-64 object-cover hover:opacity-90 transition-opacity cursor-pointer"
             onClick={() => setSelectedMedia(imageMedia[0])}
@@ -138,7 +149,7 @@ const MediaGallery: React.FC<MediaGalleryProps> = ({
               className="relative"
             >
               <img
-                src={mediaItem.gramps_url}
+                {...variantProps(mediaItem, '(max-width: 640px) 50vw, 320px')}
                 alt={mediaItem.original_filename}
                 className="w-full h-64 object-cover hover:opacity-90 transition-opacity cursor-pointer"
                 onClick={() => setSelectedMedia(mediaItem)}
@@ -167,7 +178,7 @@ const MediaGallery: React.FC<MediaGalleryProps> = ({
         <div className="grid grid-cols-2 gap-1 rounded-lg overflow-hidden">
           <div className="relative row-span-2">
             <img
-              src={imageMedia[0].gramps_url}
+              {...variantProps(imageMedia[0], '(max-width: 640px) 50vw, 320px')}
               alt={imageMedia[0].original_filename}
               className="w-full h-full object-cover hover:opacity-90 transition-opacity cursor-pointer"
               onClick={() => setSelectedMedia(imageMedia[0])}
@@ -192,7 +203,7 @@ const MediaGallery: React.FC<MediaGalleryProps> = ({
                 className="relative"
               >
                 <img
-                  src={mediaItem.gramps_url}
+                  {...variantProps(mediaItem, '(max-width: 640px) 50vw, 320px')}
                   alt={mediaItem.original_filename}
                   className="w-full h-full object-cover hover:opacity-90 transition-opacity cursor-pointer"
                   onClick={() => setSelectedMedia(mediaItem)}
@@ -225,7 +236,7 @@ const MediaGallery: React.FC<MediaGalleryProps> = ({
             className="relative"
           >
             <img
-              src={mediaItem.gramps_url}
+              {...variantProps(mediaItem, '(max-width: 640px) 33vw, 220px')}
               alt={mediaItem.original_filename}
               className="w-full h-32 object-cover hover:opacity-90 transition-opacity cursor-pointer"
               onClick={() => setSelectedMedia(mediaItem)}
@@ -92,8 +92,6 @@ class ApiClient {
     last_name: string;
     bio: string;
     avatar_url: string;
-    gramps_person_id: string;
-    gramps_tree_id: string;
   }>) {
     const response = await this.client.put('/users/profile', userData);
     return response.data;
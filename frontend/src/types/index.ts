@@ -26,6 +26,7 @@ export interface User {
   date_of_birth?: string;
   updated_at?: string;
   private_account?: boolean;
+  discoverable_by_phone?: boolean;
   profile_slug?: string;
   pronouns?: string;
   status?: string;
@@ -43,6 +44,12 @@ export interface Media {
   gramps_media_id?: string;
   gramps_url?: string;
   url?: string;
+  thumbnail_url?: string;
+  srcset?: string | null;
+  width?: number | null;
+  height?: number | null;
+  blurhash?: string | null;
+  lqip?: string | null;
   post_id?: string;
   uploaded_by?: number;
   uploader?: User;